@@ -1,8 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from orders.models import Review
+from vintageapi.serializers import SellerRatingListSerializer, SellerRatingMixin
 from .models import Profile
-from django.db.models import Avg
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -11,7 +10,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email']
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SellerRatingMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     average_rating = serializers.SerializerMethodField()
     review_count = serializers.SerializerMethodField()
@@ -23,17 +22,18 @@ class ProfileSerializer(serializers.ModelSerializer):
             'id', 'user', 'display_name', 'bio', 'profile_image', 'location',
             'average_rating', 'review_count', 'items'
         ]
+        list_serializer_class = SellerRatingListSerializer
+
+    seller_id_path = "user_id"
 
     def get_average_rating(self, obj):
-        user = obj.user
-        avg = Review.objects.filter(seller=user).aggregate(avg=Avg('rating'))['avg']
-        return round(avg, 2) if avg else None
+        return self.seller_rating_summary(obj)[0]
 
     def get_review_count(self, obj):
-        user = obj.user
-        return Review.objects.filter(seller=user).count()
+        return self.seller_rating_summary(obj)[1]
 
     def get_items(self, obj):
         from vintageapi.serializers import ItemSerializer
-        items = obj.user.items.all()
-        return ItemSerializer(items, many=True).data
\ No newline at end of file
+        items = obj.user.items.select_related("seller").prefetch_related("images")
+        # share the context so the profile's own rating lookup is reused
+        return ItemSerializer(items, many=True, context=self.context).data
\ No newline at end of file
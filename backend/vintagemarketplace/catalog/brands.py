@@ -0,0 +1,121 @@
+# catalog/brands.py
+"""
+In-process brand resolver.
+
+Every brand name and every entry in Brand.synonyms is normalized ("Levi's",
+"Levis" and "LEVI STRAUSS & Co" become "levis" / "levi strauss co") and
+kept in a sorted array, so:
+
+- resolve(text)       -> canonical brand dict or None (exact key lookup)
+- autocomplete(text)  -> brands whose name/synonym, or a word in it, starts
+                         with the text (binary search over the array)
+
+Neither touches the database. The index is rebuilt lazily when the
+"brand_index" version in catalog.cache moves, which catalog.signals bumps on
+any Brand save/delete; with the shared cache every process picks up changes
+on its next lookup. Independently, an index older than INDEX_MAX_AGE seconds
+is rebuilt, so changes that bypass the signals (queryset updates, a bump
+lost with a process-local cache) are bounded too.
+"""
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from .cache import BRAND_INDEX, get_version
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCT_RE.sub("", text.lower().replace("&", " "))
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class BrandIndex:
+    def __init__(self, brands):
+        """`brands`: iterable of (id, name, slug, synonyms)."""
+        self.brands = {}
+        self._exact = {}
+        entries = set()
+        for pk, name, slug, synonyms in brands:
+            self.brands[pk] = {"id": pk, "name": name, "slug": slug}
+            for rank, label in enumerate([name, *(synonyms or [])]):
+                key = normalize(label)
+                if not key:
+                    continue
+                # the canonical name beats a synonym that collides with it
+                if rank == 0 or key not in self._exact:
+                    self._exact[key] = pk
+                self._exact.setdefault(key.replace(" ", ""), pk)
+                words = key.split(" ")
+                for start in range(len(words)):
+                    # (key, word offset, synonym rank, brand id): full-name
+                    # prefixes sort ahead of mid-name word matches
+                    entries.add((" ".join(words[start:]), start, min(rank, 1), pk))
+        self._entries = sorted(entries)
+        self._keys = [entry[0] for entry in self._entries]
+
+    def resolve(self, text):
+        key = normalize(text)
+        pk = self._exact.get(key) or self._exact.get(key.replace(" ", ""))
+        return self.brands.get(pk)
+
+    def autocomplete(self, text, limit=10):
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        matches = []
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            matches.append(self._entries[i])
+            i += 1
+        results, seen = [], set()
+        for _key, start, rank, pk in sorted(matches, key=lambda e: (e[1], e[2], e[0])):
+            if pk not in seen:
+                seen.add(pk)
+                results.append(self.brands[pk])
+                if len(results) >= limit:
+                    break
+        return results
+
+
+INDEX_MAX_AGE = 300
+
+_lock = threading.Lock()
+_state = {"version": None, "index": None, "built_at": 0.0}
+
+
+def _load():
+    from .models import Brand
+    return BrandIndex(Brand.objects.values_list("id", "name", "slug", "synonyms"))
+
+
+def _stale(version):
+    return (_state["version"] != version
+            or time.monotonic() - _state["built_at"] > INDEX_MAX_AGE)
+
+
+def get_index():
+    version = get_version(BRAND_INDEX)
+    if _stale(version):
+        with _lock:
+            if _stale(version):
+                _state["index"] = _load()
+                _state["version"] = version
+                _state["built_at"] = time.monotonic()
+    return _state["index"]
+
+
+def resolve(text):
+    """Canonical {"id", "name", "slug"} for a free-text brand, or None."""
+    return get_index().resolve(text)
+
+
+def autocomplete(text, limit=10):
+    return get_index().autocomplete(text, limit)
@@ -0,0 +1,120 @@
+# catalog/cache.py
+"""
+Versioned caches for read-mostly taxonomy data.
+
+Each cached family has a version token in the shared cache. Readers build
+keys from the current token, and signals (catalog.signals) bump it when the
+underlying rows change, so stale entries are never read and simply expire.
+The token also works as an ETag.
+
+Tokens expire too (VERSION_TIMEOUT), which only costs a rebuild. That
+bounds staleness when the cache is process-local and a bump reaches just
+the worker that made it: there tokens last LOCAL_VERSION_TIMEOUT seconds.
+"""
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+VERSION_KEY = "catalog:version:{name}"
+DATA_KEY = "catalog:{name}:{version}:{suffix}"
+TIMEOUT = 60 * 60 * 24
+VERSION_TIMEOUT = 60 * 60
+LOCAL_VERSION_TIMEOUT = 60
+
+
+def version_timeout():
+    if isinstance(caches["default"], LocMemCache):
+        return LOCAL_VERSION_TIMEOUT
+    return VERSION_TIMEOUT
+
+CATEGORY_TREE = "category_tree"
+ATTRIBUTE_SCHEMA = "attribute_schema"
+BRAND_INDEX = "brand_index"
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name=name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        # another process may have raced us; whoever wrote first wins
+        if not cache.add(key, version, version_timeout()):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    cache.set(VERSION_KEY.format(name=name), uuid.uuid4().hex[:12], version_timeout())
+
+
+def get_or_build(name, build, suffix="all"):
+    """Return (version, value), building and caching the value on a miss."""
+    version = get_version(name)
+    key = DATA_KEY.format(name=name, version=version, suffix=suffix)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, TIMEOUT)
+    return version, value
+
+
+def build_category_tree():
+    """Nested [{id, name, slug, children: [...]}] for the whole taxonomy, one query."""
+    from .models import Category
+
+    nodes = {}
+    roots = []
+    rows = Category.objects.order_by("depth", "name").values("id", "name", "slug", "parent_id")
+    for row in rows:
+        node = {"id": row["id"], "name": row["name"], "slug": row["slug"], "children": []}
+        nodes[row["id"]] = node
+        parent = nodes.get(row["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+    return roots
+
+
+def category_tree():
+    return get_or_build(CATEGORY_TREE, build_category_tree)
+
+
+def build_attribute_schema(category):
+    """
+    Effective attribute schema for `category`: its own attributes plus those
+    linked on any ancestor. When an attribute is linked at several levels the
+    nearest category wins. Ordered by position, then ancestors first.
+    Three queries: links + attributes, then options.
+    """
+    from .models import CategoryAttribute
+    from .serializers import AttributeSerializer
+
+    chain = category.ancestor_ids()
+    depth_of = {pk: depth for depth, pk in enumerate(chain)}
+    links = (CategoryAttribute.objects
+             .filter(category_id__in=chain)
+             .select_related("attribute")
+             .prefetch_related("attribute__options"))
+
+    effective = {}
+    for link in sorted(links, key=lambda ln: depth_of[ln.category_id]):
+        effective[link.attribute_id] = link  # deeper links override
+
+    ordered = sorted(effective.values(), key=lambda ln: (
+        ln.position, depth_of[ln.category_id], ln.attribute.name))
+    schema = []
+    for link in ordered:
+        entry = AttributeSerializer(link.attribute).data
+        entry["position"] = link.position
+        entry["inherited_from"] = (link.category_id if link.category_id != category.pk
+                                   else None)
+        schema.append(entry)
+    return schema
+
+
+def attribute_schema(category_id):
+    """(version, schema) for a category id; raises Category.DoesNotExist."""
+    from .models import Category
+
+    def build():
+        return build_attribute_schema(Category.objects.get(pk=category_id))
+    return get_or_build(ATTRIBUTE_SCHEMA, build, suffix=str(category_id))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:50
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    Category = apps.get_model("catalog", "Category")
+    parent_of = dict(Category.objects.values_list("pk", "parent_id"))
+    paths = {}
+
+    def path_for(pk):
+        if pk not in paths:
+            parent = parent_of[pk]
+            paths[pk] = (path_for(parent) if parent else "") + f"{pk}/"
+        return paths[pk]
+
+    for pk in parent_of:
+        path = path_for(pk)
+        Category.objects.filter(pk=pk).update(path=path, depth=path.count("/") - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_alter_attributeoption_options_attribute_max_value_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
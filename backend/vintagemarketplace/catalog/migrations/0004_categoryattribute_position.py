@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_category_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='categoryattribute',
+            options={'ordering': ['position']},
+        ),
+        migrations.AddField(
+            model_name='categoryattribute',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
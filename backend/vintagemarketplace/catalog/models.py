@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 
 
@@ -17,6 +20,11 @@ class Category(TimeStamped):
         "self", null=True, blank=True, related_name="children",
         on_delete=models.CASCADE
     )
+    # Materialized path of ids from the root, e.g. "1/5/12/". Maintained by
+    # save(); a subtree is a single `path__startswith` range scan.
+    path = models.CharField(max_length=255, blank=True, default="",
+                            db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ("parent", "name")
@@ -26,7 +34,47 @@ class Category(TimeStamped):
         if not self.slug:
             base = slugify(self.name)
             self.slug = base
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._update_path()
+
+    def _update_path(self):
+        """Recompute this node's path; on a move, rewrite the whole subtree."""
+        parent_path = ""
+        if self.parent_id:
+            parent_path = (Category.objects.filter(pk=self.parent_id)
+                           .values_list("path", flat=True).get())
+        old_path = Category.objects.filter(pk=self.pk).values_list("path", flat=True).get()
+        new_path = f"{parent_path}{self.pk}/"
+        self._path_changed = new_path != old_path
+        if not self._path_changed:
+            self.path, self.depth = new_path, new_path.count("/") - 1
+            return
+        if old_path and parent_path.startswith(old_path):
+            raise ValidationError("A category cannot be moved under its own subtree.")
+
+        new_depth = new_path.count("/") - 1
+        Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            # descendants keep their relative path under the new prefix
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr("path", len(old_path) + 1)),
+                depth=F("depth") + (new_depth - self.depth),
+            )
+        self.path, self.depth = new_path, new_depth
+
+    def ancestor_ids(self, include_self=True):
+        """Ids from the root down, parsed from the path (no query)."""
+        ids = [int(part) for part in self.path.split("/") if part]
+        return ids if include_self else ids[:-1]
+
+    def ancestors(self, include_self=False):
+        return Category.objects.filter(
+            pk__in=self.ancestor_ids(include_self)).order_by("depth")
+
+    def descendants(self, include_self=False):
+        qs = Category.objects.filter(path__startswith=self.path)
+        return qs if include_self else qs.exclude(pk=self.pk)
 
     def __str__(self):
         return f"{self.parent} > {self.name}" if self.parent else self.name
@@ -99,6 +147,9 @@ class AttributeOption(models.Model):
 class CategoryAttribute(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE)
+    # display order on the listing form (set by bootstrap_taxonomy)
+    position = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ("category","attribute")
+        ordering = ["position"]
@@ -6,7 +6,7 @@ from .models import Category, Brand, Tag, Attribute, AttributeOption
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ["id", "name", "slug", "parent"]
+        fields = ["id", "name", "slug", "parent", "depth"]
 
 
 class BrandSerializer(serializers.ModelSerializer):
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import ATTRIBUTE_SCHEMA, BRAND_INDEX, CATEGORY_TREE, bump_version
+from .models import Attribute, AttributeOption, Brand, Category, CategoryAttribute
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    bump_version(CATEGORY_TREE)
+    # a move changes which attributes a category inherits
+    bump_version(ATTRIBUTE_SCHEMA)
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+@receiver(post_save, sender=AttributeOption)
+@receiver(post_delete, sender=AttributeOption)
+@receiver(post_save, sender=CategoryAttribute)
+@receiver(post_delete, sender=CategoryAttribute)
+def invalidate_attribute_schema(sender, **kwargs):
+    bump_version(ATTRIBUTE_SCHEMA)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_brand_index(sender, **kwargs):
+    bump_version(BRAND_INDEX)
@@ -1,12 +1,12 @@
-from rest_framework import viewsets, permissions, filters
+from django.http import Http404
+from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 # from django.db.models import Q
-from .models import Category, Brand, Tag, Attribute, CategoryAttribute
-from .serializers import (
-    CategorySerializer, BrandSerializer, TagSerializer,
-    AttributeSerializer
-)
+from . import brands
+from .cache import attribute_schema, category_tree
+from .models import Category, Brand, Tag
+from .serializers import CategorySerializer, BrandSerializer, TagSerializer
 
 class IsStaffOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -22,10 +22,44 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=True, methods=["get"], url_path="attributes")
     def attributes(self, request, pk=None):
-        """Return Attribute[] for this category (via CategoryAttribute)."""
-        attr_ids = CategoryAttribute.objects.filter(category_id=pk).values_list("attribute_id", flat=True)
-        attrs = Attribute.objects.filter(id__in=attr_ids).prefetch_related("options").order_by("name")
-        return Response(AttributeSerializer(attrs, many=True).data)
+        """
+        Effective Attribute[] for this category, including attributes
+        inherited from its ancestors, in position order. Cached until an
+        attribute, option, link or category changes.
+        """
+        try:
+            version, schema = attribute_schema(int(pk))
+        except (ValueError, Category.DoesNotExist):
+            raise Http404
+        etag = f'"attribute-schema-{pk}-{version}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(schema, headers={"ETag": etag})
+
+    @action(detail=False, methods=["get"])
+    def tree(self, request):
+        """
+        Full nested category tree, served from a versioned cache.
+        Honours If-None-Match; the ETag only changes when a category does.
+        """
+        version, tree = category_tree()
+        etag = f'"category-tree-{version}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(tree, headers={"ETag": etag})
+
+    @action(detail=True, methods=["get"])
+    def descendants(self, request, pk=None):
+        """Every category below this one (single path-prefix query)."""
+        category = self.get_object()
+        qs = category.descendants().order_by("path")
+        return Response(self.get_serializer(qs, many=True).data)
+
+    @action(detail=True, methods=["get"])
+    def ancestors(self, request, pk=None):
+        """Root-first chain of parents for breadcrumbs (single query)."""
+        category = self.get_object()
+        return Response(self.get_serializer(category.ancestors(), many=True).data)
 
 
 class BrandViewSet(viewsets.ModelViewSet):
@@ -35,6 +69,26 @@ class BrandViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ["name", "slug", "synonyms"]
 
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        ?q=<prefix>&limit=10 -> [{"id", "name", "slug"}], matched against
+        names and synonyms by the in-memory brand index (no DB query).
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 50))
+        except ValueError:
+            limit = 10
+        return Response(brands.autocomplete(request.query_params.get("q", ""), limit))
+
+    @action(detail=False, methods=["get"])
+    def resolve(self, request):
+        """?name=<free text> -> the canonical brand, or 404."""
+        brand = brands.resolve(request.query_params.get("name", ""))
+        if brand is None:
+            raise Http404
+        return Response(brand)
+
 
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all().order_by("name")
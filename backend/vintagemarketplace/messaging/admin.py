@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import Conversation, Message, UserReport
+from .models import Conversation, Message, Notification, UserReport
 
 # Register your models here.
 admin.site.register(Conversation)
 admin.site.register(Message)
 admin.site.register(UserReport)
+admin.site.register(Notification)
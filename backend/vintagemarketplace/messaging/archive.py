@@ -0,0 +1,304 @@
+# messaging/archive.py
+"""
+Cold storage for old message history.
+
+`manage.py archive_conversations` moves messages out of the hot
+messaging_message table into compressed JSONL segment files under
+MEDIA_ROOT (default_storage), one ArchiveSegment row per file:
+
+- conversations deleted by both sides: every message
+- conversations inactive for MESSAGING_ARCHIVE_AFTER_DAYS: messages the
+  recipient has already read, so unread counters never depend on the
+  archive
+
+Soft-deleted messages are dropped instead of archived, and messages a
+UserReport points at stay hot. Archived messages are read-only: they no
+longer appear in search and can't be edited or reacted to.
+
+Cursor pages of ConversationViewSet.messages merge the hot rows with the
+segments covering the same (created_at, id) range (page()), and offset
+pages count and slice both through History, so clients scroll past the hot
+window without noticing. Filtered listings (?q=, ?from=, ?has_image=)
+cover the hot table only.
+
+Segments are gzip by default; MESSAGING_ARCHIVE_CODEC = "zstd" uses the
+optional `zstandard` package.
+"""
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+ARCHIVE_DIR = "message_archive"
+DEFAULT_AFTER_DAYS = 180
+DEFAULT_CODEC = "gzip"
+SEGMENT_SIZE = 1000
+BATCH_SIZE = 100
+
+EXTENSIONS = {"gzip": "jsonl.gz", "zstd": "jsonl.zst"}
+
+
+# ---- codecs ----
+def _compress(codec, data):
+    if codec == "gzip":
+        return gzip.compress(data)
+    return _zstd().ZstdCompressor().compress(data)
+
+
+def _decompress(codec, data):
+    if codec == "gzip":
+        return gzip.decompress(data)
+    return _zstd().ZstdDecompressor().decompress(data)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImproperlyConfigured("zstd message archives need the 'zstandard' package.")
+    return zstandard
+
+
+def codec():
+    name = getattr(settings, "MESSAGING_ARCHIVE_CODEC", DEFAULT_CODEC)
+    if name not in EXTENSIONS:
+        raise ImproperlyConfigured(f"Unknown MESSAGING_ARCHIVE_CODEC {name!r}.")
+    return name
+
+
+# ---- records ----
+def _fields():
+    from .models import Message
+
+    return [f for f in Message._meta.concrete_fields
+            if f.name not in ("conversation", "is_deleted")]
+
+
+def _dump(message):
+    record = {}
+    for field in _fields():
+        value = field.value_from_object(message)
+        if isinstance(value, FieldFile):
+            value = value.name or None
+        elif isinstance(value, datetime):
+            # full precision: cursors compare on created_at
+            value = value.isoformat()
+        record[field.attname] = value
+    return json.dumps(record, ensure_ascii=False)
+
+
+def _load(record, conversation_id):
+    from .models import Message
+
+    values = {field.attname: field.to_python(record[field.attname])
+              for field in _fields() if field.attname in record}
+    message = Message(conversation_id=conversation_id, is_deleted=False, **values)
+    message._state.adding = False
+    return message
+
+
+def _read(segment):
+    with default_storage.open(segment.path, "rb") as fh:
+        data = _decompress(segment.codec, fh.read())
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+# ---- writing ----
+def archivable(convo):
+    """Hot messages of `convo` that may move to cold storage."""
+    from .models import UserReport
+
+    qs = convo.messages.exclude(
+        Exists(UserReport.objects.filter(message=OuterRef("pk"))))
+    if convo.buyer_deleted and convo.seller_deleted:
+        return qs
+    # only what the recipient has read (or nobody will ever see)
+    read = Q(is_deleted=True)
+    if convo.seller_last_read is not None:
+        read |= Q(sender_id=convo.buyer_id, created_at__lte=convo.seller_last_read)
+    if convo.buyer_last_read is not None:
+        read |= Q(sender_id=convo.seller_id, created_at__lte=convo.buyer_last_read)
+    return qs.filter(read)
+
+
+def archive_conversation(convo, segment_size=SEGMENT_SIZE):
+    """
+    Move `convo`'s archivable messages into segments.
+    Returns (messages archived, messages dropped, segments written).
+    """
+    from .models import ArchiveSegment, Conversation
+
+    name = codec()
+    with transaction.atomic():
+        convo = Conversation.objects.select_for_update().get(pk=convo.pk)
+        rows = list(archivable(convo).order_by("created_at", "id"))
+        if not rows:
+            return 0, 0, 0
+        live = [m for m in rows if not m.is_deleted]
+        segments = []
+        for start in range(0, len(live), segment_size):
+            chunk = live[start:start + segment_size]
+            first, last = chunk[0], chunk[-1]
+            path = (f"{ARCHIVE_DIR}/{convo.pk}/"
+                    f"{first.pk}-{last.pk}.{EXTENSIONS[name]}")
+            data = "\n".join(_dump(m) for m in chunk).encode()
+            if default_storage.exists(path):
+                # left behind by a run that rolled back
+                default_storage.delete(path)
+            path = default_storage.save(path, ContentFile(_compress(name, data)))
+            segments.append(ArchiveSegment(
+                conversation=convo, path=path, codec=name, count=len(chunk),
+                first_at=first.created_at, first_id=first.pk,
+                last_at=last.created_at, last_id=last.pk,
+            ))
+        ArchiveSegment.objects.bulk_create(segments)
+        convo.messages.filter(pk__in=[m.pk for m in rows]).delete()
+    return len(live), len(rows) - len(live), len(segments)
+
+
+def archive_inactive(days=None, batch_size=BATCH_SIZE, ids=None):
+    """
+    Archive every conversation inactive for `days` (default:
+    MESSAGING_ARCHIVE_AFTER_DAYS) or deleted by both sides.
+    Returns {"conversations": n, "messages": n, "dropped": n, "segments": n}.
+    """
+    from .models import Conversation, Message
+
+    if days is None:
+        days = getattr(settings, "MESSAGING_ARCHIVE_AFTER_DAYS", DEFAULT_AFTER_DAYS)
+    cutoff = timezone.now() - timedelta(days=days)
+    qs = (Conversation.objects
+          .annotate(activity_at=Coalesce("last_message_at", "created_at"))
+          .filter(Q(activity_at__lt=cutoff) | Q(buyer_deleted=True, seller_deleted=True))
+          .filter(Exists(Message.objects.filter(conversation=OuterRef("pk"))))
+          .order_by("pk"))
+    if ids:
+        qs = qs.filter(pk__in=ids)
+
+    totals = {"conversations": 0, "messages": 0, "dropped": 0, "segments": 0}
+    last_pk = 0
+    while True:
+        batch = list(qs.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for convo in batch:
+            archived, dropped, segments = archive_conversation(convo)
+            if archived or dropped:
+                totals["conversations"] += 1
+            totals["messages"] += archived
+            totals["dropped"] += dropped
+            totals["segments"] += segments
+    return totals
+
+
+# ---- reading ----
+def _key(message):
+    return message.created_at, message.pk
+
+
+def page(conversation_id, before=None, after=None, limit=SEGMENT_SIZE, until=None,
+         oldest_first=False):
+    """
+    Up to `limit` archived messages of a conversation beyond a decoded cursor key,
+    in keyset order: oldest first after `after` (or from the start with
+    `oldest_first`), newest first otherwise
+    (MessageCursorPagination.keyset_queryset). `until` is the far edge of
+    the page when the hot rows already fill it: only archived messages
+    before that key can make it in. Only the segments covering the range
+    are read.
+    """
+    from .models import ArchiveSegment
+
+    forward = bool(after) or oldest_first
+    segments = ArchiveSegment.objects.filter(conversation_id=conversation_id)
+    if forward:
+        if after:
+            at, pk = after
+            segments = segments.filter(Q(last_at__gt=at) | Q(last_at=at, last_id__gt=pk))
+        if until:
+            at, pk = until
+            segments = segments.filter(Q(first_at__lt=at) | Q(first_at=at, first_id__lt=pk))
+        segments = segments.order_by("first_at", "first_id")
+        bound = lambda s: (s.first_at, s.first_id)
+        wanted = lambda m: ((not after or _key(m) > after)
+                            and (until is None or _key(m) < until))
+    else:
+        if before:
+            at, pk = before
+            segments = segments.filter(Q(first_at__lt=at) | Q(first_at=at, first_id__lt=pk))
+        if until:
+            at, pk = until
+            segments = segments.filter(Q(last_at__gt=at) | Q(last_at=at, last_id__gt=pk))
+        segments = segments.order_by("-last_at", "-last_id")
+        bound = lambda s: (s.last_at, s.last_id)
+        wanted = lambda m: ((before is None or _key(m) < before)
+                            and (until is None or _key(m) > until))
+
+    rows = []
+    for segment in segments:
+        # segments may overlap; stop once the next one starts past the page
+        if len(rows) >= limit:
+            edge = _key(rows[limit - 1])
+            if (bound(segment) > edge) if forward else (bound(segment) < edge):
+                break
+        loaded = (_load(record, conversation_id) for record in _read(segment))
+        rows.extend(m for m in loaded if wanted(m))
+        rows.sort(key=_key, reverse=not forward)
+        rows = rows[:limit]
+
+    senders = User.objects.in_bulk({m.sender_id for m in rows})
+    # a deleted account takes its hot messages with it; hide the cold ones too
+    rows = [m for m in rows if m.sender_id in senders]
+    for message in rows:
+        message.sender = senders[message.sender_id]
+    return rows
+
+
+class History:
+    """
+    A conversation's messages, hot and archived, as one sliceable sequence
+    for offset pagination (ConversationViewSet.messages without a cursor):
+    count() covers both, and a slice merges the first rows of each side.
+    Offset pages cost O(offset), like OFFSET on the hot table alone.
+    """
+
+    def __init__(self, queryset, conversation_id, newest_first=False):
+        self.queryset = queryset   # hot rows, already in display order
+        self.conversation_id = conversation_id
+        self.newest_first = newest_first
+
+    def count(self):
+        from .models import ArchiveSegment
+
+        archived = (ArchiveSegment.objects.filter(conversation_id=self.conversation_id)
+                    .aggregate(n=Sum("count"))["n"] or 0)
+        return self.queryset.count() + archived
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        hot = list(self.queryset[:stop])
+        cold = page(self.conversation_id, limit=stop, oldest_first=not self.newest_first)
+        merged = sorted(hot + cold, key=_key, reverse=self.newest_first)
+        return merged[start:stop]
+
+
+def newest_archived(convo):
+    """{"body", "sender_id", "created_at"} of the newest archived message, or None."""
+    rows = page(convo.pk, limit=1)
+    if not rows:
+        return None
+    last = rows[0]
+    return {"body": last.body, "sender_id": last.sender_id, "created_at": last.created_at}
@@ -0,0 +1,186 @@
+# messaging/async_views.py
+"""
+Async-native endpoints for the messaging hot paths.
+
+The DRF viewsets run every request on a worker thread under ASGI and wrap
+each channel-layer send in async_to_sync. These plain Django async views
+serve the same data with the async ORM and authenticate through the shared
+JWT cache (messaging.ws_jwt). Broadcasts are batched per request with
+broadcast.abatch(), which hands the batch to the dispatcher's loop thread
+on exit: the response doesn't wait for the channel-layer sends, and they
+don't run on the request's loop either. Writes still take a single
+sync_to_async hop, since Message.save() keeps the conversation counters in
+one transaction.
+
+    GET  async/conversations/                  inbox page (see ConversationCursorPagination)
+    GET  async/conversations/<id>/messages/    cursor page (see MessageCursorPagination)
+    POST async/conversations/<id>/read/        debounced read receipt
+    POST async/messages/                       create (idempotent on client_id)
+
+Authentication: `Authorization: Bearer <access token>`.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import ValidationError
+
+from . import blocks, broadcast, membership, receipts
+from .models import ClientIdConflict, Conversation, Message
+from .serializers import ConversationSerializer, MessageSerializer
+from .utils import broadcast_new_message
+from .views import ConversationCursorPagination, MessageCursorPagination
+from .ws_jwt import authenticate_token
+
+
+def jwt_required(view):
+    """Set request.user from a Bearer token, or answer 401."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        user = None
+        if scheme.lower() == "bearer" and token:
+            user = await authenticate_token(token.strip())
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."},
+                                status=401)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def _not_found():
+    return JsonResponse({"detail": "Not found."}, status=404)
+
+
+@require_GET
+@jwt_required
+async def conversation_list(request):
+    """
+    My conversations, same rows and order as the ConversationViewSet list.
+    ?cursor=<c> continues from a previous page.
+    """
+    user = request.user
+    qs = (Conversation.objects
+          .filter(Q(buyer=user) | Q(seller=user))
+          .select_related("item", "buyer", "seller", "last_message_sender"))
+    ids = await sync_to_async(blocks.blocked_ids)(user.id)
+    if ids:
+        qs = qs.exclude(Q(buyer__in=ids) | Q(seller__in=ids))
+
+    pager = ConversationCursorPagination()
+    try:
+        qs = pager.keyset_queryset(qs, request.GET.get("cursor"))
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+
+    size = pager.get_page_size(request)
+    rows = [c async for c in qs[:size + 1]]
+    has_more = len(rows) > size
+    rows = rows[:size]
+    data = ConversationSerializer(rows, many=True, context={"for_user": user}).data
+    return JsonResponse({
+        "results": data,
+        "cursor": pager.encode_cursor(rows[-1]) if has_more else None,
+        "has_more": has_more,
+    })
+
+
+@require_GET
+@jwt_required
+async def conversation_messages(request, pk):
+    """Cursor page of a conversation's messages (?before / ?after / ?newest_first)."""
+    if not await membership.ais_participant(pk, request.user.id):
+        return _not_found()
+
+    newest_first = str(request.GET.get("newest_first", "")).lower() in {"1", "true", "yes", "on"}
+    pager = MessageCursorPagination()
+    after = request.GET.get("after")
+    try:
+        qs = pager.keyset_queryset(
+            Message.objects.filter(conversation_id=pk, is_deleted=False).select_related("sender"),
+            request.GET.get("before"), after,
+        )
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+
+    size = pager.get_page_size(request)
+    rows = [m async for m in qs[:size + 1]]
+    rows = await sync_to_async(pager.merge_archived)(
+        rows, pk, request.GET.get("before"), after, size + 1)
+    page = pager.finish_page(rows, size, after, newest_first=newest_first)
+    data = MessageSerializer(page, many=True, context={"request": request}).data
+    return JsonResponse(pager.page_data(data))
+
+
+@require_POST
+@jwt_required
+async def conversation_read(request, pk):
+    if not await membership.ais_participant(pk, request.user.id):
+        return _not_found()
+    try:
+        convo = await Conversation.objects.only("id", "last_message_at").aget(pk=pk)
+    except Conversation.DoesNotExist:
+        # deleted since membership was cached
+        return _not_found()
+    async with broadcast.abatch():
+        await receipts.amark_read(request.user, convo)
+    return JsonResponse({"ok": True})
+
+
+@require_POST
+@jwt_required
+async def message_create(request):
+    """
+    {"conversation": <id>, "body": "...", "client_id": "..."} -> 201 with the
+    stored message, or 200 with the original one for a repeated client_id.
+    """
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"detail": "Malformed JSON."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"detail": "Malformed JSON."}, status=400)
+
+    convo_id = payload.get("conversation")
+    body = str(payload.get("body") or "").strip()
+    client_id = str(payload.get("client_id") or "")[:64] or None
+    if not body:
+        return JsonResponse({"body": ["This field is required."]}, status=400)
+
+    user = request.user
+    if not await membership.ais_participant(convo_id, user.id):
+        return JsonResponse({"detail": "Not a participant."}, status=403)
+    members = membership.participants(convo_id)   # local hit after the check
+    other_id = members[1] if members[0] == user.id else members[0]
+    if await sync_to_async(blocks.is_blocked)(user.id, other_id):
+        return JsonResponse({"detail": "Messaging is blocked between these users."}, status=403)
+
+    async with broadcast.abatch():
+        try:
+            data, created = await sync_to_async(_store_message)(
+                request, convo_id, user, body, client_id)
+        except Conversation.DoesNotExist:
+            # deleted since membership was cached
+            return _not_found()
+        except ClientIdConflict:
+            return JsonResponse({"client_id": ["Already used in another conversation."]},
+                                status=400)
+    return JsonResponse(data, status=201 if created else 200)
+
+
+def _store_message(request, convo_id, user, body, client_id):
+    """
+    The write itself; its broadcasts are collected by the caller's abatch()
+    and handed to the broadcast dispatcher's loop thread when it closes.
+    """
+    convo = Conversation.objects.get(pk=convo_id)
+    message, created = Message.create_once(convo, user, client_id=client_id, body=body)
+    data = MessageSerializer(message, context={"request": request}).data
+    if created:
+        broadcast_new_message(message, data, origin="async.message_create")
+    return data, created
@@ -0,0 +1,77 @@
+# messaging/blocks.py
+"""
+Cached block relationships.
+
+blocked_ids(user_id) is every user on the other side of a block with
+`user_id`, in either direction (they blocked me, or I blocked them). It is
+one query on a miss, then served from the shared cache until a UserBlock
+touching that user is created or deleted (messaging.signals). With a
+process-local cache that invalidation only reaches the saving worker, so
+entries there live LOCAL_TIMEOUT seconds instead.
+
+Listings apply it through BlockFilterMixin:
+
+    class ItemViewSet(BlockFilterMixin, viewsets.ModelViewSet):
+        block_filter_fields = ("seller",)
+
+        def get_queryset(self):
+            return self.exclude_blocked(super().get_queryset())
+"""
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Q
+
+BLOCKS_KEY = "messaging:blocks:{user_id}"
+TIMEOUT = 60 * 60 * 24
+LOCAL_TIMEOUT = 30
+
+
+def timeout():
+    return LOCAL_TIMEOUT if isinstance(caches["default"], LocMemCache) else TIMEOUT
+
+
+def blocked_ids(user_id):
+    """frozenset of user ids with a block to or from `user_id`."""
+    if not user_id:
+        return frozenset()
+    key = BLOCKS_KEY.format(user_id=user_id)
+    ids = cache.get(key)
+    if ids is None:
+        from .models import UserBlock
+        pairs = (UserBlock.objects
+                 .filter(Q(blocker_id=user_id) | Q(blocked_id=user_id))
+                 .values_list("blocker_id", "blocked_id"))
+        ids = sorted({blocked if blocker == user_id else blocker for blocker, blocked in pairs})
+        cache.set(key, ids, timeout())
+    return frozenset(ids)
+
+
+def is_blocked(user_id, other_id):
+    """True if either user blocked the other."""
+    if not user_id or not other_id:
+        return False
+    return other_id in blocked_ids(user_id)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([BLOCKS_KEY.format(user_id=uid) for uid in user_ids])
+
+
+class BlockFilterMixin:
+    """
+    Viewset helper: drop rows whose `block_filter_fields` (user FKs) point at
+    someone blocked by, or blocking, the requesting user.
+    """
+    block_filter_fields = ()
+
+    def exclude_blocked(self, qs, user=None):
+        user = user or self.request.user
+        if not user.is_authenticated:
+            return qs
+        ids = blocked_ids(user.id)
+        if not ids:
+            return qs
+        condition = Q()
+        for name in self.block_filter_fields:
+            condition |= Q(**{f"{name}__in": ids})
+        return qs.exclude(condition)
@@ -0,0 +1,249 @@
+# messaging/broadcast.py
+"""
+Coalesced channel-layer fan-out.
+
+Views used to call async_to_sync(channel_layer.group_send) once per
+recipient/event inside the request thread: one event-loop hop and one Redis
+round trip each. Instead:
+
+    from messaging import broadcast
+    broadcast.send(f"chat_{convo.id}", {"type": "chat.message", ...})
+    broadcast.send(f"inbox_user_{uid}", {...}, key=("upsert", convo.id))
+
+- Events are only collected once the surrounding transaction commits
+  (rolled-back work never reaches clients).
+- Within a batch (one HTTP request, see BroadcastBatchMiddleware, or an
+  explicit `with broadcast.batch():`) events are buffered; a later event with
+  the same (group, key) replaces an earlier one.
+- When the batch closes, all events are sent concurrently with one
+  asyncio.gather on a long-lived loop thread, so the request never waits on
+  the channel layer and cost no longer grows with the recipient count.
+- Async views get the same batching through `async with broadcast.abatch():`
+  (the middleware runs in async mode under ASGI); their batch goes to the
+  same loop thread on exit, so the response doesn't wait on it either.
+
+settings.MESSAGING_BROADCAST_SYNC = True flushes inline instead (tests).
+dispatcher.stats.snapshot() exposes queue depth and flush latency.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+log = logging.getLogger(__name__)
+
+# events waiting in the loop thread before we start warning about it
+QUEUE_DEPTH_WARNING = 1000
+
+_batch = contextvars.ContextVar("broadcast_batch", default=None)
+
+
+class BroadcastStats:
+    """Thread-safe counters for the dispatcher."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queue_depth = 0
+            self.max_queue_depth = 0
+            self.batches = 0
+            self.events = 0
+            self.coalesced = 0
+            self.errors = 0
+            self.last_flush_ms = 0.0
+            self.max_flush_ms = 0.0
+            self.total_flush_ms = 0.0
+
+    def queued(self, n):
+        with self._lock:
+            self.queue_depth += n
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            return self.queue_depth
+
+    def coalesce(self):
+        with self._lock:
+            self.coalesced += 1
+
+    def flushed(self, n, elapsed_ms, errors=0):
+        with self._lock:
+            self.queue_depth -= n
+            self.batches += 1
+            self.events += n
+            self.errors += errors
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "events": self.events,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0,
+            }
+
+
+class _Batch:
+    def __init__(self):
+        self.events = {}   # (group, key) -> event, insertion-ordered
+
+    def add(self, group, event, key, stats):
+        slot = (group, key if key is not None else object())
+        if slot in self.events:
+            del self.events[slot]   # re-insert so the newest event keeps its place last
+            stats.coalesce()
+        self.events[slot] = event
+
+    def drain(self):
+        events = [(group, event) for (group, _), event in self.events.items()]
+        self.events = {}
+        return events
+
+
+class BroadcastDispatcher:
+    def __init__(self):
+        self.stats = BroadcastStats()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._inflight = set()
+
+    # -- producer side -------------------------------------------------------
+
+    def send(self, group, event, key=None):
+        """Queue `event` for `group` once the current transaction commits."""
+        transaction.on_commit(lambda: self._collect(group, event, key))
+
+    def _collect(self, group, event, key):
+        batch = _batch.get()
+        if batch is None:
+            self._dispatch([(group, event)])
+        else:
+            batch.add(group, event, key, self.stats)
+
+    @contextmanager
+    def batch(self):
+        """Buffer every send() in this block and flush them together on exit."""
+        if _batch.get() is not None:
+            yield
+            return
+        current = _Batch()
+        token = _batch.set(current)
+        try:
+            yield
+        finally:
+            _batch.reset(token)
+            self._dispatch(current.drain())
+
+    @asynccontextmanager
+    async def abatch(self):
+        """
+        batch() for async callers: sends collected in this block (including
+        from sync_to_async hops, which share the context) are handed to the
+        dispatcher loop on exit without blocking the caller's loop.
+        """
+        if _batch.get() is not None:
+            yield
+            return
+        current = _Batch()
+        token = _batch.set(current)
+        try:
+            yield
+        finally:
+            _batch.reset(token)
+            await self._adispatch(current.drain())
+
+    # -- flushing ------------------------------------------------------------
+
+    def _dispatch(self, events):
+        if not events:
+            return
+        depth = self.stats.queued(len(events))
+        if depth > QUEUE_DEPTH_WARNING:
+            log.warning("broadcast queue depth %s", depth)
+        if getattr(settings, "MESSAGING_BROADCAST_SYNC", False):
+            async_to_sync(self._flush)(events)
+            return
+        future = asyncio.run_coroutine_threadsafe(self._flush(events), self._get_loop())
+        self._inflight.add(future)
+        future.add_done_callback(self._inflight.discard)
+
+    async def _adispatch(self, events):
+        if not getattr(settings, "MESSAGING_BROADCAST_SYNC", False):
+            # scheduled on the loop thread, not awaited: off the request path
+            self._dispatch(events)
+            return
+        if events:
+            self.stats.queued(len(events))
+            await self._flush(events)
+
+    async def _flush(self, events):
+        layer = get_channel_layer()
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(layer.group_send(group, event) for group, event in events),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        for exc in errors:
+            log.warning("broadcast failed: %r", exc)
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.stats.flushed(len(events), elapsed_ms, errors=len(errors))
+        log.debug("broadcast flushed %s events in %.1fms", len(events), elapsed_ms)
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="broadcast-dispatcher",
+                                 daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def drain(self, timeout=5):
+        """Block until every queued flush finished (shutdown hooks, tests)."""
+        deadline = time.monotonic() + timeout
+        for future in list(self._inflight):
+            future.result(timeout=max(0, deadline - time.monotonic()))
+
+
+dispatcher = BroadcastDispatcher()
+send = dispatcher.send
+batch = dispatcher.batch
+abatch = dispatcher.abatch
+
+
+class BroadcastBatchMiddleware:
+    """One broadcast batch per HTTP request, flushed after the response is built."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with dispatcher.batch():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        async with dispatcher.abatch():
+            return await self.get_response(request)
@@ -1,20 +1,43 @@
+import asyncio
 import json
 from channels.generic.websocket import (AsyncWebsocketConsumer,
                                         AsyncJsonWebsocketConsumer)
+from channels.consumer import get_handler_name
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
 from .models import Conversation
 from urllib.parse import parse_qs
 from rest_framework.authtoken.models import Token # or your JWT checker
-from django.db.models import Q, Subquery, OuterRef
-from .models import Conversation, Message
+from django.db.models import Q
+from .models import ClientIdConflict, Conversation, Message
 from .serializers import ConversationSerializer, MessageSerializer
+from . import blocks, broadcast, eventlog, events, membership, presence
+from .utils import broadcast_new_message, decode_cursor, encode_cursor
 import logging
 
 
 log = logging.getLogger(__name__)
 
 class InboxConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Inbox snapshot protocol:
+
+    - connect `ws/inbox/?page_size=N&since=<sync_token>`
+    - server sends the first `conversations_snapshot` page straight away:
+      {"conversations": [...], "cursor": <str|null>, "has_more": bool,
+       "sync_token": <str>, "incremental": bool}
+    - client asks for more with {"type": "snapshot_more", "cursor": <cursor>}
+    - on reconnect, pass the last `sync_token` as `since` to receive only
+      conversations changed after that sync.
+
+    Pages are keyed on (updated_at, id), newest first. Anything that changes
+    while the client pages through arrives as a live upsert anyway.
+    """
+    SNAPSHOT_PAGE_SIZE = 50
+    SNAPSHOT_MAX_PAGE_SIZE = 200
+
     async def connect(self):
         log.warning("InboxConsumer: ENTER connect()")
         user = self.scope.get("user")
@@ -26,7 +49,7 @@ class InboxConsumer(AsyncJsonWebsocketConsumer):
             return
 
         self.user = user
-        self.group = f"inbox_user_{user.id}"
+        self.group = events.inbox_group(user.id)
 
         try:
             log.warning("InboxConsumer: about to ACCEPT")
@@ -40,13 +63,26 @@ class InboxConsumer(AsyncJsonWebsocketConsumer):
                 return
 
             log.warning("InboxConsumer: about to GROUP_ADD %s", self.group)
-            await self.channel_layer.group_add(self.group, self.channel_name)
+            await events.join(self, self.group)
             log.warning("InboxConsumer: GROUP_ADD done")
+            self.presence = presence.Heartbeat(user.id, self.channel_name,
+                                               also=[events.registry.key(self.group)])
+            await self.presence.start()
+
+            params = parse_qs(self.scope.get("query_string", b"").decode())
+            self.page_size = self._page_size((params.get("page_size") or [None])[0])
+            self.since = None
+            since = (params.get("since") or [None])[0]
+            if since:
+                try:
+                    self.since, _ = decode_cursor(since)
+                except ValueError:
+                    log.warning("InboxConsumer: ignoring bad since token %r", since)
+            # taken before the first query so nothing can slip between syncs
+            self.sync_token = encode_cursor(timezone.now(), 0)
 
             log.warning("InboxConsumer: about to SNAPSHOT")
-            convos = await self._snapshot_conversations()
-            log.warning("InboxConsumer: SNAPSHOT done (%d items)", len(convos))
-            await self.send_json({"type": "conversations_snapshot", "conversations": convos})
+            await self._send_snapshot_page(cursor=None)
             log.warning("InboxConsumer: SNAPSHOT sent")
 
         except Exception:
@@ -59,11 +95,42 @@ class InboxConsumer(AsyncJsonWebsocketConsumer):
 
     async def disconnect(self, code):
         try:
+            if hasattr(self, "presence"):
+                await self.presence.stop()
             if hasattr(self, "group"):
-                await self.channel_layer.group_discard(self.group, self.channel_name)
+                await events.leave(self, self.group)
         except Exception:
             log.exception("InboxConsumer.disconnect error")
 
+    async def receive_json(self, content, **kwargs):
+        if content.get("type") == "snapshot_more":
+            cursor = content.get("cursor")
+            if not cursor:
+                await self.send_json({"type": "error", "detail": "cursor required"})
+                return
+            try:
+                await self._send_snapshot_page(cursor=decode_cursor(cursor))
+            except ValueError:
+                await self.send_json({"type": "error", "detail": "invalid cursor"})
+
+    async def _send_snapshot_page(self, cursor):
+        convos, next_cursor = await self._snapshot_conversations(cursor=cursor)
+        await self.send_json({
+            "type": "conversations_snapshot",
+            "conversations": convos,
+            "cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "sync_token": self.sync_token,
+            "incremental": self.since is not None,
+        })
+
+    def _page_size(self, raw):
+        try:
+            size = int(raw)
+        except (TypeError, ValueError):
+            return self.SNAPSHOT_PAGE_SIZE
+        return max(1, min(size, self.SNAPSHOT_MAX_PAGE_SIZE))
+
     async def inbox_message_new(self, event):
         await self.send_json({"type": "message_new", **event})
 
@@ -76,40 +143,194 @@ class InboxConsumer(AsyncJsonWebsocketConsumer):
     async def inbox_unread_counts(self, event):
         await self.send_json({"type": "unread_counts", **event})
 
+    async def inbox_read(self, event):
+        await self.send_json({"type": "read", **event})
+
 
     @database_sync_to_async
-    def _snapshot_conversations(self):
-        last = Message.objects.filter(conversation=OuterRef("pk")).order_by("-created_at")
-        qs = (
-            Conversation.objects
-            .filter(Q(buyer=self.user) | Q(seller=self.user))
-            .annotate(
-                last_message_body=Subquery(last.values("body")[:1]),
-                last_message_sender_username=Subquery(last.values("sender__username")[:1]),
-                last_message_at=Subquery(last.values("created_at")[:1]),
-            )
-            .select_related("item", "buyer", "seller")
-            .order_by("-last_message_at", "-created_at")
+    def _snapshot_conversations(self, cursor=None):
+        qs = Conversation.objects.filter(Q(buyer=self.user) | Q(seller=self.user))
+        if self.since is not None:
+            # >= : re-sending an unchanged row is harmless, missing one isn't
+            qs = qs.filter(updated_at__gte=self.since)
+        if cursor is not None:
+            updated_at, pk = cursor
+            qs = qs.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, pk__lt=pk))
+        rows = list(
+            qs.select_related("item", "buyer", "seller", "last_message_sender")
+            .order_by("-updated_at", "-id")[:self.page_size + 1]
         )
-        return ConversationSerializer(qs, many=True, context={"for_user": self.user}).data
+        next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].pk)
+        data = ConversationSerializer(rows, many=True, context={"for_user": self.user}).data
+        return data, next_cursor
+
+
+class TypingState:
+    """
+    Per-connection typing debouncer: idle -> typing -> idle.
+
+    The first keystroke emits "started"; further keystrokes only push the
+    deadline out. After `window` seconds without one (or on stop()) it emits
+    "stopped". So a connection sends at most one start and one stop per
+    window, however often the client pings.
+    """
+
+    def __init__(self, window, emit):
+        self.window = window
+        self._emit = emit          # async callable(is_typing: bool)
+        self.typing = False
+        self._deadline = 0.0
+        self._timer = None
+
+    async def ping(self):
+        loop = asyncio.get_running_loop()
+        self._deadline = loop.time() + self.window
+        if not self.typing:
+            self.typing = True
+            await self._emit(True)
+            self._timer = loop.create_task(self._expire())
+
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.typing:
+            self.typing = False
+            await self._emit(False)
+
+    async def _expire(self):
+        loop = asyncio.get_running_loop()
+        while (delay := self._deadline - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        self._timer = None
+        self.typing = False
+        await self._emit(False)
 
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Chat room for one conversation.
+
+    Messages and read receipts carry the conversation's event `seq`. A client
+    that reconnects with `?resume_from=<last seq seen>` gets the missed
+    events replayed in order, then {"type": "resumed", "seq": n}; if the gap
+    is no longer buffered it gets {"type": "resync", "seq": n} and should
+    reload the thread. Events are never delivered twice on one connection.
+
+    Live events can arrive out of seq order (per-request batches and
+    receipt flushes commit independently). One that skips ahead is held
+    back until the missing seqs arrive; if they haven't after
+    GAP_WAIT_SECONDS they are replayed from the event log, or the client
+    gets a resync.
+    """
+    # typing indicator window; see TypingState
+    TYPING_WINDOW_SECONDS = 3.0
+    GAP_WAIT_SECONDS = 0.5
+
     async def connect(self):
         self.convo_id = self.scope["url_route"]["kwargs"]["convo_id"]
-        self.group = f"chat_{self.convo_id}"
+        self.group = events.chat_group(self.convo_id)
         user = self.scope.get("user") or AnonymousUser()
 
         if not await self._user_is_participant(getattr(user, "id", None), self.convo_id):
             await self.close(code=4403)
             return
 
-        await self.channel_layer.group_add(self.group, self.channel_name)
+        await events.join(self, self.group)
         await self.accept()
+        self.presence = presence.Heartbeat(user.id, self.channel_name,
+                                           also=[events.registry.key(self.group)])
+        await self.presence.start()
+        self.typing = TypingState(
+            getattr(settings, "CHAT_TYPING_WINDOW_SECONDS", self.TYPING_WINDOW_SECONDS),
+            self._publish_typing,
+        )
+        self._pending = {}      # seq -> frame held back until the gap closes
+        self._gap_timer = None
         await self.send(json.dumps({"type": "hello", "room": self.convo_id}))
 
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        resume_from = (params.get("resume_from") or [None])[0]
+        if resume_from is not None:
+            try:
+                resume_from = int(resume_from)
+            except ValueError:
+                resume_from = -1   # answered with a resync
+            await self._resume(resume_from)
+        else:
+            # joined above: every event after this seq reaches the socket
+            self.last_seq = await database_sync_to_async(eventlog.current)(self.convo_id)
+
+    async def _resume(self, after_seq):
+        # the group was joined first, so anything newer than the replay is
+        # already queued for this socket and skipped as seen if it overlaps
+        replayed, current, complete = await database_sync_to_async(eventlog.replay)(
+            self.convo_id, after_seq)
+        if not complete:
+            self.last_seq = current
+            await self.send_json({"type": "resync", "seq": current})
+            return
+        self.last_seq = after_seq
+        for event in replayed:
+            await getattr(self, get_handler_name(event))(event)
+        await self.send_json({"type": "resumed", "seq": self.last_seq})
+
+    async def _sequenced(self, event, frame):
+        """
+        Send `frame` for `event` in seq order: duplicates are dropped, and
+        an event past a gap waits in _pending (see chat_fill_gap).
+        """
+        seq = event.get("seq")
+        if seq is None:
+            await self.send_json(frame)
+            return
+        if seq <= self.last_seq:
+            return
+        if seq > self.last_seq + 1:
+            self._pending[seq] = frame
+            if self._gap_timer is None:
+                self._gap_timer = asyncio.get_running_loop().create_task(self._wait_for_gap())
+            return
+        await self.send_json(frame)
+        self.last_seq = seq
+        while (frame := self._pending.pop(self.last_seq + 1, None)) is not None:
+            await self.send_json(frame)
+            self.last_seq += 1
+
+    async def _wait_for_gap(self):
+        await asyncio.sleep(getattr(settings, "CHAT_GAP_WAIT_SECONDS", self.GAP_WAIT_SECONDS))
+        # back through the channel so the fill runs in order with live events
+        await self.channel_layer.send(self.channel_name, {"type": "chat.fill_gap"})
+
+    async def chat_fill_gap(self, event):
+        self._gap_timer = None
+        if not self._pending:
+            return
+        replayed, current, complete = await database_sync_to_async(eventlog.replay)(
+            self.convo_id, self.last_seq)
+        if complete:
+            for missed in replayed:
+                await getattr(self, get_handler_name(missed))(missed)
+        else:
+            self.last_seq = max(current, self.last_seq)
+            await self.send_json({"type": "resync", "seq": self.last_seq})
+        self._pending = {seq: frame for seq, frame in self._pending.items()
+                         if seq > self.last_seq}
+        if self._pending:
+            self._gap_timer = asyncio.get_running_loop().create_task(self._wait_for_gap())
+
     async def disconnect(self, code):
-        await self.channel_layer.group_discard(self.group, self.channel_name)
+        if getattr(self, "_gap_timer", None) is not None:
+            self._gap_timer.cancel()
+        if hasattr(self, "typing"):
+            await self.typing.stop()
+        if hasattr(self, "presence"):
+            await self.presence.stop()
+        if hasattr(self, "group") and self.channel_layer:
+            await events.leave(self, self.group)
 
     async def receive(self, text_data=None, bytes_data=None):
         if not text_data:
@@ -120,22 +341,68 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             return
 
         if payload.get("type") == "typing":
-            await self.channel_layer.group_send(self.group, {
-                "type": "typing.event",
-                "username": getattr(self.scope.get("user"), "username", "anon"),
-            })
+            # {"type": "typing"} per keystroke; {"type": "typing", "is_typing": false} to stop
+            if payload.get("is_typing", True) is False:
+                await self.typing.stop()
+            else:
+                await self.typing.ping()
             return
 
-        msg = (payload.get("message") or "").strip()
-        if not msg:
+        # {"type": "message", "body": "...", "client_id": "<uuid>"}; the legacy
+        # {"message": "..."} frame is accepted too
+        body = payload.get("body") or payload.get("message") or ""
+        body = body.strip() if isinstance(body, str) else ""
+        if not body:
             return
+        await self.typing.stop()
 
-        sender = getattr(self.scope.get("user"), "username", "anon")
-        await self.channel_layer.group_send(self.group, {
-            "type": "chat.message",
-            "sender": sender,
-            "message": msg,
-        })
+        client_id = payload.get("client_id")
+        if client_id is not None and (not isinstance(client_id, str) or not 0 < len(client_id) <= 64):
+            await self.send_json({"type": "error", "code": "invalid_client_id", "client_id": None})
+            return
+        await self.send_json(await self._store_message(body, client_id))
+
+    @database_sync_to_async
+    def _store_message(self, body, client_id):
+        """
+        Persist and fan out a chat message; returns the frame for the sender:
+        {"type": "ack", "client_id", "id", "created_at", "duplicate"} or an error.
+        A repeated client_id is acked with the stored message and not re-broadcast.
+        """
+        user = self.scope["user"]
+        members = membership.participants(self.convo_id)
+        if members is None or user.id not in members:
+            return {"type": "error", "code": "not_participant", "client_id": client_id}
+        other_id = members[1] if user.id == members[0] else members[0]
+        if blocks.is_blocked(user.id, other_id):
+            return {"type": "error", "code": "blocked", "client_id": client_id}
+
+        try:
+            convo = Conversation.objects.get(pk=self.convo_id)
+        except Conversation.DoesNotExist:
+            # deleted since membership was cached
+            return {"type": "error", "code": "not_found", "client_id": client_id}
+        with broadcast.batch():
+            try:
+                message, created = Message.create_once(convo, user, client_id=client_id, body=body)
+            except ClientIdConflict:
+                return {"type": "error", "code": "client_id_conflict", "client_id": client_id}
+            if created:
+                broadcast_new_message(message, MessageSerializer(message).data, origin="ws")
+        return {
+            "type": "ack",
+            "client_id": client_id,
+            "id": message.pk,
+            "created_at": message.created_at.isoformat(),
+            "duplicate": not created,
+        }
+
+    async def _publish_typing(self, is_typing):
+        await events.apublish(
+            self.channel_layer, events.TYPING, self.group,
+            username=getattr(self.scope.get("user"), "username", "anon"),
+            is_typing=is_typing,
+        )
 
     async def chat_message(self, event):
         if "sender" not in event or "message" not in event:
@@ -152,28 +419,39 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             "created_at": None,
         }
 
-        await self.send(json.dumps({"type": "chat_message", "message": payload}))
+        await self._sequenced(event, {"type": "chat_message", "message": payload,
+                                      "seq": event.get("seq")})
+
+    async def chat_message_image(self, event):
+        # renditions for an image message are ready
+        await self.send_json({"type": "message_image", **event})
+
+    # edits, deletes and reactions arrive as deltas keyed by message_id
+    async def chat_message_edited(self, event):
+        await self._sequenced(event, {**event, "type": "message_edited"})
+
+    async def chat_message_deleted(self, event):
+        await self._sequenced(event, {**event, "type": "message_deleted"})
+
+    async def chat_message_reaction(self, event):
+        await self._sequenced(event, {**event, "type": "message_reaction"})
+
     async def typing_event(self, event):
         await self.send(json.dumps({
             "type": "typing",
             "username": event["username"],
+            "is_typing": event.get("is_typing", True),
         }))
 
     async def read_receipt(self, event):
         # fan out to both clients in this room
-        await self.send_json({
+        await self._sequenced(event, {
             "type": "read_receipt",
             "conversation_id": event["conversation_id"],
             "reader_username": event["reader_username"],
             "last_read_at": event["last_read_at"],
+            "seq": event.get("seq"),
         })
 
-    @database_sync_to_async
-    def _user_is_participant(self, user_id, convo_id):
-        if not user_id:
-            return False
-        try:
-            c = Conversation.objects.get(pk=convo_id)
-            return c.buyer_id == user_id or c.seller_id == user_id
-        except Conversation.DoesNotExist:
-            return False
+    async def _user_is_participant(self, user_id, convo_id):
+        return await membership.ais_participant(convo_id, user_id)
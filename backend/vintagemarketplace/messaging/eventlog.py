@@ -0,0 +1,91 @@
+# messaging/eventlog.py
+"""
+Per-conversation event log for gap-free chat resume.
+
+Every chat event that changes state (new, edited or deleted message,
+reaction, read receipt) gets the
+conversation's next sequence number (Conversation.event_seq, bumped in the
+same UPDATE as the rest of the denormalized state) and is stored as
+broadcast in ChatEvent before it goes out. Clients remember the last `seq`
+they saw and reconnect with `ws/chat/<id>/?resume_from=<seq>`; the
+consumer replays only the newer events, or answers `resync` when the gap
+is no longer in the buffer.
+
+The buffer is bounded to MESSAGING_REPLAY_BUFFER events per conversation;
+older rows are pruned every PRUNE_EVERY appends.
+"""
+from django.conf import settings
+from django.db.models import F
+
+from . import events
+
+DEFAULT_BUFFER = 500
+PRUNE_EVERY = 50
+
+
+def buffer_size():
+    return getattr(settings, "MESSAGING_REPLAY_BUFFER", DEFAULT_BUFFER)
+
+
+def next_seq(conversation_id):
+    """Claim the conversation's next seq; call inside the change's transaction."""
+    from .models import Conversation
+
+    Conversation.objects.filter(pk=conversation_id).update(event_seq=F("event_seq") + 1)
+    return (Conversation.objects.filter(pk=conversation_id)
+            .values_list("event_seq", flat=True).get())
+
+
+def record(entries):
+    """Store [(conversation_id, seq, event), ...] in the replay buffer."""
+    from .models import ChatEvent
+
+    ChatEvent.objects.bulk_create(
+        [ChatEvent(conversation_id=cid, seq=seq, event=event) for cid, seq, event in entries],
+        ignore_conflicts=True,
+    )
+    limit = buffer_size()
+    for cid, seq, _ in entries:
+        if seq % PRUNE_EVERY == 0:
+            ChatEvent.objects.filter(conversation_id=cid, seq__lte=seq - limit).delete()
+
+
+def publish(conversation_id, seq, event_type, key=None, **values):
+    """
+    Log a chat event under `seq` (None: claim the next one), then broadcast
+    it to the open chat once the transaction commits.
+    """
+    if seq is None:
+        seq = next_seq(conversation_id)
+    record([(conversation_id, seq, event_type.build(seq=seq, **values))])
+    return events.publish(event_type, events.chat_group(conversation_id),
+                          key=key, seq=seq, **values)
+
+
+def current(conversation_id):
+    """The conversation's latest seq (0 before its first event)."""
+    from .models import Conversation
+
+    return (Conversation.objects.filter(pk=conversation_id)
+            .values_list("event_seq", flat=True).first()) or 0
+
+
+def replay(conversation_id, after_seq):
+    """
+    (events, current_seq, complete) for everything after `after_seq`.
+    `complete` is False when the buffer no longer covers the whole gap
+    (or the client is ahead of us); the client must then reload.
+    """
+    from .models import ChatEvent
+
+    latest = current(conversation_id)
+    missed = latest - after_seq
+    if missed < 0 or missed > buffer_size():
+        return [], latest, False
+    if missed == 0:
+        return [], latest, True
+    rows = list(ChatEvent.objects
+                .filter(conversation_id=conversation_id, seq__gt=after_seq, seq__lte=latest)
+                .order_by("seq").values_list("seq", "event"))
+    complete = [seq for seq, _ in rows] == list(range(after_seq + 1, latest + 1))
+    return ([event for _, event in rows] if complete else []), latest, complete
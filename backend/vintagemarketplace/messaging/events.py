@@ -0,0 +1,196 @@
+# messaging/events.py
+"""
+Typed event bus for messaging websockets.
+
+This module owns:
+- group names: inbox_group(user_id) -> "inbox_user_{id}" (InboxConsumer),
+  chat_group(conversation_id) -> "chat_{id}" (ChatConsumer)
+- event schemas: every channel-layer event is an EventType with a version tag
+  ("v" in the payload) and typed fields, validated once at publish time
+- a subscriber registry: consumers join()/leave() groups through here, which
+  keeps per-channel group memberships alive in the presence store, and
+  publishing to a group that provably has no subscribers is skipped instead
+  of paying for the send
+
+    events.publish(events.CONVERSATION_UPSERT, events.inbox_group(uid),
+                   key=("conversation_upsert", convo.id), conversation=data)
+
+publish() is for sync code (views, signals) and goes through the batching
+dispatcher in messaging.broadcast; apublish() is for consumers.
+"""
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from . import broadcast, presence
+
+log = logging.getLogger(__name__)
+
+INBOX_GROUP = "inbox_user_{user_id}"
+CHAT_GROUP = "chat_{conversation_id}"
+
+SUBSCRIBERS_KEY = "group:{group}"
+
+
+def inbox_group(user_id):
+    return INBOX_GROUP.format(user_id=user_id)
+
+
+def chat_group(conversation_id):
+    return CHAT_GROUP.format(conversation_id=conversation_id)
+
+
+class EventSchemaError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class EventType:
+    name: str                                     # channel-layer "type"
+    version: int
+    fields: dict                                  # required field -> type(s)
+    optional: dict = field(default_factory=dict)  # optional field -> type(s)
+
+    def build(self, **values):
+        """Validated channel-layer event; raises EventSchemaError."""
+        missing = self.fields.keys() - values.keys()
+        unknown = values.keys() - self.fields.keys() - self.optional.keys()
+        if missing or unknown:
+            raise EventSchemaError(
+                f"{self.name} v{self.version}: missing {sorted(missing)}, unknown {sorted(unknown)}")
+        for name, value in values.items():
+            expected = self.fields.get(name) or self.optional[name]
+            if not isinstance(value, expected):
+                raise EventSchemaError(f"{self.name} v{self.version}: {name} is {type(value).__name__}")
+        return {"type": self.name, "v": self.version, **values}
+
+
+# inbox_user_{id}
+CONVERSATION_UPSERT = EventType("inbox.conversation_upsert", 1, {"conversation": dict})
+CONVERSATION_DELETED = EventType("inbox.conversation_deleted", 1, {"id": int})
+MESSAGE_NEW = EventType("inbox.message_new", 1, {"conversation": int, "message": dict})
+UNREAD_COUNTS = EventType("inbox.unread_counts", 1, {"counts": dict})
+# compact read receipt; unread_count is only set on the reader's own inbox
+INBOX_READ = EventType("inbox.read", 1, {"conversation_id": int, "reader_id": int,
+                                         "last_read_at": str, "unread_count": (int, type(None))})
+
+# chat_{id}
+# `seq`: position in the conversation's event log (messaging.eventlog)
+CHAT_MESSAGE = EventType("chat.message", 2, {"message": dict, "sender": str},
+                         optional={"origin": str, "seq": int})
+MESSAGE_IMAGE = EventType("chat.message_image", 1, {"message_id": int, "image_url": str,
+                                                   "thumb_url": str, "width": int,
+                                                   "height": int})
+# deltas: only what changed, never the re-serialized message
+MESSAGE_EDITED = EventType("chat.message_edited", 1, {"message_id": int, "body": str,
+                                                      "edited_at": str}, optional={"seq": int})
+MESSAGE_DELETED = EventType("chat.message_deleted", 1, {"message_id": int},
+                            optional={"seq": int})
+MESSAGE_REACTION = EventType("chat.message_reaction", 1, {"message_id": int, "emoji": str,
+                                                          "username": str, "added": bool,
+                                                          "counts": dict}, optional={"seq": int})
+TYPING = EventType("typing.event", 2, {"username": str, "is_typing": bool})
+READ_RECEIPT = EventType("read.receipt", 1, {"conversation_id": int, "reader_username": str,
+                                              "last_read_at": str}, optional={"seq": int})
+
+
+class SubscriberRegistry:
+    """
+    Which sockets are in a group, in the presence store (messaging.presence):
+    every member is a connection under key(group) that its Heartbeat keeps
+    alive, so a socket that dies without leave() expires after the TTL.
+
+    A group is only skipped on positive evidence that nobody is listening:
+    no live member and no join, heartbeat or leave for a whole TTL (every
+    live socket refreshes well within that). A group the store doesn't know
+    (never joined, evicted, store flushed), a recently active one, and any
+    lookup error all count as subscribed, so registry trouble costs wasted
+    sends, never lost events. A process-local store only sees this
+    process's sockets and never drops (settings.MESSAGING_SUBSCRIBERS_SHARED
+    overrides).
+    """
+
+    def key(self, group):
+        return SUBSCRIBERS_KEY.format(group=group)
+
+    def count(self, group):
+        """Live members of `group`."""
+        return presence.get_backend().lookup([self.key(group)])[self.key(group)][0]
+
+    def shared(self):
+        return getattr(settings, "MESSAGING_SUBSCRIBERS_SHARED",
+                       not isinstance(presence.get_backend(), presence.LocalPresenceBackend))
+
+    def _listening(self, members, last_activity):
+        return (members > 0 or last_activity is None
+                or time.time() - last_activity < presence.ttl())
+
+    def has_subscribers(self, group):
+        if not self.shared():
+            return True
+        try:
+            members, last_activity = presence.get_backend().lookup([self.key(group)])[self.key(group)]
+        except Exception:
+            log.exception("subscriber lookup failed for %s", group)
+            return True
+        return self._listening(members, last_activity)
+
+    async def ahas_subscribers(self, group):
+        if not self.shared():
+            return True
+        try:
+            rows = await presence.get_backend().alookup([self.key(group)])
+        except Exception:
+            log.exception("subscriber lookup failed for %s", group)
+            return True
+        return self._listening(*rows[self.key(group)])
+
+    async def asubscribe(self, group, channel_name):
+        await presence.get_backend().atouch(self.key(group), channel_name, presence.ttl())
+
+    async def aunsubscribe(self, group, channel_name):
+        await presence.get_backend().aremove(self.key(group), channel_name)
+
+
+registry = SubscriberRegistry()
+
+
+# published / dropped counts for this process
+stats = Counter()
+
+
+def publish(event_type, group, key=None, **values):
+    """Validate and queue an event (after commit, batched per request)."""
+    event = event_type.build(**values)
+    if not registry.has_subscribers(group):
+        stats["dropped"] += 1
+        log.debug("no subscribers for %s, dropped %s", group, event_type.name)
+        return False
+    stats["published"] += 1
+    broadcast.send(group, event, key=key)
+    return True
+
+
+async def apublish(channel_layer, event_type, group, **values):
+    """Consumer-side publish: validated, skipped without subscribers, sent now."""
+    event = event_type.build(**values)
+    if not await registry.ahas_subscribers(group):
+        stats["dropped"] += 1
+        return False
+    stats["published"] += 1
+    await channel_layer.group_send(group, event)
+    return True
+
+
+async def join(consumer, group):
+    """Add the consumer to `group`; keep it registered with presence.Heartbeat(also=...)."""
+    await consumer.channel_layer.group_add(group, consumer.channel_name)
+    await registry.asubscribe(group, consumer.channel_name)
+
+
+async def leave(consumer, group):
+    await consumer.channel_layer.group_discard(group, consumer.channel_name)
+    await registry.aunsubscribe(group, consumer.channel_name)
@@ -0,0 +1,176 @@
+# messaging/images.py
+"""
+Chat image pipeline.
+
+On upload (MessageSerializer.validate) the file is checked by decoding its
+headers with Pillow rather than trusting the declared content type, and
+EXIF/XMP metadata (GPS position, camera serials) is stripped, applying the
+EXIF orientation first so the stored original still displays upright.
+
+After the message commits, a small worker pool renders WebP renditions:
+
+- medium: longest side MEDIUM_SIZE, what chat bubbles and the lightbox load
+- thumb:  longest side THUMB_SIZE, for previews and the inbox
+
+Their names and dimensions are written onto the Message with one UPDATE,
+and a `chat.message_image` event lets open chats swap them in.
+MessageSerializer serves `image_url` / `thumb_url` from the renditions,
+falling back to the original while they are being made.
+
+settings.CHAT_IMAGE_SYNC = True renders inline on commit (tests).
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import events
+
+log = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+# refuse decompression bombs before anything decodes pixel data
+MAX_PIXELS = 40_000_000
+
+MEDIUM_SIZE = 1280
+THUMB_SIZE = 320
+WEBP_QUALITY = 80
+ORIGINAL_QUALITY = 90
+
+DEFAULT_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ImageRejected(ValueError):
+    pass
+
+
+# -- upload-time checks ------------------------------------------------------
+
+def sanitize(upload):
+    """
+    Verify `upload` is an allowed image and return the file to store: the
+    upload itself, or a metadata-free re-encode when it carried EXIF/XMP.
+    Raises ImageRejected.
+    """
+    upload.seek(0)
+    try:
+        img = Image.open(upload)   # lazy: reads headers only
+        fmt = img.format
+        width, height = img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ImageRejected("Unsupported image type.")
+    if fmt not in ALLOWED_FORMATS:
+        raise ImageRejected("Unsupported image type.")
+    if width * height > getattr(settings, "CHAT_MAX_IMAGE_PIXELS", MAX_PIXELS):
+        raise ImageRejected("Image dimensions are too large.")
+
+    # animated GIFs are left alone; GIF has no EXIF anyway
+    if fmt == "GIF" or not _has_metadata(img):
+        upload.seek(0)
+        return upload
+
+    try:
+        clean = ImageOps.exif_transpose(img)
+        buf = io.BytesIO()
+        options = {"quality": ORIGINAL_QUALITY} if fmt in ("JPEG", "WEBP") else {}
+        if img.info.get("icc_profile"):
+            options["icc_profile"] = img.info["icc_profile"]
+        clean.save(buf, format=fmt, **options)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ImageRejected("Unsupported image type.")
+    stripped = ContentFile(buf.getvalue(), name=os.path.basename(upload.name))
+    stripped.content_type = getattr(upload, "content_type", None)
+    return stripped
+
+
+def _has_metadata(img):
+    return bool(img.getexif()) or any(
+        key in img.info for key in ("exif", "xmp", "XML:com.adobe.xmp"))
+
+
+# -- renditions ----------------------------------------------------------------
+
+def schedule(message_id):
+    """Render the renditions for a message once the current transaction commits."""
+    transaction.on_commit(lambda: _submit(message_id))
+
+
+def _submit(message_id):
+    if getattr(settings, "CHAT_IMAGE_SYNC", False):
+        process(message_id)
+        return
+    _get_executor().submit(_process_in_background, message_id)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "CHAT_IMAGE_WORKERS", DEFAULT_WORKERS),
+                thread_name_prefix="chat-images",
+            )
+        return _executor
+
+
+def _process_in_background(message_id):
+    try:
+        process(message_id)
+    except Exception:
+        log.exception("chat image processing failed for message %s", message_id)
+    finally:
+        close_old_connections()
+
+
+def process(message_id):
+    """Render and store the renditions for one message. Returns True if done."""
+    from .models import Message
+
+    message = (Message.objects.filter(pk=message_id)
+               .only("id", "conversation_id", "image").first())
+    if message is None or not message.image:
+        return False
+
+    with message.image.open("rb") as fh:
+        img = Image.open(fh)
+        # JPEG can decode straight at a reduced scale
+        img.draft("RGB", (MEDIUM_SIZE, MEDIUM_SIZE))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if _has_alpha(img) else "RGB")
+
+    stem = os.path.splitext(os.path.basename(message.image.name))[0]
+    updates = {}
+    # each rendition is downscaled from the previous, larger one
+    for name, size in (("medium", MEDIUM_SIZE), ("thumb", THUMB_SIZE)):
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", quality=WEBP_QUALITY, method=4)
+        field = Message._meta.get_field(f"image_{name}")
+        updates[f"image_{name}"] = field.storage.save(
+            field.generate_filename(message, f"{stem}_{name}.webp"),
+            ContentFile(buf.getvalue()),
+        )
+        updates[f"image_{name}_width"], updates[f"image_{name}_height"] = img.size
+
+    Message.objects.filter(pk=message.pk).update(**updates)
+    message.__dict__.update(updates)
+    events.publish(
+        events.MESSAGE_IMAGE, events.chat_group(message.conversation_id),
+        message_id=message.pk,
+        image_url=message.image_medium.url, thumb_url=message.image_thumb.url,
+        width=message.image_medium_width, height=message.image_medium_height,
+    )
+    return True
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
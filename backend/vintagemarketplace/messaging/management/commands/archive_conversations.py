@@ -0,0 +1,44 @@
+"""
+Move old message history to cold storage (see messaging.archive):
+conversations idle for --days, or deleted by both sides.
+
+Idempotent: safe to re-run. Each conversation is archived in its own
+transaction with its row locked.
+"""
+from django.core.management.base import BaseCommand
+
+from messaging.archive import BATCH_SIZE, archive_inactive
+
+
+class Command(BaseCommand):
+    help = "Archive read messages of inactive or fully deleted conversations to compressed segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids",
+            nargs="*",
+            type=int,
+            help="Only archive these conversation ids (default: all eligible).",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Archive conversations idle this many days "
+                 "(default: settings.MESSAGING_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Conversations fetched per query.",
+        )
+
+    def handle(self, *args, **opts):
+        totals = archive_inactive(days=opts["days"], batch_size=max(1, opts["batch_size"]),
+                                  ids=opts["ids"] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Conversations archived: {totals['conversations']} "
+            f"(messages: {totals['messages']}, dropped: {totals['dropped']}, "
+            f"segments: {totals['segments']})"
+        ))
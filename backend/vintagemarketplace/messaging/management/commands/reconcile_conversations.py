@@ -0,0 +1,55 @@
+"""
+Backfill / reconcile the denormalized inbox fields on Conversation:
+- last_message_body / last_message_sender / last_message_at
+- buyer_unread_count / seller_unread_count
+
+Idempotent: safe to re-run. Only conversations that drifted are written.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from messaging.models import Conversation
+
+
+class Command(BaseCommand):
+    help = "Backfill and reconcile denormalized last-message and unread counters on conversations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids",
+            nargs="*",
+            type=int,
+            help="Only reconcile these conversation ids (default: all).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Conversations per transaction.",
+        )
+
+    def handle(self, *args, **opts):
+        qs = Conversation.objects.order_by("pk")
+        if opts["ids"]:
+            qs = qs.filter(pk__in=opts["ids"])
+
+        batch_size = max(1, opts["batch_size"])
+        checked = fixed = 0
+        last_pk = 0
+        while True:
+            batch = list(qs.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                for convo in batch:
+                    # lock the row so a concurrent send can't interleave
+                    convo = Conversation.objects.select_for_update().get(pk=convo.pk)
+                    if convo.reconcile():
+                        fixed += 1
+                    checked += 1
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Conversations checked: {checked} (reconciled: {fixed})"
+        ))
@@ -0,0 +1,51 @@
+"""
+Drain the notification outbox: one digest per recipient for messages they
+haven't seen (see messaging.notifications).
+
+Run it from cron, or keep it running with --loop <seconds>.
+Safe to run concurrently: pending rows are locked while a batch is sent.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from messaging.notifications import BATCH_SIZE, send_digests
+
+
+class Command(BaseCommand):
+    help = "Send digest notifications for pending messages to offline recipients."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delay",
+            type=int,
+            default=None,
+            help="Only notify about messages pending this many seconds "
+                 "(default: settings.MESSAGING_NOTIFICATION_DELAY).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Recipients per transaction.",
+        )
+        parser.add_argument(
+            "--loop",
+            type=float,
+            default=0,
+            help="Keep running, polling every N seconds.",
+        )
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, opts["batch_size"])
+        while True:
+            totals = send_digests(delay=opts["delay"], batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ Digests sent: {totals['digests']} "
+                f"(notifications sent: {totals['sent']}, skipped: {totals['skipped']})"
+            ))
+            if not opts["loop"]:
+                break
+            close_old_connections()
+            time.sleep(opts["loop"])
@@ -0,0 +1,78 @@
+# messaging/membership.py
+"""
+Conversation membership cache: conversation id -> (buyer_id, seller_id).
+
+Participants never change after a conversation is created, so entries are
+long-lived. Two tiers:
+- a per-process LRU (LocalTTLCache): hits cost no I/O and, for consumers,
+  no sync/async thread hop
+- the shared Django cache, so a process that restarts or has not seen the
+  conversation yet still avoids the DB
+
+Conversations are seeded on create and dropped on delete (messaging.signals).
+"""
+from channels.db import database_sync_to_async
+from django.core.cache import cache
+
+from .localcache import LocalTTLCache
+
+MEMBERSHIP_KEY = "messaging:members:{id}"
+SHARED_TIMEOUT = 60 * 60 * 24 * 7
+LOCAL_TTL = 60 * 60
+
+_local = LocalTTLCache(maxsize=20000, ttl=LOCAL_TTL)
+
+
+def remember(conversation_id, buyer_id, seller_id):
+    members = (buyer_id, seller_id)
+    _local.set(conversation_id, members)
+    cache.set(MEMBERSHIP_KEY.format(id=conversation_id), members, SHARED_TIMEOUT)
+    return members
+
+
+def forget(conversation_id):
+    _local.delete(conversation_id)
+    cache.delete(MEMBERSHIP_KEY.format(id=conversation_id))
+
+
+def participants(conversation_id):
+    """(buyer_id, seller_id), or None for an unknown conversation."""
+    try:
+        conversation_id = int(conversation_id)
+    except (TypeError, ValueError):
+        return None
+    members = _local.get(conversation_id)
+    if members is not None:
+        return members
+    members = cache.get(MEMBERSHIP_KEY.format(id=conversation_id))
+    if members is not None:
+        members = tuple(members)
+        _local.set(conversation_id, members)
+        return members
+
+    from .models import Conversation
+    row = (Conversation.objects.filter(pk=conversation_id)
+           .values_list("buyer_id", "seller_id").first())
+    if row is None:
+        return None
+    return remember(conversation_id, *row)
+
+
+def is_participant(conversation_id, user_id):
+    if not user_id:
+        return False
+    members = participants(conversation_id)
+    return members is not None and user_id in members
+
+
+async def ais_participant(conversation_id, user_id):
+    """Async variant: answered in-loop on a local hit, else one thread hop."""
+    if not user_id:
+        return False
+    try:
+        members = _local.get(int(conversation_id))
+    except (TypeError, ValueError):
+        return False
+    if members is not None:
+        return user_id in members
+    return await database_sync_to_async(is_participant)(conversation_id, user_id)
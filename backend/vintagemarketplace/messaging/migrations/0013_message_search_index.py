@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table kept in sync by triggers (live
+# messages only). PostgreSQL: a partial GIN index on to_tsvector('simple', body).
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messaging_message_fts USING fts5(
+        body, content='messaging_message', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_ai AFTER INSERT ON messaging_message
+        WHEN NOT new.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(rowid, body) VALUES (new.id, new.body);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_ad AFTER DELETE ON messaging_message
+        WHEN NOT old.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(messaging_message_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_au_old AFTER UPDATE OF body, is_deleted ON messaging_message
+        WHEN NOT old.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(messaging_message_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_au_new AFTER UPDATE OF body, is_deleted ON messaging_message
+        WHEN NOT new.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(rowid, body) VALUES (new.id, new.body);
+        END""",
+    """INSERT INTO messaging_message_fts(rowid, body)
+        SELECT id, body FROM messaging_message WHERE NOT is_deleted""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS messaging_message_fts_ai",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_ad",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_au_old",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_au_new",
+    "DROP TABLE IF EXISTS messaging_message_fts",
+]
+POSTGRES_SCHEMA = [
+    """CREATE INDEX IF NOT EXISTS messaging_message_body_fts ON messaging_message
+        USING GIN (to_tsvector('simple', body)) WHERE NOT is_deleted""",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS messaging_message_body_fts",
+]
+
+SCHEMA = {"sqlite": (SQLITE_SCHEMA, SQLITE_DROP),
+          "postgresql": (POSTGRES_SCHEMA, POSTGRES_DROP)}
+
+
+def create_index(apps, schema_editor):
+    for sql in SCHEMA.get(schema_editor.connection.vendor, ((), ()))[0]:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    for sql in SCHEMA.get(schema_editor.connection.vendor, ((), ()))[1]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0012_conversation_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0014_message_client_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='image_medium',
+            field=models.ImageField(blank=True, null=True, upload_to='chat_images/renditions/'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='image_medium_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='image_medium_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='image_thumb',
+            field=models.ImageField(blank=True, null=True, upload_to='chat_images/renditions/'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='image_thumb_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='image_thumb_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# the FTS5 table and triggers as created by 0013, spelled out so later
+# changes to messaging.search can't alter this migration
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS messaging_message_fts_ai",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_ad",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_au_old",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_au_new",
+    "DROP TABLE IF EXISTS messaging_message_fts",
+]
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messaging_message_fts USING fts5(
+        body, content='messaging_message', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_ai AFTER INSERT ON messaging_message
+        WHEN NOT new.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(rowid, body) VALUES (new.id, new.body);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_ad AFTER DELETE ON messaging_message
+        WHEN NOT old.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(messaging_message_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_au_old AFTER UPDATE OF body, is_deleted ON messaging_message
+        WHEN NOT old.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(messaging_message_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS messaging_message_fts_au_new AFTER UPDATE OF body, is_deleted ON messaging_message
+        WHEN NOT new.is_deleted BEGIN
+            INSERT INTO messaging_message_fts(rowid, body) VALUES (new.id, new.body);
+        END""",
+    """INSERT INTO messaging_message_fts(rowid, body)
+        SELECT id, body FROM messaging_message WHERE NOT is_deleted""",
+]
+
+
+def rebuild_sqlite_search(apps, schema_editor):
+    # adding reaction_counts remakes messaging_message on SQLite, which
+    # drops the FTS triggers from 0013; rebuild the index from scratch
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in SQLITE_DROP + SQLITE_SCHEMA:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0017_chat_event_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageReaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emoji', models.CharField(max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messaging_m_convers_7bc91b_idx',
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='edited_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='reaction_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['conversation', 'created_at', 'id'], name='message_live_idx'),
+        ),
+        migrations.AddField(
+            model_name='messagereaction',
+            name='message',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='messaging.message'),
+        ),
+        migrations.AddField(
+            model_name='messagereaction',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='messagereaction',
+            constraint=models.UniqueConstraint(fields=('message', 'user', 'emoji'), name='messagereaction_unique_user_emoji'),
+        ),
+        migrations.RunPython(rebuild_sqlite_search, rebuild_sqlite_search),
+    ]
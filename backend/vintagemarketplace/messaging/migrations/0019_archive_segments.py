@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0018_message_edits_reactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('codec', models.CharField(max_length=8)),
+                ('count', models.PositiveIntegerField()),
+                ('first_at', models.DateTimeField()),
+                ('first_id', models.PositiveBigIntegerField()),
+                ('last_at', models.DateTimeField()),
+                ('last_id', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='messaging.conversation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conversation', 'last_at', 'last_id'], name='messaging_a_convers_c6ea46_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.utils import timezone
-from django.db.models import Max
-from django.db import models
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from vintageapi.models import Item
 
@@ -13,6 +14,8 @@ class Conversation(models.Model):
     seller = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='conversations_as_seller')
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped on any inbox-visible change; drives incremental inbox sync
+    updated_at = models.DateTimeField(auto_now=True)
     buyer_last_read = models.DateTimeField(null=True, blank=True, default=None)
     seller_last_read = models.DateTimeField(null=True, blank=True, default=None)
 
@@ -22,9 +25,33 @@ class Conversation(models.Model):
     buyer_deleted = models.BooleanField(default=False)
     seller_deleted = models.BooleanField(default=False)
 
+    # Denormalized inbox state, maintained by Message.save / soft_delete and
+    # messaging.receipts. `reconcile_conversations` rebuilds it from Message rows.
+    last_message_body = models.TextField(blank=True, default="")
+    last_message_sender = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name="+")
+    last_message_at = models.DateTimeField(null=True, blank=True, default=None)
+    buyer_unread_count = models.PositiveIntegerField(default=0)
+    seller_unread_count = models.PositiveIntegerField(default=0)
+    # last sequence number handed out in this conversation's event log
+    # (messages and read receipts; see messaging.eventlog)
+    event_seq = models.PositiveBigIntegerField(default=0)
+
+    DENORMALIZED_FIELDS = (
+        "last_message_body", "last_message_sender", "last_message_at",
+        "buyer_unread_count", "seller_unread_count",
+    )
+
     class Meta:
         unique_together = ('item', 'buyer', 'seller')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=["buyer", "-last_message_at"]),
+            models.Index(fields=["seller", "-last_message_at"]),
+            models.Index(fields=["buyer", "-updated_at"]),
+            models.Index(fields=["seller", "-updated_at"]),
+        ]
 
     def __str__(self):
         return f"Chat about '{self.item.title}' ({self.buyer} & {self.seller})"
@@ -39,10 +66,18 @@ class Conversation(models.Model):
             return self.seller_last_read
         return None
 
+    def _unread_field_for(self, sender_id):
+        """Name of the counter that a message from `sender_id` increments."""
+        if sender_id == self.buyer_id:
+            return "seller_unread_count"
+        if sender_id == self.seller_id:
+            return "buyer_unread_count"
+        return None
+
     def unread_count_for(self, user):
         """
-        Count messages from the *other* participant strictly after my last-read time.
-        Never pass None values into queryset lookups.
+        Messages from the *other* participant strictly after my last-read time.
+        Read from the denormalized counters, so this never hits the DB.
         """
         uid = getattr(user, "id", None)
         if not uid:
@@ -51,14 +86,100 @@ class Conversation(models.Model):
         if self.is_muted_for(user):
             return 0
 
-        qs = self.messages.filter(is_deleted=False).exclude(sender_id=uid)
+        if uid == self.buyer_id:
+            return self.buyer_unread_count
+        if uid == self.seller_id:
+            return self.seller_unread_count
+        return 0
 
-        last_read = self._last_read_for(user)
+    def count_unread_for(self, user_id):
+        """
+        Recount unread messages for `user_id` from Message rows (ignores mute).
+        Used by reconciliation; request paths use unread_count_for().
+        """
+        qs = self.messages.filter(is_deleted=False).exclude(sender_id=user_id)
+        last_read = self._last_read_for(_UserRef(user_id))
         if last_read is not None:
-            qs = qs.filter(created_at__gt=last_read)  # only add comparison when value exists
-
+            qs = qs.filter(created_at__gt=last_read)
         return qs.count()
 
+    def record_message(self, message):
+        """
+        Apply a newly created message to the denormalized inbox fields.
+        Uses F() expressions so concurrent senders don't lose increments.
+        """
+        updates = {
+            "last_message_body": message.body,
+            "last_message_sender_id": message.sender_id,
+            "last_message_at": message.created_at,
+            "updated_at": timezone.now(),
+            "event_seq": F("event_seq") + 1,
+        }
+        field = self._unread_field_for(message.sender_id)
+        if field:
+            updates[field] = F(field) + 1
+        Conversation.objects.filter(pk=self.pk).update(**updates)
+        self.refresh_from_db(fields=self.DENORMALIZED_FIELDS + ("updated_at", "event_seq"))
+        message.seq = self.event_seq
+        Message.objects.filter(pk=message.pk).update(seq=message.seq)
+
+    def forget_message(self, message):
+        """
+        Undo a soft-deleted message's contribution to the denormalized fields.
+        """
+        updates = {}
+        field = self._unread_field_for(message.sender_id)
+        if field:
+            reader_id = (self.seller_id if field == "seller_unread_count"
+                         else self.buyer_id)
+            last_read = self._last_read_for(_UserRef(reader_id))
+            if last_read is None or message.created_at > last_read:
+                updates[field] = Greatest(F(field) - 1, 0)
+
+        if self.last_message_at is None or message.created_at >= self.last_message_at:
+            updates.update(self._last_message_values())
+
+        if updates:
+            updates["updated_at"] = timezone.now()
+            Conversation.objects.filter(pk=self.pk).update(**updates)
+            self.refresh_from_db(fields=self.DENORMALIZED_FIELDS + ("updated_at",))
+
+    def _last_message_values(self):
+        last = (
+            self.messages.filter(is_deleted=False)
+            .order_by("-created_at", "-id")
+            .values("body", "sender_id", "created_at")
+            .first()
+        )
+        if last is None:
+            # the whole history may sit in cold storage
+            from .archive import newest_archived
+            last = newest_archived(self)
+        if last is None:
+            return {"last_message_body": "", "last_message_sender_id": None,
+                    "last_message_at": None}
+        return {"last_message_body": last["body"],
+                "last_message_sender_id": last["sender_id"],
+                "last_message_at": last["created_at"]}
+
+    def reconcile(self):
+        """
+        Recompute every denormalized field from Message rows.
+        Returns True if anything had drifted.
+        """
+        expected = self._last_message_values()
+        expected["buyer_unread_count"] = self.count_unread_for(self.buyer_id)
+        expected["seller_unread_count"] = self.count_unread_for(self.seller_id)
+
+        changed = [name for name, value in expected.items()
+                   if getattr(self, name) != value]
+        if not changed:
+            return False
+        for name, value in expected.items():
+            setattr(self, name, value)
+        self.save(update_fields=[n.removesuffix("_id") for n in changed] + ["updated_at"])
+        return True
+
     def is_muted_for(self, user) -> bool:
         if user.id == self.buyer_id:
             return self.is_muted_by_buyer
@@ -71,31 +192,18 @@ class Conversation(models.Model):
             self.is_muted_by_buyer = value
         elif user.id == self.seller_id:
             self.is_muted_by_seller = value
-        self.save(update_fields=["is_muted_by_buyer", "is_muted_by_seller"])
+        self.save(update_fields=["is_muted_by_buyer", "is_muted_by_seller", "updated_at"])
 
-    def mark_as_read(self, user):
-        uid = getattr(user, "id", None)
-        if uid not in (self.buyer_id, self.seller_id):
-            return False  # ignore non-participants
 
-        latest = (
-            self.messages.filter(is_deleted=False)
-            .order_by("-created_at")
-            .values_list("created_at", flat=True)
-            .first()
-        ) or timezone.now()
+class _UserRef:
+    """Minimal stand-in for a user when only the id is known."""
+    def __init__(self, user_id):
+        self.id = user_id
+        self.pk = user_id
 
-        if uid == self.buyer_id:
-            if self.buyer_last_read != latest:
-                self.buyer_last_read = latest
-                self.save(update_fields=["buyer_last_read"])
-                return True
-        else:  # uid == self.seller_id
-            if self.seller_last_read != latest:
-                self.seller_last_read = latest
-                self.save(update_fields=["seller_last_read"])
-                return True
-        return False
+
+class ClientIdConflict(ValueError):
+    """A client_id reused for a message in a different conversation."""
 
 
 class Message(models.Model):
@@ -104,14 +212,183 @@ class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     body = models.TextField(blank=True)
     image = models.ImageField(upload_to='chat_images/', blank=True, null=True)
+    # WebP renditions made after upload (messaging.images)
+    image_medium = models.ImageField(upload_to='chat_images/renditions/', blank=True, null=True)
+    image_medium_width = models.PositiveIntegerField(null=True, blank=True)
+    image_medium_height = models.PositiveIntegerField(null=True, blank=True)
+    image_thumb = models.ImageField(upload_to='chat_images/renditions/', blank=True, null=True)
+    image_thumb_width = models.PositiveIntegerField(null=True, blank=True)
+    image_thumb_height = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
+    # sender-chosen idempotency key, so a retried send never duplicates
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+    # position in the conversation's event log (Conversation.event_seq)
+    seq = models.PositiveBigIntegerField(null=True, blank=True)
+    edited_at = models.DateTimeField(null=True, blank=True)
+    # {emoji: count}, maintained by react(); MessageReaction holds who
+    reaction_counts = models.JSONField(default=dict, blank=True)
 
     class Meta:
         ordering = ['created_at']
         indexes = [
-            models.Index(fields=["conversation", "created_at"]),
+            # every read path (pages, previews, unread recounts) skips
+            # deleted rows, so only live messages are indexed
+            models.Index(fields=["conversation", "created_at", "id"],
+                         name="message_live_idx",
+                         condition=models.Q(is_deleted=False)),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sender", "client_id"],
+                condition=models.Q(client_id__isnull=False),
+                name="message_unique_sender_client_id",
+            ),
+        ]
+
+    @classmethod
+    def create_once(cls, conversation, sender, client_id=None, **fields):
+        """
+        Create a message, at most once per (sender, client_id).
+        Returns (message, created); a repeat returns the stored message.
+        Raises ClientIdConflict when the client_id was already used in
+        another conversation.
+        """
+        if client_id:
+            existing = cls.objects.filter(sender=sender, client_id=client_id).first()
+            if existing is not None:
+                return cls._repeat_of(existing, conversation), False
+        try:
+            with transaction.atomic():
+                message = cls(conversation=conversation, sender=sender,
+                              client_id=client_id or None, **fields)
+                message.save()
+        except IntegrityError:
+            if not client_id:
+                raise
+            # lost a race with the same retry
+            existing = cls.objects.get(sender=sender, client_id=client_id)
+            return cls._repeat_of(existing, conversation), False
+        return message, True
+
+    @staticmethod
+    def _repeat_of(existing, conversation):
+        if existing.conversation_id != conversation.pk:
+            raise ClientIdConflict(existing.client_id)
+        return existing
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if creating and not self.is_deleted:
+                self.conversation.record_message(self)
+                # outbox row for the offline digest (messaging.notifications)
+                Notification.queue_for(self)
+
+    def edit(self, body):
+        """
+        Replace the body; the inbox preview follows if this is the last
+        message. Returns True when the preview changed.
+        """
+        with transaction.atomic():
+            self.body = body
+            self.edited_at = timezone.now()
+            super().save(update_fields=["body", "edited_at"])
+            return Conversation.objects.filter(
+                pk=self.conversation_id, last_message_at=self.created_at,
+                last_message_sender_id=self.sender_id,
+            ).update(last_message_body=body, updated_at=timezone.now()) > 0
+
+    def react(self, user, emoji, add=True):
+        """
+        Add or remove `user`'s `emoji`. reaction_counts is adjusted in place
+        under a row lock, never recounted. Returns True if anything changed.
+        """
+        with transaction.atomic():
+            locked = (Message.objects.select_for_update()
+                      .only("id", "reaction_counts").get(pk=self.pk))
+            if add:
+                _, changed = MessageReaction.objects.get_or_create(
+                    message_id=self.pk, user=user, emoji=emoji)
+            else:
+                changed = MessageReaction.objects.filter(
+                    message_id=self.pk, user=user, emoji=emoji).delete()[0] > 0
+            counts = dict(locked.reaction_counts)
+            if changed:
+                counts[emoji] = counts.get(emoji, 0) + (1 if add else -1)
+                if counts[emoji] <= 0:
+                    del counts[emoji]
+                Message.objects.filter(pk=self.pk).update(reaction_counts=counts)
+            self.reaction_counts = counts
+        return changed
+
+    def soft_delete(self):
+        """Hide the message and take it out of the inbox counters/preview."""
+        if self.is_deleted:
+            return False
+        with transaction.atomic():
+            self.is_deleted = True
+            super().save(update_fields=["is_deleted"])
+            self.conversation.forget_message(self)
+        return True
+
+
+class MessageReaction(models.Model):
+    message = models.ForeignKey(
+        Message, on_delete=models.CASCADE, related_name="reactions")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    emoji = models.CharField(max_length=16)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["message", "user", "emoji"],
+                                    name="messagereaction_unique_user_emoji"),
+        ]
+
+
+class ChatEvent(models.Model):
+    """
+    Bounded replay buffer: the last few hundred chat events of a
+    conversation, exactly as broadcast, keyed by their sequence number.
+    """
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name="events")
+    seq = models.PositiveBigIntegerField()
+    event = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["conversation", "seq"],
+                                    name="chatevent_unique_conversation_seq"),
+        ]
+
+
+class ArchiveSegment(models.Model):
+    """
+    A compressed JSONL file of archived messages (messaging.archive),
+    with the (created_at, id) range it covers so cursor pages can find it.
+    """
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name="archive_segments")
+    path = models.CharField(max_length=255)
+    codec = models.CharField(max_length=8)
+    count = models.PositiveIntegerField()
+    first_at = models.DateTimeField()
+    first_id = models.PositiveBigIntegerField()
+    last_at = models.DateTimeField()
+    last_id = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["conversation", "last_at", "last_id"]),
+        ]
+
+    def __str__(self):
+        return f"Archive {self.path} ({self.count} messages)"
 
 
 class UserBlock(models.Model):
@@ -144,3 +421,44 @@ class UserReport(models.Model):
 
     def __str__(self):
         return f"Report {self.id} by {self.reporter} -> {self.reported}"
+
+
+class Notification(models.Model):
+    """
+    Outbox entry: one per message for its recipient, written in the
+    message's transaction. messaging.notifications turns pending rows into
+    per-recipient digests (or skips them) outside the request path.
+    """
+    PENDING, SENT, SKIPPED = "pending", "sent", "skipped"
+    STATES = [(PENDING, "Pending"), (SENT, "Sent"), (SKIPPED, "Skipped")]
+
+    recipient = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="notifications")
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name="notifications")
+    message = models.ForeignKey(
+        Message, on_delete=models.CASCADE, related_name="notifications")
+    state = models.CharField(max_length=8, choices=STATES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's scan: pending rows only, oldest first
+            models.Index(fields=["created_at"], name="notification_pending_idx",
+                         condition=models.Q(state="pending")),
+        ]
+
+    def __str__(self):
+        return f"Notification {self.id} -> {self.recipient_id} ({self.state})"
+
+    @classmethod
+    def queue_for(cls, message):
+        convo = message.conversation
+        if message.sender_id == convo.buyer_id:
+            recipient_id = convo.seller_id
+        elif message.sender_id == convo.seller_id:
+            recipient_id = convo.buyer_id
+        else:
+            return None
+        return cls.objects.create(recipient_id=recipient_id, conversation=convo, message=message)
@@ -0,0 +1,197 @@
+# messaging/notifications.py
+"""
+Offline message digests.
+
+Every new message leaves a pending Notification row for its recipient,
+written in the same transaction as the message (Message.save), so the
+request never does delivery work. A worker
+(`manage.py send_notification_digests`) drains the outbox in batches:
+
+- rows younger than MESSAGING_NOTIFICATION_DELAY wait, so a burst of
+  messages and a quick reply-back produce one digest or none
+- a row is skipped when the message was deleted, either side blocked the
+  other, the recipient muted the conversation, has already read past the
+  message, or is online (they got it over the socket)
+- if presence can't be checked, the batch stays pending for the next run
+- what is left is grouped per recipient, one entry per conversation with
+  a message count, and handed to the transport as a single digest
+
+The transport is pluggable (settings.MESSAGING_NOTIFICATION_TRANSPORT);
+EmailTransport sends through Django's mail backend.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import blocks, presence
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DELAY = 120
+BATCH_SIZE = 1000
+SNIPPET_LENGTH = 80
+
+
+class Digest:
+    """Unread messages for one recipient, one entry per conversation."""
+
+    def __init__(self, recipient):
+        self.recipient = recipient
+        self.threads = {}   # conversation id -> entry dict
+
+    def add(self, notification):
+        message = notification.message
+        convo = notification.conversation
+        entry = self.threads.setdefault(convo.pk, {
+            "conversation_id": convo.pk,
+            "item_title": convo.item.title,
+            "sender": message.sender.username,
+            "count": 0,
+            "last_body": "",
+            "last_at": None,
+        })
+        entry["count"] += 1
+        if entry["last_at"] is None or message.created_at >= entry["last_at"]:
+            entry["last_at"] = message.created_at
+            entry["last_body"] = (message.body or "[photo]")[:SNIPPET_LENGTH]
+
+    @property
+    def total(self):
+        return sum(entry["count"] for entry in self.threads.values())
+
+
+class EmailTransport:
+    def send(self, digest):
+        """Deliver `digest`; return False if the recipient can't be reached."""
+        email = digest.recipient.email
+        if not email:
+            return False
+        lines = [
+            f"{t['sender']} about \"{t['item_title']}\": "
+            + (f"{t['count']} new messages, latest: " if t["count"] > 1 else "")
+            + t["last_body"]
+            for t in digest.threads.values()
+        ]
+        noun = "message" if digest.total == 1 else "messages"
+        send_mail(
+            subject=f"You have {digest.total} new {noun}",
+            message="\n".join(lines),
+            from_email=None,
+            recipient_list=[email],
+        )
+        return True
+
+
+@lru_cache(maxsize=None)
+def _transport(path):
+    return import_string(path)()
+
+
+def get_transport():
+    return _transport(getattr(settings, "MESSAGING_NOTIFICATION_TRANSPORT",
+                              "messaging.notifications.EmailTransport"))
+
+
+def _skip_reason(notification, online):
+    convo = notification.conversation
+    recipient = notification.recipient
+    if notification.message.is_deleted:
+        return "deleted"
+    if blocks.is_blocked(recipient.pk, notification.message.sender_id):
+        return "blocked"
+    if convo.is_muted_for(recipient):
+        return "muted"
+    last_read = convo._last_read_for(recipient)
+    if last_read is not None and last_read >= notification.message.created_at:
+        return "read"
+    if notification.recipient_id in online:
+        return "online"
+    return None
+
+
+def send_digests(delay=None, batch_size=BATCH_SIZE):
+    """
+    Deliver digests to every recipient with a notification pending for more
+    than `delay` seconds; their newer pending rows ride along in the same
+    digest. Returns {"digests": n, "sent": n, "skipped": n}.
+    """
+    from .models import Notification
+
+    if delay is None:
+        delay = getattr(settings, "MESSAGING_NOTIFICATION_DELAY", DEFAULT_DELAY)
+    cutoff = timezone.now() - timedelta(seconds=delay)
+    pending = Notification.objects.filter(state=Notification.PENDING)
+    totals = {"digests": 0, "sent": 0, "skipped": 0}
+    last_recipient = 0
+
+    while True:
+        recipients = list(
+            pending.filter(created_at__lte=cutoff, recipient_id__gt=last_recipient)
+            .order_by("recipient_id").values_list("recipient_id", flat=True)
+            .distinct()[:batch_size]
+        )
+        if not recipients:
+            break
+        last_recipient = recipients[-1]
+        for key, n in _process(recipients).items():
+            totals[key] += n
+    return totals
+
+
+def _process(recipient_ids):
+    from .models import Notification
+
+    transport = get_transport()
+    try:
+        online = presence.online_ids(recipient_ids, fail_open=False)
+    except Exception:
+        # "everyone online" would skip every row for good; retry next run
+        log.exception("presence unavailable, leaving %s recipients pending", len(recipient_ids))
+        return {"digests": 0, "sent": 0, "skipped": 0}
+    with transaction.atomic():
+        rows = list(
+            Notification.objects
+            .filter(state=Notification.PENDING, recipient_id__in=recipient_ids)
+            .select_related("recipient", "message__sender", "conversation__item")
+            .select_for_update(of=("self",))
+            .order_by("created_at")
+        )
+        digests, sent, skipped = {}, defaultdict(list), []
+        for notification in rows:
+            if _skip_reason(notification, online):
+                skipped.append(notification.pk)
+                continue
+            digest = digests.get(notification.recipient_id)
+            if digest is None:
+                digest = digests[notification.recipient_id] = Digest(notification.recipient)
+            digest.add(notification)
+            sent[notification.recipient_id].append(notification.pk)
+
+        delivered = 0
+        for recipient_id, digest in digests.items():
+            try:
+                reached = transport.send(digest)
+            except Exception:
+                # stays pending and is retried on the next run
+                log.exception("digest delivery failed for user %s", recipient_id)
+                sent.pop(recipient_id)
+                continue
+            if reached:
+                delivered += 1
+            else:
+                skipped.extend(sent.pop(recipient_id))
+
+        now = timezone.now()
+        sent_ids = [pk for ids in sent.values() for pk in ids]
+        Notification.objects.filter(pk__in=sent_ids).update(
+            state=Notification.SENT, processed_at=now)
+        Notification.objects.filter(pk__in=skipped).update(
+            state=Notification.SKIPPED, processed_at=now)
+    return {"digests": delivered, "sent": len(sent_ids), "skipped": len(skipped)}
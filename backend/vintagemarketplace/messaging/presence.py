@@ -0,0 +1,237 @@
+# messaging/presence.py
+"""
+Who is connected, across every WebSocket node.
+
+Each open InboxConsumer/ChatConsumer registers its channel name under its
+user with an expiry TTL seconds ahead and refreshes it every TTL / 3
+seconds (Heartbeat). A user is online while any of their connections is
+unexpired, so a node that dies without running disconnect() drops out on
+its own after at most TTL. Connecting, heartbeats and disconnecting also
+stamp the user's last-seen time.
+
+Backends (settings.MESSAGING_PRESENCE_BACKEND):
+- RedisPresenceBackend: a sorted set per user (channel name -> expiry) plus
+  a last-seen key, in the channel layer's Redis (settings.REDIS_URL)
+- LocalPresenceBackend: the same in process memory (tests, single node)
+
+snapshot() answers "who is online" for a batch of users in one round trip;
+online_ids() lets broadcasters skip users with no open socket. Both fail
+open: if the backend is unreachable everyone counts as online. Callers for
+whom "online" means "don't contact" pass fail_open=False and get the error.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 90
+# last-seen stamps outlive connections by far
+LAST_SEEN_TTL = 60 * 60 * 24 * 30
+
+
+def ttl():
+    return getattr(settings, "MESSAGING_PRESENCE_TTL", DEFAULT_TTL)
+
+
+class LocalPresenceBackend:
+    """In-memory presence for tests and single-process deployments."""
+
+    def __init__(self):
+        self._connections = {}   # user_id -> {conn_id: expires_at}
+        self._last_seen = {}     # user_id -> epoch seconds
+        self._lock = threading.Lock()
+
+    def touch(self, user_id, conn_id, expires_in):
+        now = time.time()
+        with self._lock:
+            self._connections.setdefault(user_id, {})[conn_id] = now + expires_in
+            self._last_seen[user_id] = now
+
+    def remove(self, user_id, conn_id):
+        with self._lock:
+            conns = self._connections.get(user_id, {})
+            conns.pop(conn_id, None)
+            if not conns:
+                self._connections.pop(user_id, None)
+            self._last_seen[user_id] = time.time()
+
+    def lookup(self, user_ids):
+        """{user_id: (connection_count, last_seen_epoch or None)}"""
+        now = time.time()
+        with self._lock:
+            return {
+                uid: (sum(1 for expires in self._connections.get(uid, {}).values() if expires > now),
+                      self._last_seen.get(uid))
+                for uid in user_ids
+            }
+
+    def clear(self):
+        with self._lock:
+            self._connections.clear()
+            self._last_seen.clear()
+
+    async def atouch(self, user_id, conn_id, expires_in):
+        self.touch(user_id, conn_id, expires_in)
+
+    async def aremove(self, user_id, conn_id):
+        self.remove(user_id, conn_id)
+
+    async def alookup(self, user_ids):
+        return self.lookup(user_ids)
+
+
+class RedisPresenceBackend:
+    CONNECTIONS_KEY = "presence:conns:{user_id}"
+    LAST_SEEN_KEY = "presence:seen:{user_id}"
+
+    def __init__(self, url=None):
+        import redis
+        import redis.asyncio
+
+        url = url or getattr(settings, "REDIS_URL", "redis://127.0.0.1")
+        self._redis = redis.Redis.from_url(url)
+        self._aredis = redis.asyncio.Redis.from_url(url)
+
+    def _touch_commands(self, pipe, user_id, conn_id, expires_in):
+        now = time.time()
+        key = self.CONNECTIONS_KEY.format(user_id=user_id)
+        pipe.zadd(key, {conn_id: now + expires_in})
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.expire(key, int(expires_in) + 1)
+        pipe.set(self.LAST_SEEN_KEY.format(user_id=user_id), now, ex=LAST_SEEN_TTL)
+
+    def _remove_commands(self, pipe, user_id, conn_id):
+        pipe.zrem(self.CONNECTIONS_KEY.format(user_id=user_id), conn_id)
+        pipe.set(self.LAST_SEEN_KEY.format(user_id=user_id), time.time(), ex=LAST_SEEN_TTL)
+
+    def touch(self, user_id, conn_id, expires_in):
+        with self._redis.pipeline(transaction=False) as pipe:
+            self._touch_commands(pipe, user_id, conn_id, expires_in)
+            pipe.execute()
+
+    def remove(self, user_id, conn_id):
+        with self._redis.pipeline(transaction=False) as pipe:
+            self._remove_commands(pipe, user_id, conn_id)
+            pipe.execute()
+
+    def lookup(self, user_ids):
+        user_ids = list(user_ids)
+        now = time.time()
+        with self._redis.pipeline(transaction=False) as pipe:
+            for uid in user_ids:
+                pipe.zcount(self.CONNECTIONS_KEY.format(user_id=uid), now, "+inf")
+                pipe.get(self.LAST_SEEN_KEY.format(user_id=uid))
+            replies = pipe.execute()
+        return {
+            uid: (count, float(seen) if seen is not None else None)
+            for uid, count, seen in zip(user_ids, replies[::2], replies[1::2])
+        }
+
+    async def alookup(self, user_ids):
+        user_ids = list(user_ids)
+        now = time.time()
+        async with self._aredis.pipeline(transaction=False) as pipe:
+            for uid in user_ids:
+                pipe.zcount(self.CONNECTIONS_KEY.format(user_id=uid), now, "+inf")
+                pipe.get(self.LAST_SEEN_KEY.format(user_id=uid))
+            replies = await pipe.execute()
+        return {
+            uid: (count, float(seen) if seen is not None else None)
+            for uid, count, seen in zip(user_ids, replies[::2], replies[1::2])
+        }
+
+    async def atouch(self, user_id, conn_id, expires_in):
+        async with self._aredis.pipeline(transaction=False) as pipe:
+            self._touch_commands(pipe, user_id, conn_id, expires_in)
+            await pipe.execute()
+
+    async def aremove(self, user_id, conn_id):
+        async with self._aredis.pipeline(transaction=False) as pipe:
+            self._remove_commands(pipe, user_id, conn_id)
+            await pipe.execute()
+
+
+@lru_cache(maxsize=None)
+def _backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    return _backend(getattr(settings, "MESSAGING_PRESENCE_BACKEND",
+                            "messaging.presence.RedisPresenceBackend"))
+
+
+def snapshot(user_ids, fail_open=True):
+    """{user_id: {"online": bool, "last_seen": iso timestamp or None}}"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    try:
+        rows = get_backend().lookup(user_ids)
+    except Exception:
+        if not fail_open:
+            raise
+        log.exception("presence lookup failed")
+        return {uid: {"online": True, "last_seen": None} for uid in user_ids}
+    return {
+        uid: {
+            "online": count > 0,
+            "last_seen": (datetime.fromtimestamp(seen, tz=dt_timezone.utc).isoformat()
+                          if seen is not None else None),
+        }
+        for uid, (count, seen) in rows.items()
+    }
+
+
+def online_ids(user_ids, fail_open=True):
+    """The subset of `user_ids` with at least one open socket."""
+    return {uid for uid, state in snapshot(user_ids, fail_open).items() if state["online"]}
+
+
+class Heartbeat:
+    """
+    Keeps one connection registered while it is open: start() on connect,
+    stop() on disconnect. Backend errors are logged, never raised into the
+    consumer. `also`: more registry keys kept alive with the connection
+    (group memberships, see messaging.events.SubscriberRegistry).
+    """
+
+    def __init__(self, user_id, conn_id, also=()):
+        self.user_id = user_id
+        self.conn_id = conn_id
+        self.keys = [user_id, *also]
+        self._task = None
+
+    async def start(self):
+        await self._touch()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            for key in self.keys:
+                await get_backend().aremove(key, self.conn_id)
+        except Exception:
+            log.exception("presence remove failed for user %s", self.user_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(ttl() / 3)
+            await self._touch()
+
+    async def _touch(self):
+        try:
+            for key in self.keys:
+                await get_backend().atouch(key, self.conn_id, ttl())
+        except Exception:
+            log.exception("presence heartbeat failed for user %s", self.user_id)
+
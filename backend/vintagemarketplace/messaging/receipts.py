@@ -0,0 +1,190 @@
+# messaging/receipts.py
+"""
+Debounced, batched read receipts.
+
+Clients mark a conversation read on every scroll and focus. Instead of a
+save plus full ConversationSerializer upserts per call:
+
+- mark_read() records a read position per (user, conversation), keeping
+  only the newest one
+- after settings.MESSAGING_READ_RECEIPT_WINDOW seconds (0 = immediately),
+  flush() writes every pending position in one transaction: conversations
+  are locked, unread counters recounted from messages newer than the
+  position (so messages that arrived in between stay unread), and all rows
+  go out in a single bulk_update
+- each changed position emits one compact `inbox.read` event per
+  participant and a `read.receipt` to the open chat, no conversation upserts;
+  receipts take the conversation's next event seq and are written to its
+  replay buffer in the same transaction (messaging.eventlog)
+
+Pending marks live in process memory; losing them on a crash only means the
+client marks the conversation read again on its next focus.
+"""
+import logging
+import threading
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import eventlog, events, presence
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 2.0
+
+
+class ReadReceiptAggregator:
+    def __init__(self):
+        self._pending = {}   # (user_id, conversation_id) -> read position
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def window(self):
+        return getattr(settings, "MESSAGING_READ_RECEIPT_WINDOW", DEFAULT_WINDOW)
+
+    def mark(self, marks):
+        """Record [(user_id, conversation_id, read_at), ...]."""
+        with self._lock:
+            for user_id, conversation_id, read_at in marks:
+                key = (user_id, conversation_id)
+                current = self._pending.get(key)
+                self._pending[key] = read_at if current is None else max(current, read_at)
+            if self.window > 0 and self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.window <= 0:
+            self.flush()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            log.exception("read receipt flush failed")
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if pending:
+            apply_reads(pending)
+        return len(pending)
+
+
+def apply_reads(marks):
+    """
+    Write {(user_id, conversation_id): read_at} in one transaction and
+    publish receipts. Returns the number of conversations that changed.
+    """
+    from .models import Conversation, Message
+
+    changed = []
+    with transaction.atomic():
+        convos = (Conversation.objects
+                  .select_related("buyer", "seller")
+                  .select_for_update(of=("self",))
+                  .in_bulk({cid for _, cid in marks}))
+        positions = {}
+        for (uid, cid), read_at in marks.items():
+            convo = convos.get(cid)
+            if convo is None or uid not in (convo.buyer_id, convo.seller_id):
+                continue
+            side = "buyer" if uid == convo.buyer_id else "seller"
+            last_read = getattr(convo, f"{side}_last_read")
+            # also re-applies an unchanged position to clear a drifted counter
+            if (last_read is None or read_at > last_read
+                    or (read_at == last_read and getattr(convo, f"{side}_unread_count"))):
+                positions[(uid, cid)] = (side, read_at)
+        if not positions:
+            return 0
+
+        # messages from the other side newer than the oldest new position;
+        # counted per (conversation, reader) in Python
+        oldest = min(read_at for _, read_at in positions.values())
+        newer = (Message.objects
+                 .filter(conversation_id__in={cid for _, cid in positions},
+                         is_deleted=False, created_at__gt=oldest)
+                 .values_list("conversation_id", "sender_id", "created_at"))
+        unread = Counter()
+        for cid, sender_id, created_at in newer:
+            convo = convos[cid]
+            for reader_id in (convo.buyer_id, convo.seller_id):
+                position = positions.get((reader_id, cid))
+                if position and sender_id != reader_id and created_at > position[1]:
+                    unread[(reader_id, cid)] += 1
+
+        now = timezone.now()
+        logged = []
+        for (uid, cid), (side, read_at) in positions.items():
+            convo = convos[cid]
+            setattr(convo, f"{side}_last_read", read_at)
+            setattr(convo, f"{side}_unread_count", unread[(uid, cid)])
+            convo.updated_at = now
+            convo.event_seq += 1   # row is locked
+            receipt = _receipt_values(convo, side)
+            changed.append((uid, convo, side, receipt))
+            logged.append((cid, receipt["seq"], events.READ_RECEIPT.build(**receipt)))
+        Conversation.objects.bulk_update(
+            {convo.pk: convo for _, convo, _, _ in changed}.values(),
+            ["buyer_last_read", "buyer_unread_count",
+             "seller_last_read", "seller_unread_count", "updated_at", "event_seq"],
+        )
+        eventlog.record(logged)
+
+    for uid, convo, side, receipt in changed:
+        _publish_receipt(uid, convo, side, receipt)
+    return len(changed)
+
+
+def _receipt_values(convo, side):
+    reader = convo.buyer if side == "buyer" else convo.seller
+    return {
+        "conversation_id": convo.pk,
+        "reader_username": reader.username,
+        "last_read_at": getattr(convo, f"{side}_last_read").isoformat(),
+        "seq": convo.event_seq,
+    }
+
+
+def _publish_receipt(reader_id, convo, side, receipt):
+    last_read_at = receipt["last_read_at"]
+    events.publish(
+        events.READ_RECEIPT, events.chat_group(convo.pk),
+        key=("read_receipt", reader_id), **receipt,
+    )
+    for uid in presence.online_ids((convo.buyer_id, convo.seller_id)):
+        events.publish(
+            events.INBOX_READ, events.inbox_group(uid),
+            key=("read", convo.pk, reader_id),
+            conversation_id=convo.pk, reader_id=reader_id, last_read_at=last_read_at,
+            unread_count=getattr(convo, f"{side}_unread_count") if uid == reader_id else None,
+        )
+
+
+aggregator = ReadReceiptAggregator()
+
+
+def mark_read(user, conversation):
+    """Queue "read up to the latest message" for `user` in `conversation`."""
+    mark_read_many(user, [conversation])
+
+
+def mark_read_many(user, conversations):
+    now = timezone.now()
+    aggregator.mark([(user.id, c.pk, c.last_message_at or now) for c in conversations])
+
+
+async def amark_read(user, conversation):
+    """mark_read() for async views: only an inline flush needs a thread hop."""
+    if aggregator.window > 0:
+        mark_read(user, conversation)
+    else:
+        await sync_to_async(mark_read)(user, conversation)
@@ -0,0 +1,105 @@
+# messaging/search.py
+"""
+Full-text search over message bodies.
+
+The backend is picked from settings.MESSAGE_SEARCH_BACKEND (dotted path) or,
+by default, from the database vendor:
+
+- sqlite     -> SQLiteFTSBackend   (FTS5 table kept in sync by triggers)
+- postgresql -> PostgresFTSBackend (GIN index on to_tsvector(body))
+- anything else falls back to IcontainsBackend.
+
+The index structures are created by migration 0013; both are maintained by
+the database itself, so message create, edit and soft-delete (including
+queryset .update() calls) never leave the index stale.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "messaging_message_fts"
+PG_CONFIG = "simple"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query):
+    return _TOKEN_RE.findall(query or "")
+
+
+class MessageSearchBackend:
+    """Narrow a Message queryset to rows whose body matches `query`."""
+
+    def filter(self, queryset, query):
+        raise NotImplementedError
+
+
+class IcontainsBackend(MessageSearchBackend):
+    def filter(self, queryset, query):
+        query = (query or "").strip()
+        if not query:
+            return queryset.none()
+        return queryset.filter(body__icontains=query)
+
+
+class SQLiteFTSBackend(MessageSearchBackend):
+    def match_expression(self, tokens):
+        # every token must match; the last one is a prefix (search-as-you-type)
+        quoted = ['"%s"' % t.replace('"', '""') for t in tokens]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    def filter(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [self.match_expression(tokens)],
+        ))
+
+
+class PostgresFTSBackend(MessageSearchBackend):
+    def tsquery(self, tokens):
+        parts = [t.replace("'", "") for t in tokens]
+        parts[-1] += ":*"
+        return " & ".join(parts)
+
+    def filter(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        # same expression as the GIN index in migration 0013, so it's used
+        return queryset.filter(RawSQL(
+            f"to_tsvector('{PG_CONFIG}', messaging_message.body) "
+            f"@@ to_tsquery('{PG_CONFIG}', %s)",
+            [self.tsquery(tokens)],
+            output_field=BooleanField(),
+        ))
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresFTSBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def _backend_for(path, vendor):
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(vendor, IcontainsBackend)()
+
+
+def get_search_backend():
+    return _backend_for(
+        getattr(settings, "MESSAGE_SEARCH_BACKEND", None), connection.vendor)
+
+
+def search_messages(queryset, query):
+    return get_search_backend().filter(queryset, query)
@@ -2,39 +2,60 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.conf import settings
+from . import images
 from .models import Conversation, Message, UserBlock, UserReport
 from vintageapi.models import Item
 from rest_framework.exceptions import ValidationError
 
 
 MAX_IMAGE_MB = getattr(settings, "CHAT_MAX_IMAGE_MB", 5)
-ALLOWED_IMAGE_MIME = {"image/jpeg", "image/png", "image/gif", "image/webp"}
 
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_username = serializers.CharField(source="sender.username", read_only=True)
     image_url = serializers.SerializerMethodField()
+    thumb_url = serializers.SerializerMethodField()
+    image_width = serializers.SerializerMethodField()
+    image_height = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
-        fields = ["id", "conversation", "sender", "sender_username", "body", "image", "image_url", "created_at"]
-        read_only_fields = ["sender", "sender_username", "created_at", "image_url"]
-
-    def get_image_url(self, obj):
+        fields = ["id", "conversation", "sender", "sender_username", "body", "image", "image_url",
+                  "thumb_url", "image_width", "image_height", "client_id", "seq",
+                  "reaction_counts", "edited_at", "created_at"]
+        read_only_fields = ["sender", "sender_username", "created_at", "image_url",
+                            "thumb_url", "image_width", "image_height", "seq",
+                            "reaction_counts", "edited_at"]
+
+    def _absolute(self, file):
         request = self.context.get("request")
-        if obj.image and request:
-            return request.build_absolute_uri(obj.image.url)
+        if file and request:
+            return request.build_absolute_uri(file.url)
         return None
 
+    def get_image_url(self, obj):
+        # the medium WebP rendition once it exists, the original until then
+        return self._absolute(obj.image_medium or obj.image)
+
+    def get_thumb_url(self, obj):
+        return self._absolute(obj.image_thumb)
+
+    def get_image_width(self, obj):
+        return obj.image_medium_width
+
+    def get_image_height(self, obj):
+        return obj.image_medium_height
+
     def validate(self, attrs):
         img = attrs.get("image")
         if img:
-            # content type & size
-            ctype = getattr(img, "content_type", "") or ""
-            if ctype not in ALLOWED_IMAGE_MIME:
-                raise serializers.ValidationError({"image": ["Unsupported image type."]})
             if img.size > MAX_IMAGE_MB * 1024 * 1024:
                 raise serializers.ValidationError({"image": [f"Image must be ≤ {MAX_IMAGE_MB}MB."]})
+            # checks the real format from the file headers and strips EXIF
+            try:
+                attrs["image"] = img = images.sanitize(img)
+            except images.ImageRejected as exc:
+                raise serializers.ValidationError({"image": [str(exc)]})
         body = (attrs.get("body") or "").strip()
         if not body and not img and self.instance is None:
             raise serializers.ValidationError({"non_field_errors": ["Message must contain text or an image."]})
@@ -51,7 +72,8 @@ class ConversationSerializer(serializers.ModelSerializer):
     item = serializers.PrimaryKeyRelatedField(queryset=Item.objects.all())
 
     last_message_body = serializers.ReadOnlyField()
-    last_message_sender_username = serializers.ReadOnlyField()
+    last_message_sender_username = serializers.CharField(
+        source="last_message_sender.username", read_only=True, default=None)
     last_message_at = serializers.DateTimeField(read_only=True)
     last_read_for_me = serializers.SerializerMethodField()
     unread_count_for_me = serializers.SerializerMethodField()
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import blocks, images, membership
+from .models import ArchiveSegment, Conversation, Message, UserBlock
+from .ws_jwt import forget_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_ws_user(sender, instance, **kwargs):
+    # covers deactivation, password changes and deletes
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Conversation)
+def remember_members(sender, instance, created, **kwargs):
+    if created:
+        membership.remember(instance.pk, instance.buyer_id, instance.seller_id)
+
+
+@receiver(post_delete, sender=Conversation)
+def forget_members(sender, instance, **kwargs):
+    membership.forget(instance.pk)
+
+
+@receiver(post_save, sender=UserBlock)
+@receiver(post_delete, sender=UserBlock)
+def invalidate_block_sets(sender, instance, **kwargs):
+    blocks.invalidate(instance.blocker_id, instance.blocked_id)
+
+
+@receiver(post_save, sender=Message)
+def render_image(sender, instance, created, **kwargs):
+    if created and instance.image:
+        images.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=ArchiveSegment)
+def delete_archive_file(sender, instance, **kwargs):
+    default_storage.delete(instance.path)
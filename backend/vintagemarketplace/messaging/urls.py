@@ -1,15 +1,28 @@
 # messaging/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     ConversationViewSet,
     MessageViewSet,
+    PresenceViewSet,
     UserBlockViewSet,
     UserReportViewSet)
 
 router = DefaultRouter()
 router.register(r'conversations', ConversationViewSet, basename="conversation")
 router.register(r'messages', MessageViewSet, basename="messages")
+router.register(r'presence', PresenceViewSet, basename="presence")
 router.register(r'blocks', UserBlockViewSet, basename="blocks")
 router.register(r'reports', UserReportViewSet, basename="reports")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("async/conversations/", async_views.conversation_list,
+         name="async-conversation-list"),
+    path("async/conversations/<int:pk>/messages/", async_views.conversation_messages,
+         name="async-conversation-messages"),
+    path("async/conversations/<int:pk>/read/", async_views.conversation_read,
+         name="async-conversation-read"),
+    path("async/messages/", async_views.message_create,
+         name="async-message-create"),
+] + router.urls
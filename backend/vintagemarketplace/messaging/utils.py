@@ -1,58 +1,151 @@
 # messaging/utils.py
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+import base64
+import binascii
+import unicodedata
+from django.utils.dateparse import parse_datetime
+from . import eventlog, events, presence
 from .serializers import ConversationSerializer, MessageSerializer
-from .models import UserBlock  # (unchanged)
-
-channel_layer = get_channel_layer()
 
 def broadcast_conversation_upsert(convo, for_user_id: int):
     """
     Send an upsert of a conversation to the user's inbox group.
     Serializer gets per-user context so fields like other_last_read_for_me are correct.
+    Skipped (no serialization either) when the user has no inbox socket open.
     """
+    group = events.inbox_group(for_user_id)
+    if not events.registry.has_subscribers(group):
+        return
     data = ConversationSerializer(
         convo,
         context={"for_user_id": for_user_id},
     ).data
-
-    # ✅ align with InboxConsumer group name
-    group_name = f"inbox_user_{for_user_id}"
-
-    # ✅ align with InboxConsumer handler name (dot -> underscore)
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            "type": "inbox.conversation_upsert",  # maps to InboxConsumer.inbox_conversation_upsert
-            "conversation": data,
-        },
-    )
+    events.publish(events.CONVERSATION_UPSERT, group,
+                   key=("conversation_upsert", convo.pk), conversation=data)
 
 
 def broadcast_conversation_deleted(convo_id, user_ids):
     for uid in user_ids:
-        async_to_sync(channel_layer.group_send)(
-            f"inbox_user_{uid}",
-            {"type": "inbox.conversation_deleted", "id": convo_id},
-        )
+        events.publish(events.CONVERSATION_DELETED, events.inbox_group(uid), id=convo_id)
 
 def broadcast_unread_counts(user, counts_dict):
-    async_to_sync(channel_layer.group_send)(
-        f"inbox_user_{user.id}",
-        {"type": "inbox.unread_counts", "counts": counts_dict},
-    )
+    events.publish(events.UNREAD_COUNTS, events.inbox_group(user.id),
+                   key="unread_counts", counts=counts_dict)
+
+def broadcast_message_new(message, data=None, user_ids=None):
+    convo = message.conversation
+    if data is None:
+        data = MessageSerializer(message).data
+    for uid in user_ids if user_ids is not None else (convo.buyer_id, convo.seller_id):
+        events.publish(events.MESSAGE_NEW, events.inbox_group(uid),
+                       conversation=convo.id, message=data)
 
-def broadcast_message_new(message):
+def broadcast_new_message(message, data, origin):
+    """
+    Fan out a newly stored message once: the serialized message to the open
+    thread, plus per-user inbox upserts and message_new events.
+    """
     convo = message.conversation
-    data = MessageSerializer(message).data
-    for uid in (convo.buyer_id, convo.seller_id):
-        async_to_sync(channel_layer.group_send)(
-            f"inbox_user_{uid}",
-            {"type": "inbox.message_new", "conversation": convo.id, "message": data},
-        )
-
-def _is_blocked(a, b):
-    return UserBlock.objects.filter(
-        blocker=a,
-        blocked=b).exists() or UserBlock.objects.filter(
-        blocker=b, blocked=a).exists()
+    eventlog.publish(
+        convo.id, message.seq,
+        events.CHAT_MESSAGE,                # -> ChatConsumer.chat_message
+        message=data,
+        sender=message.sender.username,     # include for consumers that read event["sender"]
+        origin=origin,
+    )
+    # inbox events only for participants with a socket open somewhere
+    online = presence.online_ids((convo.buyer_id, convo.seller_id))
+    for uid in online:
+        broadcast_conversation_upsert(convo, uid)
+    broadcast_message_new(message, data=data, user_ids=online)
+
+
+def broadcast_inbox_refresh(convo):
+    """Re-send the conversation row to participants with an inbox open."""
+    for uid in presence.online_ids((convo.buyer_id, convo.seller_id)):
+        broadcast_conversation_upsert(convo, uid)
+
+
+def broadcast_message_edited(message):
+    eventlog.publish(message.conversation_id, None, events.MESSAGE_EDITED,
+                     message_id=message.pk, body=message.body,
+                     edited_at=message.edited_at.isoformat())
+
+
+def broadcast_message_deleted(message):
+    eventlog.publish(message.conversation_id, None, events.MESSAGE_DELETED,
+                     message_id=message.pk)
+
+
+def broadcast_message_reaction(message, user, emoji, added):
+    eventlog.publish(message.conversation_id, None, events.MESSAGE_REACTION,
+                     message_id=message.pk, emoji=emoji, username=user.username,
+                     added=added, counts=message.reaction_counts)
+
+
+def encode_cursor(stamp, pk):
+    """Opaque keyset cursor for a (timestamp, id) position."""
+    raw = f"{stamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor(); raises ValueError on anything malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        stamp, pk = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as exc:
+        raise ValueError(token) from exc
+    created_at = parse_datetime(stamp)
+    if created_at is None:
+        raise ValueError(token)
+    return created_at, int(pk)
+
+
+def encode_inbox_cursor(last_message_at, created_at, pk):
+    """Opaque keyset cursor for an inbox position; last_message_at may be None."""
+    raw = f"{last_message_at.isoformat() if last_message_at else ''}|{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_inbox_cursor(token):
+    """Inverse of encode_inbox_cursor(); raises ValueError on anything malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        last, created, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+    except (TypeError, UnicodeDecodeError, binascii.Error, ValueError) as exc:
+        raise ValueError(token) from exc
+    created_at = parse_datetime(created)
+    last_message_at = parse_datetime(last) if last else None
+    if created_at is None or (last and last_message_at is None):
+        raise ValueError(token)
+    return last_message_at, created_at, int(pk)
+
+
+_REGIONAL_INDICATORS = range(0x1F1E6, 0x1F200)
+_SKIN_TONES = range(0x1F3FB, 0x1F400)
+_TAGS = range(0xE0020, 0xE0080)
+_ZWJ, _VS16, _KEYCAP, _CANCEL_TAG = "\u200d", "\ufe0f", "\u20e3", "\U000e007f"
+
+
+def is_single_emoji(value):
+    """
+    True for exactly one emoji as the user sees it: a pictograph with an
+    optional presentation selector, skin tone or tag sequence, several of
+    those joined by ZWJ (👨‍👩‍👧, ❤️‍🔥), a flag, or a keycap.
+    """
+    if not isinstance(value, str) or not value:
+        return False
+    if len(value) == 2 and all(ord(c) in _REGIONAL_INDICATORS for c in value):
+        return True
+    if value[0] in "0123456789#*" and value[1:] in (_KEYCAP, _VS16 + _KEYCAP):
+        return True
+    for part in value.split(_ZWJ):
+        if (not part or unicodedata.category(part[0]) != "So"
+                or ord(part[0]) in _REGIONAL_INDICATORS):
+            return False
+        rest = part[1:]
+        if rest[:1] == _VS16 or (rest and ord(rest[0]) in _SKIN_TONES):
+            rest = rest[1:]
+        if rest and not (rest[-1] == _CANCEL_TAG and all(ord(c) in _TAGS for c in rest)):
+            return False
+    return True
@@ -1,5 +1,6 @@
 # messaging/views.py
-from django.db.models import Q, Subquery, OuterRef
+from django.db import connection, transaction
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
 from rest_framework.exceptions import PermissionDenied, ValidationError
@@ -7,21 +8,27 @@ from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from .utils import (
-    broadcast_message_new,
-    broadcast_conversation_upsert
+    broadcast_conversation_upsert,
+    broadcast_inbox_refresh,
+    broadcast_message_deleted,
+    broadcast_message_edited,
+    broadcast_message_reaction,
+    broadcast_new_message,
 )
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from . import archive, blocks, membership, presence, receipts
+from .blocks import BlockFilterMixin
 
-from .models import Conversation, Message, UserReport, UserBlock
+from .models import ClientIdConflict, Conversation, Message, UserReport, UserBlock
 from .serializers import (ConversationSerializer,
                           MessageSerializer,
                           UserBlockSerializer,
                           UserReportSerializer)
-from .utils import _is_blocked
+from .search import search_messages
+from .utils import (decode_cursor, decode_inbox_cursor, encode_cursor, encode_inbox_cursor,
+                    is_single_emoji)
 from vintageapi.models import Item
 
 
@@ -36,21 +43,191 @@ class MessagePagination(PageNumberPagination):
     max_page_size = 100
 
 
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), served by the partial
+    message_live_idx index. No OFFSET and no COUNT(*), and pages don't
+    shift when new messages arrive. Archived history (messaging.archive)
+    merges into the same pages.
+
+    - no cursor      -> the newest page
+    - ?before=<c>    -> the page of messages older than <c>
+    - ?after=<c>     -> the page of messages newer than <c>
+
+    Results come back in the requested display order (newest_first or not);
+    the response carries `before` / `after` cursors for the adjacent pages.
+    """
+    page_size = MessagePagination.page_size
+    page_size_query_param = MessagePagination.page_size_query_param
+    max_page_size = MessagePagination.max_page_size
+
+    @staticmethod
+    def wants_cursor(request):
+        params = request.query_params
+        return ("before" in params or "after" in params
+                or params.get("pagination") == "cursor")
+
+    @staticmethod
+    def encode_cursor(message):
+        return encode_cursor(message.created_at, message.pk)
+
+    @staticmethod
+    def decode_cursor(token):
+        try:
+            return decode_cursor(token)
+        except ValueError:
+            raise ValidationError({"cursor": ["Invalid cursor."]})
+
+    def get_page_size(self, request):
+        # plain Django requests too (messaging.async_views)
+        params = getattr(request, "query_params", request.GET)
+        try:
+            size = int(params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None, newest_first=False,
+                          archived=None):
+        """`archived`: a conversation id whose cold history (messaging.archive) merges in."""
+        size = self.get_page_size(request)
+        before = request.query_params.get("before")
+        after = request.query_params.get("after")
+        rows = list(self.keyset_queryset(queryset, before, after)[:size + 1])
+        if archived is not None:
+            rows = self.merge_archived(rows, archived, before, after, size + 1)
+        return self.finish_page(rows, size, after, newest_first)
+
+    def merge_archived(self, rows, conversation_id, before, after, limit):
+        """Merge keyset-ordered hot rows with the archived ones in the same range."""
+        # a full hot page only lets in archived rows between the cursor and
+        # its last row; usually no segment qualifies and nothing is read
+        until = (rows[-1].created_at, rows[-1].pk) if len(rows) >= limit else None
+        cold = archive.page(
+            conversation_id,
+            before=self.decode_cursor(before) if before else None,
+            after=self.decode_cursor(after) if after else None,
+            limit=limit,
+            until=until,
+        )
+        if not cold:
+            return rows
+        merged = sorted(rows + cold, key=lambda m: (m.created_at, m.pk), reverse=not after)
+        return merged[:limit]
+
+    def keyset_queryset(self, queryset, before, after):
+        """Ordered queryset for the page; fetch page_size + 1 rows from it."""
+        if before and after:
+            raise ValidationError({"cursor": ["Use either 'before' or 'after', not both."]})
+
+        if after:
+            created_at, pk = self.decode_cursor(after)
+            return queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+            ).order_by("created_at", "id")
+        qs = queryset
+        if before:
+            created_at, pk = self.decode_cursor(before)
+            qs = qs.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+        return qs.order_by("-created_at", "-id")
+
+    def finish_page(self, rows, size, after, newest_first=False):
+        """Trim the page_size + 1 fetched rows and set the adjacent cursors."""
+        self.has_more = len(rows) > size
+        rows = rows[:size]
+
+        # oldest -> newest, whichever direction we walked
+        chronological = rows if after else rows[::-1]
+        if chronological:
+            self.before_cursor = (self.encode_cursor(chronological[0])
+                                  if self.has_more or after else None)
+            self.after_cursor = self.encode_cursor(chronological[-1])
+        else:
+            # nothing newer yet: keep handing back the same cursor to poll with
+            self.before_cursor = None
+            self.after_cursor = after
+        return chronological[::-1] if newest_first else chronological
+
+    def page_data(self, data):
+        return {
+            "before": self.before_cursor,
+            "after": self.after_cursor,
+            "has_more": self.has_more,
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.page_data(data))
+
+
+class ConversationCursorPagination(BasePagination):
+    """
+    Keyset pagination for the inbox in the ConversationViewSet list order:
+    most recent message first, conversations without messages placed where
+    the database sorts NULLs. ?cursor=<c> continues after a previous page.
+    """
+    ordering = ("-last_message_at", "-created_at", "-id")
+    page_size = MessagePagination.page_size
+    page_size_query_param = MessagePagination.page_size_query_param
+    max_page_size = MessagePagination.max_page_size
+
+    get_page_size = MessageCursorPagination.get_page_size
+
+    @staticmethod
+    def encode_cursor(convo):
+        return encode_inbox_cursor(convo.last_message_at, convo.created_at, convo.pk)
+
+    def keyset_queryset(self, queryset, cursor):
+        """Ordered queryset for the page; fetch page_size + 1 rows from it."""
+        queryset = queryset.order_by(*self.ordering)
+        if not cursor:
+            return queryset
+        try:
+            last_message_at, created_at, pk = decode_inbox_cursor(cursor)
+        except ValueError:
+            raise ValidationError({"cursor": ["Invalid cursor."]})
+
+        older = Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        # descending order puts NULLs first where they sort largest (PostgreSQL)
+        nulls_first = connection.features.nulls_order_largest
+        if last_message_at is None:
+            rest = Q(last_message_at__isnull=True) & older
+            if nulls_first:
+                rest |= Q(last_message_at__isnull=False)
+        else:
+            rest = (Q(last_message_at__lt=last_message_at)
+                    | Q(last_message_at=last_message_at) & older)
+            if not nulls_first:
+                rest |= Q(last_message_at__isnull=True)
+        return queryset.filter(rest)
+
+
 # ---- permissions ----
+class IsSender(permissions.BasePermission):
+    """Only the author of a message can change or delete it."""
+    message = "Only the sender can change this message."
+
+    def has_object_permission(self, request, view, obj):
+        return obj.sender_id == request.user.id
+
+
 class IsParticipant(permissions.BasePermission):
     """Only buyer/seller of a conversation can access it."""
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, Conversation):
             return obj.buyer_id == request.user.id or obj.seller_id == request.user.id
         if isinstance(obj, Message):
-            c = obj.conversation
-            return c.buyer_id == request.user.id or c.seller_id == request.user.id
+            # cached (buyer_id, seller_id); no conversation row needed
+            return membership.is_participant(obj.conversation_id, request.user.id)
         return False
 
 
 # ---- viewsets ----
-class ConversationViewSet(viewsets.ModelViewSet):
+class ConversationViewSet(BlockFilterMixin, viewsets.ModelViewSet):
     serializer_class = ConversationSerializer
+    block_filter_fields = ("buyer", "seller")
     # For object actions we also enforce IsParticipant
     permission_classes = [permissions.IsAuthenticated]
 
@@ -61,26 +238,14 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        blocked_ids = list(UserBlock.objects.filter(blocker=user).values_list(
-            "blocked_id", flat=True)) + \
-                    list(UserBlock.objects.filter(blocked=user).values_list(
-                        "blocker_id", flat=True))
-
-        # Subqueries for last message details
-        last_msg = Message.objects.filter(conversation=OuterRef("pk")).order_by("-created_at")
-
-        return (
+        # Last-message preview and unread counters are denormalized on
+        # Conversation, so this is a single scan with no per-row subqueries;
+        # the block set comes from cache.
+        return self.exclude_blocked(
             Conversation.objects
-            .filter(Q(buyer=user) | Q(seller=user)).exclude(
-                    Q(buyer_id__in=blocked_ids) | Q(seller_id__in=blocked_ids)
-            )
-            .annotate(
-                last_message_body=Subquery(last_msg.values("body")[:1]),
-                last_message_sender_username=Subquery(
-                    last_msg.values("sender__username")[:1]),
-                last_message_at=Subquery(last_msg.values("created_at")[:1]),
-            )
-            .order_by("-last_message_at", "-created_at")
+            .filter(Q(buyer=user) | Q(seller=user))
+            .select_related("item", "buyer", "seller", "last_message_sender")
+            .order_by(*ConversationCursorPagination.ordering)
         )
 
     def create(self, request, *args, **kwargs):
@@ -92,7 +257,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
         item = get_object_or_404(Item, pk=item_id)
         buyer = request.user
         seller = getattr(item, "owner", None) or getattr(item, "seller", None)
-        if _is_blocked(buyer, seller):
+        if blocks.is_blocked(buyer.id, getattr(seller, "id", None)):
             return Response({"detail": "You cannot message this user."},
                             status=403)
         if seller is None:
@@ -118,6 +283,9 @@ class ConversationViewSet(viewsets.ModelViewSet):
           - ?newest_last=false
           - or ?ordering=-created_at
         (Also supports ?order=newest and ?newest_first=1/true for flexibility.)
+
+        Cursor mode (?before=<cursor>, ?after=<cursor> or ?pagination=cursor)
+        uses keyset pagination instead; see MessageCursorPagination.
         """
         convo = self.get_object()
 
@@ -148,18 +316,24 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
         # Stable ordering with tie-breaker to avoid shuffles on equal timestamps
         ordering = ("-created_at", "-id") if newest_first else ("created_at", "id")
-        qs = convo.messages.order_by(*ordering)
+        qs = (convo.messages.filter(is_deleted=False)
+              .select_related("sender").order_by(*ordering))
         # --- NEW: filters ---
+        # (filtered listings cover the hot table only, see messaging.archive)
+        filtered = False
         q = request.query_params.get("q")
         if q:
-            qs = qs.filter(body__icontains=q)
+            qs = search_messages(qs, q)
+            filtered = True
 
         has_image = request.query_params.get("has_image")
         if has_image is not None and truthy(has_image):
             qs = qs.filter(image__isnull=False)
+            filtered = True
 
         sender_filter = (request.query_params.get("from") or "").strip().lower()
         if sender_filter:
+            filtered = True
             if sender_filter in {"me", "self"}:
                 qs = qs.filter(sender=request.user)
             elif sender_filter in {"other", "them"}:
@@ -169,46 +343,49 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 # allow username
                 qs = qs.filter(sender__username=sender_filter)
 
-        paginator = MessagePagination()
-        page = paginator.paginate_queryset(qs, request, view=self)
+        if MessageCursorPagination.wants_cursor(request):
+            paginator = MessageCursorPagination()
+            page = paginator.paginate_queryset(
+                qs, request, view=self, newest_first=newest_first,
+                archived=None if filtered else convo.pk)
+        else:
+            paginator = MessagePagination()
+            page = paginator.paginate_queryset(
+                qs if filtered else archive.History(qs, convo.pk, newest_first),
+                request, view=self)
         ser = MessageSerializer(page, many=True, context={"request": request})
-        return paginator.get_paginated_response(ser.data)    
+        return paginator.get_paginated_response(ser.data)
 
     @action(detail=True, methods=["post"])
     def read(self, request, pk=None):
+        """
+        Mark read up to the latest message. Debounced per (user, conversation)
+        and written in batches (messaging.receipts); peers get a compact
+        read receipt instead of full conversation upserts.
+        """
         convo = self.get_object()
-        changed = convo.mark_as_read(request.user)
-
-        if changed:
-            layer = get_channel_layer()
-
-            # existing chat read receipt
-            async_to_sync(layer.group_send)(
-                f"chat_{convo.pk}",
-                {
-                    "type": "read.receipt",
-                    "conversation_id": convo.pk,
-                    "reader_username": request.user.username,
-                    "last_read_at": (
-                        convo.buyer_last_read if request.user.id == convo.buyer_id
-                        else convo.seller_last_read
-                    ).isoformat(),
-                },
-            )
-
-            for uid in (convo.buyer_id, convo.seller_id):
-                async_to_sync(layer.group_send)(
-                    f"inbox_user_{uid}",
-                    {
-                        "type": "inbox.conversation_upsert",
-                        "conversation": ConversationSerializer(
-                            convo, context={"for_user_id": uid}
-                        ).data,
-                    },
-                )
-
+        receipts.mark_read(request.user, convo)
         return Response({"ok": True})
 
+    @action(detail=False, methods=["post"], url_path="read-many")
+    def read_many(self, request):
+        """
+        Mark several conversations read in one call:
+        {"ids": [1, 2, 3]} or {"all": true} for every conversation I'm in.
+        """
+        user = request.user
+        qs = (Conversation.objects
+              .filter(Q(buyer=user) | Q(seller=user))
+              .only("id", "last_message_at"))
+        if not request.data.get("all"):
+            ids = request.data.get("ids")
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                raise ValidationError({"ids": ["A list of conversation ids is required."]})
+            qs = qs.filter(pk__in=ids)
+        convos = list(qs)
+        receipts.mark_read_many(user, convos)
+        return Response({"ok": True, "count": len(convos)})
+
     @action(detail=True, methods=["post"])
     def mute(self, request, pk=None):
         convo = self.get_object()
@@ -220,11 +397,16 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
 
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(BlockFilterMixin, viewsets.ModelViewSet):
     serializer_class = MessageSerializer
+    block_filter_fields = ("conversation__buyer", "conversation__seller")
+
+    MAX_EMOJI_LENGTH = 16
 
     def get_permissions(self):
-        if self.action in ("retrieve", "update", "partial_update", "destroy"):
+        if self.action in ("update", "partial_update", "destroy"):
+            return [permissions.IsAuthenticated(), IsParticipant(), IsSender()]
+        if self.action in ("retrieve", "react"):
             return [permissions.IsAuthenticated(), IsParticipant()]
         return [permissions.IsAuthenticated()]
 
@@ -254,49 +436,132 @@ class MessageViewSet(viewsets.ModelViewSet):
         if not body and not image:
             raise ValidationError({"non_field_errors": ["Message must contain text or an image."]})
 
-        # Save message with sender
-        msg = serializer.save(sender=user)
-
-        # Prepare serialized payloads
-        # Use request context for Message so image_url is absolute for REST clients
+        # A retried POST with the same client_id gets the stored message back,
+        # also when the retry races the original (Message.save updates the
+        # conversation's last-message preview and unread counter in the same
+        # transaction)
+        fields = dict(serializer.validated_data)
+        fields.pop("conversation")
+        try:
+            msg, created = Message.create_once(convo, user, client_id=fields.pop("client_id", None),
+                                               **fields)
+        except ClientIdConflict:
+            raise ValidationError({"client_id": ["Already used in another conversation."]})
+        serializer.instance = msg
+        if not created:
+            return
+
+        # Use request context for Message so image_url is absolute for REST clients;
+        # events are queued until commit and flushed with this request's batch
         ser_msg = MessageSerializer(msg, context={"request": self.request}).data
+        broadcast_new_message(msg, ser_msg, origin="rest.perform_create")
 
-        # For inbox WS, serialize conversation twice with per-user context
-        ser_convo_buyer  = ConversationSerializer(convo, context={"for_user_id": convo.buyer_id}).data
-        ser_convo_seller = ConversationSerializer(convo, context={"for_user_id": convo.seller_id}).data
-
-        # Broadcast to chat group (open thread)
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"chat_{convo.id}",
-            {
-                "type": "chat.message",     # -> ChatConsumer.chat_message
-                "message": ser_msg,
-                "sender": user.username,    # include for consumers that read event["sender"]
-                "origin": "rest.perform_create",
-            },
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Full-text search across all of my conversations, newest first.
+        ?q=<text> (required), optional ?conversation=<id>.
+        Skips deleted messages, conversations I deleted, and blocked users.
+        """
+        q = (request.query_params.get("q") or "").strip()
+        if not q:
+            raise ValidationError({"q": ["This field is required."]})
+
+        user = request.user
+        qs = self.exclude_blocked(
+            self.get_queryset()
+            .filter(is_deleted=False)
+            .exclude(Q(conversation__buyer=user, conversation__buyer_deleted=True)
+                     | Q(conversation__seller=user, conversation__seller_deleted=True))
         )
+        convo_id = request.query_params.get("conversation")
+        if convo_id:
+            if not convo_id.isdigit():
+                raise ValidationError({"conversation": ["A conversation id is required."]})
+            qs = qs.filter(conversation_id=int(convo_id))
 
-        # Broadcast to each participant’s inbox group (list/badges/preview)
-        for uid, payload in (
-            (convo.buyer_id,  ser_convo_buyer),
-            (convo.seller_id, ser_convo_seller),
-        ):
-            async_to_sync(channel_layer.group_send)(
-                f"user_inbox_{uid}",
-                {
-                    "type": "inbox.upsert",       # -> InboxConsumer.inbox_upsert
-                    "conversation": payload,
-                },
-            )
-            async_to_sync(channel_layer.group_send)(
-                f"user_inbox_{uid}",
-                {
-                    "type": "inbox.message_new",  # optional: separate event if you handle counts
-                    "conversation": convo.id,
-                    "message": ser_msg,
-                },
-            )
+        qs = search_messages(qs, q).order_by("-created_at", "-id")
+        paginator = MessagePagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        ser = MessageSerializer(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(ser.data)
+
+    def perform_update(self, serializer):
+        # Edits change the body only; the thread gets a small delta event,
+        # not the re-serialized message
+        instance = serializer.instance
+        if instance.is_deleted:
+            raise ValidationError({"non_field_errors": ["Deleted messages can't be edited."]})
+        changed = {name for name, value in serializer.validated_data.items()
+                   if name != "body" and getattr(instance, name) != value}
+        if changed:
+            raise ValidationError({name: ["Only the body can be edited."] for name in changed})
+        body = (serializer.validated_data.get("body") or "").strip()
+        if not body and not instance.image:
+            raise ValidationError({"body": ["Message must contain text or an image."]})
+        if body == instance.body:
+            return
+
+        with transaction.atomic():
+            preview_changed = instance.edit(body)
+            broadcast_message_edited(instance)
+            if preview_changed:
+                instance.conversation.refresh_from_db()
+                broadcast_inbox_refresh(instance.conversation)
+
+    def perform_destroy(self, instance):
+        # Soft delete keeps the row (reports may reference it) and adjusts the
+        # conversation's unread counter and preview in place.
+        with transaction.atomic():
+            if instance.soft_delete():
+                broadcast_message_deleted(instance)
+                broadcast_inbox_refresh(instance.conversation)
+
+    @action(detail=True, methods=["post", "delete"])
+    def react(self, request, pk=None):
+        """
+        POST {"emoji": "👍"} adds my reaction, DELETE with the same body
+        removes it. Returns the message's reaction counts.
+        """
+        message = self.get_object()
+        if message.is_deleted:
+            raise ValidationError({"non_field_errors": ["Deleted messages can't be reacted to."]})
+        emoji = request.data.get("emoji")
+        if not is_single_emoji(emoji) or len(emoji) > self.MAX_EMOJI_LENGTH:
+            raise ValidationError({"emoji": ["A single emoji is required."]})
+
+        add = request.method == "POST"
+        with transaction.atomic():
+            if message.react(request.user, emoji, add=add):
+                broadcast_message_reaction(message, request.user, emoji, added=add)
+        return Response({"id": message.pk, "reaction_counts": message.reaction_counts})
+
+
+class PresenceViewSet(viewsets.ViewSet):
+    """
+    Batch online/last-seen lookup for inbox rendering:
+    GET /presence/?ids=3,7,12 -> {"3": {"online": true, "last_seen": "..."}, ...}
+
+    Only people I share a conversation with are answered; ids of anyone
+    else, or of users blocked either way, are left out.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_IDS = 200
+
+    def list(self, request):
+        try:
+            ids = {int(i) for i in request.query_params.get("ids", "").split(",") if i.strip()}
+        except ValueError:
+            raise ValidationError({"ids": ["A comma-separated list of user ids is required."]})
+        if len(ids) > self.MAX_IDS:
+            raise ValidationError({"ids": [f"At most {self.MAX_IDS} ids per request."]})
+
+        user = request.user
+        pairs = (Conversation.objects
+                 .filter(Q(buyer=user, seller_id__in=ids) | Q(seller=user, buyer_id__in=ids))
+                 .values_list("buyer_id", "seller_id"))
+        allowed = {uid for pair in pairs for uid in pair} - {user.id} - blocks.blocked_ids(user.id)
+        return Response({str(uid): state for uid, state in presence.snapshot(allowed).items()})
 
 
 class UserBlockViewSet(viewsets.ModelViewSet):
@@ -1,17 +1,72 @@
 # messaging/ws_jwt.py
+import hashlib
+import time
 import urllib.parse
 import logging
 from channels.db import database_sync_to_async
 from django.db import close_old_connections
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
+from .localcache import LocalTTLCache
 
 log = logging.getLogger(__name__)
 
+# Verified tokens: sha256(raw token) -> user id, kept until the token's own
+# `exp`. Only tokens that passed signature/expiry checks ever get in.
+TOKEN_CACHE_SIZE = 10000
+# Hydrated users: id -> User. Short TTL bounds staleness in other processes;
+# saves/deletes in this process drop the entry at once (messaging.signals).
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 5000
+
+_tokens = LocalTTLCache(maxsize=TOKEN_CACHE_SIZE)
+_users = LocalTTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def _token_key(raw_token):
+    return hashlib.sha256(raw_token.encode()).hexdigest()
+
+
+_jwt_auth = JWTAuthentication()
+
+
+def forget_user(user_id):
+    """Drop a cached user; the next handshake re-checks it against the DB."""
+    _users.delete(user_id)
+
+
+async def authenticate_token(raw_token):
+    """
+    User for a raw access token, or None. A recently verified token with a
+    hydrated user is answered without a DB query or thread hop.
+    """
+    key = _token_key(raw_token)
+    user_id = _tokens.get(key)
+    if user_id is not None:
+        user = _users.get(user_id)
+        if user is not None:
+            return user
+    return await _authenticate_from_db(raw_token, key)
+
+
+@database_sync_to_async
+def _authenticate_from_db(raw_token, key):
+    try:
+        validated = _jwt_auth.get_validated_token(raw_token)
+        user = _jwt_auth.get_user(validated)   # raises for inactive users
+        close_old_connections()
+    except (InvalidToken, Exception):
+        return None
+    exp = validated.payload.get("exp")
+    if exp is not None:
+        _tokens.set(key, user.pk, ttl=exp - time.time())
+    _users.set(user.pk, user)
+    return user
+
+
 class JWTAuthMiddleware:
     def __init__(self, inner):
         self.inner = inner
-        self.jwt_auth = JWTAuthentication()
 
     async def __call__(self, scope, receive, send):
         # 🚫 Do NOT reset scope['user'] here. Let upstream middleware (AuthMiddlewareStack)
@@ -41,12 +96,5 @@ class JWTAuthMiddleware:
 
         return await self.inner(scope, receive, send)
 
-    @database_sync_to_async
-    def _authenticate(self, raw_token):
-        try:
-            validated = self.jwt_auth.get_validated_token(raw_token)
-            user = self.jwt_auth.get_user(validated)
-            close_old_connections()
-            return user
-        except (InvalidToken, Exception):
-            return None
+    async def _authenticate(self, raw_token):
+        return await authenticate_token(raw_token)
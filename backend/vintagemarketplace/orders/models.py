@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Avg, Count
 from django.contrib.auth.models import User
 from vintageapi.models import Item
 from django.conf import settings
@@ -33,6 +34,22 @@ class OrderItem(models.Model):
         return f"{self.item.title}"
 
 
+class ReviewQuerySet(models.QuerySet):
+    def rating_summary(self, seller_ids):
+        """
+        {seller_id: (average_rating, review_count)} for the given sellers,
+        in a single grouped query. Sellers without reviews are omitted.
+        """
+        seller_ids = {sid for sid in seller_ids if sid is not None}
+        if not seller_ids:
+            return {}
+        rows = (self.filter(seller_id__in=seller_ids)
+                .order_by()
+                .values("seller_id")
+                .annotate(avg=Avg("rating"), n=Count("id")))
+        return {row["seller_id"]: (row["avg"], row["n"]) for row in rows}
+
+
 class Review(models.Model):
     order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='reviews')
     item = models.ForeignKey('vintageapi.Item', on_delete=models.CASCADE, related_name='reviews')
@@ -44,6 +61,8 @@ class Review(models.Model):
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ReviewQuerySet.as_manager()
+
     class Meta:
         unique_together = ('order', 'item', 'buyer')  # Prevent duplicate reviews for same purchase
 
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, Review
-from vintageapi.serializers import ItemSerializer
+from vintageapi.serializers import (ItemSerializer, SellerRatingListSerializer,
+                                    SellerRatingMixin)
 from vintageapi.models import Item
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SellerRatingMixin, serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
     item_id = serializers.PrimaryKeyRelatedField(
         queryset=OrderItem.objects.all(), source='item', write_only=True
@@ -13,6 +14,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['id', 'item', 'item_id', 'price']
+        # prefetches ratings for the nested ItemSerializer (shared context)
+        list_serializer_class = SellerRatingListSerializer
+
+    seller_id_path = "item.seller_id"
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -1,9 +1,15 @@
+import asyncio
 import io
+import json
+import threading
 import pytest
+from asgiref.testing import ApplicationCommunicator
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from vintageapi.models import Item
+from messaging import presence
 from messaging.models import Conversation, Message
 from PIL import Image
 
@@ -14,6 +20,20 @@ import django
 django.setup()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # the DB rolls back between tests but locmem doesn't, and ids get reused
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_presence():
+    yield
+    presence.get_backend().clear()
+
+
 @pytest.fixture
 @pytest.mark.django_db
 def user_a():
@@ -94,3 +114,91 @@ def seed_messages(conversation, user_a, user_b):
     Message.objects.create(conversation=conversation, sender=user_b, body="Hello")
     Message.objects.create(conversation=conversation, sender=user_a, body="Interested!")
     return conversation
+
+
+class WSClient:
+    """
+    Tiny sync wrapper around an ASGI websocket consumer for tests
+    (channels.testing pulls in daphne, which we don't ship).
+
+    The consumer runs on an event loop thread (shared by all clients of a
+    test, so the in-memory channel layer wakes peers promptly), so its DB
+    work happens on another connection: use django_db(transaction=True).
+    """
+    def __init__(self, consumer, path, user, url_kwargs=None, loop=None):
+        path, _, query = path.partition("?")
+        self.scope = {
+            "type": "websocket",
+            "path": path,
+            "query_string": query.encode(),
+            "headers": [],
+            "subprotocols": [],
+            "user": user,
+            "url_route": {"args": (), "kwargs": url_kwargs or {}},
+        }
+        self._app = consumer.as_asgi()
+        self._owns_loop = loop is None
+        self._loop = loop or _start_loop()
+        self._comm = self._run(self._make_communicator())
+
+    async def _make_communicator(self):
+        return ApplicationCommunicator(self._app, self.scope)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def connect(self):
+        self._run(self._comm.send_input({"type": "websocket.connect"}))
+        return self._run(self._comm.receive_output(1))
+
+    def send_json(self, data):
+        self._run(self._comm.send_input(
+            {"type": "websocket.receive", "text": json.dumps(data)}))
+
+    def receive_json(self, timeout=1):
+        out = self._run(self._comm.receive_output(timeout))
+        return json.loads(out["text"])
+
+    def receive_nothing(self, timeout=0.1):
+        return self._run(self._comm.receive_nothing(timeout))
+
+    def disconnect(self):
+        if self._loop.is_closed():
+            return
+        self._run(self._comm.send_input({"type": "websocket.disconnect", "code": 1000}))
+        try:
+            self._run(self._comm.wait(1))
+        finally:
+            if self._owns_loop:
+                _stop_loop(self._loop)
+
+
+def _start_loop():
+    loop = asyncio.new_event_loop()
+    loop._thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop._thread.start()
+    return loop
+
+
+def _stop_loop(loop):
+    loop.call_soon_threadsafe(loop.stop)
+    loop._thread.join(1)
+    loop.close()
+
+
+@pytest.fixture
+def ws_client():
+    clients = []
+    loop = _start_loop()
+
+    def _factory(consumer, path, user, **url_kwargs):
+        client = WSClient(consumer, path, user, url_kwargs, loop=loop)
+        clients.append(client)
+        return client
+    yield _factory
+    for client in clients:
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+    _stop_loop(loop)
@@ -0,0 +1,114 @@
+import pytest
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from messaging import broadcast, membership
+from messaging.models import Conversation, Message, UserBlock
+from vintageapi.models import Item
+
+BASE = "/api/messages/async"
+
+
+class RecordingLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, event):
+        self.sent.append((group, event))
+
+
+@pytest.fixture
+def async_client_a(user_a):
+    return Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user_a)}")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_create_is_idempotent_and_broadcasts_in_loop(async_client_a, conversation, monkeypatch):
+    layer = RecordingLayer()
+    monkeypatch.setattr(broadcast, "get_channel_layer", lambda: layer)
+    payload = {"conversation": conversation.id, "body": "Is it still available?", "client_id": "a-1"}
+
+    first = async_client_a.post(f"{BASE}/messages/", payload, content_type="application/json")
+    assert first.status_code == 201
+    assert f"chat_{conversation.id}" in {group for group, _ in layer.sent}
+
+    sent = len(layer.sent)
+    second = async_client_a.post(f"{BASE}/messages/", payload, content_type="application/json")
+    assert second.status_code == 200
+    assert second.json()["id"] == first.json()["id"]
+    assert len(layer.sent) == sent
+    assert Message.objects.filter(conversation=conversation).count() == 1
+
+    assert Client().post(f"{BASE}/messages/", payload, content_type="application/json").status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_message_pages_walk_back_with_cursors(async_client_a, conversation, seed_messages):
+    url = f"{BASE}/conversations/{conversation.id}/messages/"
+    newest = async_client_a.get(url, {"page_size": 2}).json()
+    assert newest["has_more"] is True
+    older = async_client_a.get(url, {"page_size": 2, "before": newest["before"]}).json()
+
+    ids = [m["id"] for m in older["results"] + newest["results"]]
+    expected = list(Message.objects.filter(conversation=conversation)
+                    .order_by("created_at", "id").values_list("id", flat=True))
+    assert ids == expected[-4:]
+    assert async_client_a.get(url, {"before": "nope"}).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_inbox_and_read(async_client_a, conversation, user_a, user_b):
+    Message.objects.create(conversation=conversation, sender=user_b, body="Hi")
+    convos = async_client_a.get(f"{BASE}/conversations/").json()["results"]
+    assert [c["id"] for c in convos] == [conversation.id]
+    assert convos[0]["unread_count_for_me"] == 1
+
+    res = async_client_a.post(f"{BASE}/conversations/{conversation.id}/read/")
+    assert res.status_code == 200
+    conversation.refresh_from_db()
+    assert conversation.buyer_unread_count == 0
+
+    UserBlock.objects.create(blocker=user_b, blocked=user_a)
+    assert async_client_a.get(f"{BASE}/conversations/").json()["results"] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_inbox_pages_follow_the_rest_list(async_client_a, auth_client_a, conversation,
+                                                user_a, user_b, user_c):
+    def open_convo(n):
+        item = Item.objects.create(title=f"Item {n}", description="", price="5.00", seller=user_c)
+        return Conversation.objects.create(item=item, buyer=user_a, seller=user_c)
+
+    convos = [conversation, open_convo(1), open_convo(2)]
+    Message.objects.create(conversation=convos[2], sender=user_c, body="Hi")
+    Message.objects.create(conversation=convos[0], sender=user_b, body="Hi")
+    # opened after the last message but still empty: ordered like the REST list
+    convos.append(open_convo(3))
+
+    expected = [c["id"] for c in auth_client_a.get("/api/messages/conversations/").data["results"]]
+    walked, params = [], {"page_size": 1}
+    while True:
+        page = async_client_a.get(f"{BASE}/conversations/", params).json()
+        walked += [c["id"] for c in page["results"]]
+        if not page["has_more"]:
+            break
+        params["cursor"] = page["cursor"]
+    assert walked == expected and sorted(walked) == sorted(c.id for c in convos)
+    assert walked[:2] == [convos[0].id, convos[2].id]
+    assert async_client_a.get(f"{BASE}/conversations/", {"cursor": "nope"}).status_code == 400
+
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_writes_to_a_deleted_conversation_are_not_found(async_client_a, conversation,
+                                                              user_a, user_b):
+    convo_id = conversation.id
+    conversation.delete()
+    # another worker's membership cache still knows the conversation
+    membership.remember(convo_id, user_a.id, user_b.id)
+
+    payload = {"conversation": convo_id, "body": "Still there?"}
+    res = async_client_a.post(f"{BASE}/messages/", payload, content_type="application/json")
+    assert res.status_code == 404
+    assert async_client_a.post(f"{BASE}/conversations/{convo_id}/read/").status_code == 404
+    assert not Message.objects.exists()
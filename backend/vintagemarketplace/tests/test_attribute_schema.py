@@ -0,0 +1,46 @@
+import pytest
+
+from catalog.models import Attribute, AttributeOption, Category, CategoryAttribute
+
+ATTRS = "/api/catalog/categories/{id}/attributes/"
+
+
+@pytest.fixture
+def schema_taxonomy():
+    men = Category.objects.create(name="Men")
+    jeans = Category.objects.create(name="Jeans", parent=men)
+    condition = Attribute.objects.create(name="Condition", slug="condition")
+    waist = Attribute.objects.create(name="Waist", slug="waist")
+    fit = Attribute.objects.create(name="Fit", slug="fit")
+    AttributeOption.objects.create(attribute=fit, value="Slim")
+    CategoryAttribute.objects.create(category=men, attribute=condition, position=5)
+    CategoryAttribute.objects.create(category=jeans, attribute=waist, position=0)
+    CategoryAttribute.objects.create(category=jeans, attribute=fit, position=1)
+    return {"men": men, "jeans": jeans, "fit": fit}
+
+
+@pytest.mark.django_db
+def test_schema_merges_ancestors_in_position_order(api_client, schema_taxonomy):
+    res = api_client.get(ATTRS.format(id=schema_taxonomy["jeans"].id))
+    assert res.status_code == 200
+    assert [a["slug"] for a in res.data] == ["waist", "fit", "condition"]
+    assert res.data[2]["inherited_from"] == schema_taxonomy["men"].id
+    assert res.data[1]["options"] == [{"id": schema_taxonomy["fit"].options.get().id, "value": "Slim"}]
+
+
+@pytest.mark.django_db
+def test_schema_is_cached_until_a_signal_invalidates_it(api_client, schema_taxonomy, django_assert_num_queries):
+    url = ATTRS.format(id=schema_taxonomy["jeans"].id)
+    api_client.get(url)
+    with django_assert_num_queries(0):
+        api_client.get(url)
+
+    AttributeOption.objects.create(attribute=schema_taxonomy["fit"], value="Relaxed")
+    res = api_client.get(url)
+    fit = next(a for a in res.data if a["slug"] == "fit")
+    assert [o["value"] for o in fit["options"]] == ["Relaxed", "Slim"]
+
+
+@pytest.mark.django_db
+def test_unknown_category_is_404(api_client):
+    assert api_client.get(ATTRS.format(id=999999)).status_code == 404
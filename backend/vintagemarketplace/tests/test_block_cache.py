@@ -0,0 +1,45 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from messaging import blocks
+from messaging.models import UserBlock
+
+
+@pytest.mark.django_db
+def test_block_set_covers_both_directions_and_is_invalidated(user_a, user_b, user_c, django_assert_num_queries):
+    assert blocks.blocked_ids(user_a.id) == frozenset()
+
+    block = UserBlock.objects.create(blocker=user_b, blocked=user_a)
+    assert blocks.blocked_ids(user_a.id) == {user_b.id}
+    assert blocks.blocked_ids(user_b.id) == {user_a.id}
+    with django_assert_num_queries(0):
+        assert blocks.is_blocked(user_a.id, user_b.id)
+        assert blocks.is_blocked(user_b.id, user_a.id)
+        assert not blocks.is_blocked(user_a.id, user_c.id)
+
+    block.delete()
+    assert not blocks.is_blocked(user_a.id, user_b.id)
+
+
+@pytest.mark.django_db
+def test_listings_hide_blocked_users_without_querying_blocks(auth_client_a, user_a, user_b, item, conversation):
+    UserBlock.objects.create(blocker=user_a, blocked=user_b)
+    auth_client_a.get("/api/items/")
+
+    with CaptureQueriesContext(connection) as queries:
+        items = auth_client_a.get("/api/items/").data["results"]
+        convos = auth_client_a.get("/api/messages/conversations/").data
+    assert item.id not in [i["id"] for i in items]
+    assert conversation.id not in [c["id"] for c in convos.get("results", convos)]
+    assert not any("messaging_userblock" in q["sql"] for q in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_blocking_through_the_api_applies_to_the_next_read(auth_client_a, user_a, user_b, item):
+    # a cached "no blocks" set must not outlive the block
+    assert item.id in [i["id"] for i in auth_client_a.get("/api/items/").data["results"]]
+    assert auth_client_a.post("/api/messages/blocks/", {"blocked": user_b.username}).status_code == 201
+
+    assert item.id not in [i["id"] for i in auth_client_a.get("/api/items/").data["results"]]
+    assert blocks.timeout() == blocks.LOCAL_TIMEOUT   # locmem: per-process, short-lived
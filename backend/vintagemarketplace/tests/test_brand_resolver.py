@@ -0,0 +1,69 @@
+import pytest
+
+from catalog import brands
+from catalog.models import Brand
+from vintageapi.models import Item
+
+AUTOCOMPLETE = "/api/catalog/brands/autocomplete/"
+
+
+@pytest.fixture
+def brand_catalog():
+    return {
+        "levis": Brand.objects.create(name="Levi's", synonyms=["Levis", "Levi Strauss", "Levi Strauss & Co"]),
+        "lee": Brand.objects.create(name="Lee"),
+        "tnf": Brand.objects.create(name="The North Face", synonyms=["TNF"]),
+    }
+
+
+@pytest.mark.django_db
+def test_resolve_maps_synonyms_to_canonical_brand(brand_catalog):
+    levis = brand_catalog["levis"]
+    for text in ["levis", "LEVI'S", "Levi Strauss", "levi strauss & co", "  Lévis "]:
+        assert (brands.resolve(text) or {}).get("id") == levis.id, text
+    assert brands.resolve("tnf")["name"] == "The North Face"
+    assert brands.resolve("Wrangler") is None
+
+
+@pytest.mark.django_db
+def test_autocomplete_is_served_from_memory(api_client, brand_catalog, django_assert_num_queries):
+    api_client.get(AUTOCOMPLETE, {"q": "le"})
+    with django_assert_num_queries(0):
+        res = api_client.get(AUTOCOMPLETE, {"q": "le"})
+    assert res.status_code == 200
+    assert [b["name"] for b in res.data] == ["Lee", "Levi's"]
+
+    # word-level prefixes match inside multi-word names
+    assert [b["name"] for b in api_client.get(AUTOCOMPLETE, {"q": "north"}).data] == ["The North Face"]
+
+
+@pytest.mark.django_db
+def test_index_rebuilds_when_a_brand_changes(brand_catalog):
+    assert brands.resolve("wrangler") is None
+    wrangler = Brand.objects.create(name="Wrangler", synonyms=["Wranglers"])
+    assert brands.resolve("wranglers")["id"] == wrangler.id
+
+    brand_catalog["lee"].delete()
+    assert brands.resolve("lee") is None
+
+
+
+@pytest.mark.django_db
+def test_index_is_rebuilt_after_max_age(brand_catalog, monkeypatch):
+    assert brands.resolve("lee")["name"] == "Lee"
+    # no signal, so no version bump: only the age check can notice
+    Brand.objects.filter(pk=brand_catalog["lee"].pk).update(name="Lee Jeans")
+    assert brands.resolve("lee jeans") is None
+
+    monkeypatch.setattr(brands, "INDEX_MAX_AGE", 0)
+    assert brands.resolve("lee jeans")["id"] == brand_catalog["lee"].pk
+
+
+@pytest.mark.django_db
+def test_item_creation_canonicalizes_free_text_brand(auth_client_a, brand_catalog):
+    res = auth_client_a.post("/api/items/", {
+        "title": "501 jeans", "description": "Classic", "price": "40.00", "brand_name": "levi strauss",
+    })
+    assert res.status_code == 201, res.data
+    assert res.data["brand"] == brand_catalog["levis"].id
+    assert Item.objects.get(pk=res.data["id"]).brand_id == brand_catalog["levis"].id
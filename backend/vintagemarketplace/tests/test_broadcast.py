@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import transaction
+
+from messaging import broadcast
+
+
+class RecordingLayer:
+    def __init__(self):
+        self.sent = []
+        self.threads = set()
+
+    async def group_send(self, group, event):
+        self.threads.add(threading.get_ident())
+        self.sent.append((group, event))
+
+
+@pytest.fixture
+def layer(monkeypatch):
+    recording = RecordingLayer()
+    monkeypatch.setattr(broadcast, "get_channel_layer", lambda: recording)
+    broadcast.dispatcher.stats.reset()
+    return recording
+
+
+@pytest.mark.django_db(transaction=True)
+def test_request_events_flush_as_one_batch(auth_client_a, conversation, layer):
+    res = auth_client_a.post("/api/messages/messages/", {"conversation": conversation.id, "body": "Still available?"})
+    assert res.status_code == 201
+
+    groups = [group for group, _ in layer.sent]
+    assert f"chat_{conversation.id}" in groups
+    stats = broadcast.dispatcher.stats.snapshot()
+    assert stats["batches"] == 1
+    assert stats["events"] == len(layer.sent)
+    assert stats["queue_depth"] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_events_wait_for_commit_and_drop_on_rollback(layer):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            broadcast.send("chat_1", {"type": "chat.message", "n": 1})
+            raise RuntimeError
+    assert layer.sent == []
+
+    with transaction.atomic():
+        broadcast.send("chat_1", {"type": "chat.message", "n": 2})
+        assert layer.sent == []
+    assert layer.sent == [("chat_1", {"type": "chat.message", "n": 2})]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_keyed_events_coalesce_within_a_batch(layer):
+    with broadcast.batch():
+        for n in range(3):
+            broadcast.send("inbox_user_1", {"type": "inbox.conversation_upsert", "n": n}, key=("upsert", 7))
+        broadcast.send("inbox_user_2", {"type": "inbox.conversation_upsert", "n": 0}, key=("upsert", 7))
+        assert layer.sent == []
+    assert layer.sent == [
+        ("inbox_user_1", {"type": "inbox.conversation_upsert", "n": 2}),
+        ("inbox_user_2", {"type": "inbox.conversation_upsert", "n": 0}),
+    ]
+    assert broadcast.dispatcher.stats.snapshot()["coalesced"] == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_mode_flushes_off_the_request_thread(layer, settings):
+    settings.MESSAGING_BROADCAST_SYNC = False
+    with broadcast.batch():
+        broadcast.send("chat_1", {"type": "chat.message"})
+    broadcast.dispatcher.drain()
+    assert layer.sent == [("chat_1", {"type": "chat.message"})]
+    assert threading.get_ident() not in layer.threads
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_batch_does_not_wait_for_the_flush(layer, settings):
+    settings.MESSAGING_BROADCAST_SYNC = False
+    release = threading.Event()
+    real_send = layer.group_send
+
+    async def slow_send(group, event):
+        release.wait(2)
+        await real_send(group, event)
+    layer.group_send = slow_send
+
+    async def view():
+        async with broadcast.abatch():
+            await sync_to_async(broadcast.send)("chat_1", {"type": "chat.message"})
+        return layer.sent[:]
+
+    assert async_to_sync(view)() == []      # returned while the send was blocked
+    release.set()
+    broadcast.dispatcher.drain()
+    assert layer.sent == [("chat_1", {"type": "chat.message"})]
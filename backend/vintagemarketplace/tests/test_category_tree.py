@@ -0,0 +1,78 @@
+import pytest
+from django.core.cache import cache
+
+from catalog import cache as catalog_cache
+from catalog.models import Category
+from vintageapi.models import Item
+
+CATEGORIES = "/api/catalog/categories/"
+TREE = "/api/catalog/categories/tree/"
+
+
+@pytest.fixture
+def taxonomy():
+    clothing = Category.objects.create(name="Clothing")
+    bottoms = Category.objects.create(name="Bottoms", parent=clothing)
+    jeans = Category.objects.create(name="Jeans", parent=bottoms)
+    footwear = Category.objects.create(name="Footwear")
+    return {"clothing": clothing, "bottoms": bottoms, "jeans": jeans, "footwear": footwear}
+
+
+@pytest.mark.django_db
+def test_paths_and_subtree_queries(taxonomy):
+    jeans = taxonomy["jeans"]
+    assert jeans.path == f"{taxonomy['clothing'].id}/{taxonomy['bottoms'].id}/{jeans.id}/"
+    assert jeans.depth == 2
+    assert list(jeans.ancestors()) == [taxonomy["clothing"], taxonomy["bottoms"]]
+    assert set(taxonomy["clothing"].descendants()) == {taxonomy["bottoms"], jeans}
+
+
+@pytest.mark.django_db
+def test_moving_a_node_rewrites_its_subtree(taxonomy):
+    bottoms = taxonomy["bottoms"]
+    bottoms.parent = taxonomy["footwear"]
+    bottoms.save()
+
+    jeans = Category.objects.get(pk=taxonomy["jeans"].pk)
+    assert jeans.path.startswith(taxonomy["footwear"].path)
+    assert jeans.depth == 2
+    assert not taxonomy["clothing"].descendants().exists()
+
+
+@pytest.mark.django_db
+def test_items_can_be_filtered_by_category_subtree(api_client, taxonomy, user_b):
+    Item.objects.create(title="501s", description="", price="30.00", seller=user_b, category=taxonomy["jeans"])
+    Item.objects.create(title="Boots", description="", price="30.00", seller=user_b, category=taxonomy["footwear"])
+
+    res = api_client.get(f"/api/items/?category={taxonomy['clothing'].id}")
+    assert [i["title"] for i in res.data["results"]] == ["501s"]
+
+
+@pytest.mark.django_db
+def test_tree_endpoint_is_cached_with_etag(api_client, taxonomy, django_assert_num_queries):
+    first = api_client.get(TREE)
+    assert first.status_code == 200
+    clothing = next(n for n in first.data if n["name"] == "Clothing")
+    assert clothing["children"][0]["children"][0]["name"] == "Jeans"
+
+    etag = first["ETag"]
+    with django_assert_num_queries(0):
+        assert api_client.get(TREE, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    Category.objects.create(name="Hats", parent=taxonomy["clothing"])
+    changed = api_client.get(TREE, HTTP_IF_NONE_MATCH=etag)
+    assert changed.status_code == 200
+    assert changed["ETag"] != etag
+
+
+
+@pytest.mark.django_db
+def test_tree_picks_up_unsignalled_changes_once_the_token_lapses(api_client, taxonomy):
+    api_client.get(TREE)
+    # renamed by a worker whose bump this process's cache never saw
+    Category.objects.filter(pk=taxonomy["footwear"].pk).update(name="Shoes")
+    assert "Shoes" not in [n["name"] for n in api_client.get(TREE).data]
+
+    assert catalog_cache.version_timeout() == catalog_cache.LOCAL_VERSION_TIMEOUT
+    cache.delete(catalog_cache.VERSION_KEY.format(name=catalog_cache.CATEGORY_TREE))  # expired
+    assert "Shoes" in [n["name"] for n in api_client.get(TREE).data]
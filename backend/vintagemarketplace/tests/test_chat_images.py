@@ -0,0 +1,51 @@
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from messaging.models import Message
+
+MSG_CREATE = "/api/messages/messages/"
+
+
+def _upload(fmt, size, name, content_type, exif=None):
+    buf = io.BytesIO()
+    options = {"exif": exif} if exif is not None else {}
+    Image.new("RGB", size, (200, 120, 40)).save(buf, format=fmt, **options)
+    return SimpleUploadedFile(name, buf.getvalue(), content_type=content_type)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_is_stripped_and_gets_webp_renditions(auth_client_a, conversation, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"   # Make
+    exif[0x8825] = {2: (51.0, 30.0, 0.0)}   # GPS latitude
+    photo = _upload("JPEG", (2000, 1500), "photo.jpg", "image/jpeg", exif=exif.tobytes())
+
+    res = auth_client_a.post(MSG_CREATE, {"conversation": conversation.id, "image": photo},
+                             format="multipart")
+    assert res.status_code == 201
+
+    msg = Message.objects.get(pk=res.data["id"])
+    with msg.image.open("rb") as fh:
+        assert not Image.open(fh).getexif()
+    assert (msg.image_medium_width, msg.image_medium_height) == (1280, 960)
+    assert (msg.image_thumb_width, msg.image_thumb_height) == (320, 240)
+
+    data = auth_client_a.get(f"/api/messages/conversations/{conversation.id}/messages/").data
+    listed = next(m for m in data["results"] if m["id"] == msg.id)
+    assert listed["image_url"].endswith("_medium.webp")
+    assert listed["thumb_url"].endswith("_thumb.webp")
+    assert (listed["image_width"], listed["image_height"]) == (1280, 960)
+
+
+@pytest.mark.django_db
+def test_declared_content_type_is_not_trusted(auth_client_a, conversation, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    bitmap = _upload("BMP", (10, 10), "pic.png", "image/png")
+    res = auth_client_a.post(MSG_CREATE, {"conversation": conversation.id, "image": bitmap},
+                             format="multipart")
+    assert res.status_code == 400
+    assert "image" in res.data
@@ -0,0 +1,85 @@
+import pytest
+from channels.layers import get_channel_layer
+
+from messaging import eventlog, events, receipts
+from messaging.consumers import ChatConsumer
+from messaging.models import Conversation
+
+MSG_CREATE = "/api/messages/messages/"
+
+
+def _send(client, conversation, *bodies):
+    return [client.post(MSG_CREATE, {"conversation": conversation.id, "body": b}).data["seq"]
+            for b in bodies]
+
+
+def _resume(ws_client, conversation, user, seq):
+    ws = ws_client(ChatConsumer, f"/ws/chat/{conversation.id}/?resume_from={seq}", user,
+                   convo_id=conversation.id)
+    assert ws.connect()["type"] == "websocket.accept"
+    assert ws.receive_json()["type"] == "hello"
+    return ws
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reconnect_replays_only_the_missed_events(ws_client, auth_client_a, conversation, user_b):
+    assert _send(auth_client_a, conversation, "Hi", "Still there?", "30?") == [1, 2, 3]
+    conversation.refresh_from_db()
+    receipts.mark_read(user_b, conversation)
+
+    ws = _resume(ws_client, conversation, user_b, 1)
+    frames = [ws.receive_json() for _ in range(4)]
+    assert [(f["type"], f.get("seq")) for f in frames] == [
+        ("chat_message", 2), ("chat_message", 3), ("read_receipt", 4), ("resumed", 4)]
+    assert frames[1]["message"]["body"] == "30?"
+    assert ws.receive_nothing(0.1)
+
+    # live events keep counting from there
+    _send(auth_client_a, conversation, "Deal")
+    live = ws.receive_json()
+    assert (live["type"], live["seq"]) == ("chat_message", 5)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_gap_older_than_the_buffer_asks_for_resync(ws_client, auth_client_a, conversation, user_b, settings):
+    settings.MESSAGING_REPLAY_BUFFER = 2
+    _send(auth_client_a, conversation, "a", "b", "c")
+
+    assert _resume(ws_client, conversation, user_b, 0).receive_json() == {"type": "resync", "seq": 3}
+    up_to_date = _resume(ws_client, conversation, user_b, 3)
+    assert up_to_date.receive_json() == {"type": "resumed", "seq": 3}
+
+
+def _event(seq, body):
+    return events.CHAT_MESSAGE.build(message={"id": seq, "body": body}, sender="alice", seq=seq)
+
+
+def _deliver(ws, conversation, event):
+    # straight into the group, as a late batch flush would
+    ws._run(get_channel_layer().group_send(events.chat_group(conversation.id), event))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_event_ahead_of_a_gap_waits_for_the_missing_one(ws_client, conversation, user_b):
+    ws = _resume(ws_client, conversation, user_b, 0)
+    assert ws.receive_json() == {"type": "resumed", "seq": 0}
+
+    _deliver(ws, conversation, _event(2, "second"))
+    assert ws.receive_nothing(0.1)
+    _deliver(ws, conversation, _event(1, "first"))
+    assert [(f["seq"], f["message"]["body"]) for f in (ws.receive_json(), ws.receive_json())] == [
+        (1, "first"), (2, "second")]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_gap_that_never_closes_is_filled_from_the_log(ws_client, conversation, user_b, settings):
+    settings.CHAT_GAP_WAIT_SECONDS = 0.05
+    ws = _resume(ws_client, conversation, user_b, 0)
+    ws.receive_json()
+
+    # seq 1 was logged but its broadcast never reached this socket
+    eventlog.record([(conversation.id, 1, _event(1, "first")), (conversation.id, 2, _event(2, "second"))])
+    Conversation.objects.filter(pk=conversation.pk).update(event_seq=2)
+    _deliver(ws, conversation, _event(2, "second"))
+
+    assert [f["seq"] for f in (ws.receive_json(), ws.receive_json())] == [1, 2]
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from messaging import events, presence
+from messaging.consumers import InboxConsumer
+
+MSG_CREATE = "/api/messages/messages/"
+
+
+class RecordingLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, event):
+        self.sent.append((group, event))
+
+
+def test_schemas_are_validated_at_publish_time():
+    event = events.CONVERSATION_DELETED.build(id=3)
+    assert event == {"type": "inbox.conversation_deleted", "v": 1, "id": 3}
+
+    with pytest.raises(events.EventSchemaError):
+        events.MESSAGE_NEW.build(conversation=1)              # missing message
+    with pytest.raises(events.EventSchemaError):
+        events.CONVERSATION_DELETED.build(id=3, extra=True)   # unknown field
+    with pytest.raises(events.EventSchemaError):
+        events.CONVERSATION_DELETED.build(id="3")             # wrong type
+
+
+def test_groups_without_subscribers_are_skipped(monkeypatch):
+    layer = RecordingLayer()
+    group = events.inbox_group(987654)
+
+    # never seen: unknown counts as subscribed
+    assert async_to_sync(events.apublish)(layer, events.CONVERSATION_DELETED, group, id=1)
+
+    async def cycle():
+        await events.registry.asubscribe(group, "chan.1")
+        await events.registry.aunsubscribe(group, "chan.1")
+    async_to_sync(cycle)()
+    assert events.registry.count(group) == 0
+    # a socket that joined before a registry flush may not have re-registered yet
+    assert async_to_sync(events.apublish)(layer, events.CONVERSATION_DELETED, group, id=2)
+
+    # nothing joined or refreshed for a whole TTL: provably nobody listening
+    later = time.time() + presence.ttl() + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert not async_to_sync(events.apublish)(layer, events.CONVERSATION_DELETED, group, id=3)
+    assert [e["id"] for _, e in layer.sent] == [1, 2]
+
+
+def test_lost_or_failing_registry_fails_open(monkeypatch):
+    group = events.inbox_group(987656)
+
+    async def join_two_leave_one():
+        await events.registry.asubscribe(group, "chan.1")
+        await events.registry.asubscribe(group, "chan.2")
+        await events.registry.aunsubscribe(group, "chan.1")
+    async_to_sync(join_two_leave_one)()
+    assert events.registry.count(group) == 1 and events.registry.has_subscribers(group)
+
+    presence.get_backend().clear()   # evicted / flushed
+    assert events.registry.has_subscribers(group)
+
+    def broken(user_ids):
+        raise ConnectionError("presence store down")
+    monkeypatch.setattr(presence.get_backend(), "lookup", broken)
+    assert events.registry.has_subscribers(group)
+
+
+def test_process_local_registry_never_drops(settings, monkeypatch):
+    # a local store only sees this worker's sockets; peers may hold the group
+    del settings.MESSAGING_SUBSCRIBERS_SHARED
+    layer = RecordingLayer()
+    group = events.inbox_group(987655)
+
+    async def cycle():
+        await events.registry.asubscribe(group, "chan.1")
+        await events.registry.aunsubscribe(group, "chan.1")
+    async_to_sync(cycle)()
+    later = time.time() + presence.ttl() + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert async_to_sync(events.apublish)(layer, events.CONVERSATION_DELETED, group, id=3)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rest_message_reaches_the_inbox_socket(ws_client, auth_client_a, user_a, conversation):
+    ws = ws_client(InboxConsumer, "/ws/inbox/", user_a)
+    assert ws.connect()["type"] == "websocket.accept"
+    assert ws.receive_json()["type"] == "conversations_snapshot"
+    assert events.registry.count(events.inbox_group(user_a.id)) >= 1
+
+    res = auth_client_a.post(MSG_CREATE, {"conversation": conversation.id, "body": "Is it still here?"})
+    assert res.status_code == 201
+
+    frames = [ws.receive_json(), ws.receive_json()]
+    by_type = {f["type"]: f for f in frames}
+    assert by_type["inbox.conversation_upsert"]["conversation"]["id"] == conversation.id
+    assert by_type["inbox.message_new"]["message"]["body"] == "Is it still here?"
+    assert {f["v"] for f in frames} == {1}
+
+    ws.disconnect()
+    assert events.registry.count(events.inbox_group(user_a.id)) == 0
@@ -0,0 +1,54 @@
+import pytest
+from django.core.management import call_command
+
+from messaging.models import Conversation, Message
+
+CONV_LIST = "/api/messages/conversations/"
+MSG_CREATE = "/api/messages/messages/"
+MSG_DETAIL = "/api/messages/messages/{id}/"
+
+
+@pytest.mark.django_db
+def test_new_message_updates_preview_and_other_side_unread(auth_client_a, conversation):
+    res = auth_client_a.post(
+        MSG_CREATE, {"conversation": conversation.id, "body": "Still available?"}, format="multipart"
+    )
+    assert res.status_code == 201
+
+    conversation.refresh_from_db()
+    assert conversation.last_message_body == "Still available?"
+    assert conversation.last_message_sender.username == "alice"
+    assert conversation.seller_unread_count == 1  # bob hasn't read it
+    assert conversation.buyer_unread_count == 0   # alice sent it
+
+    convs = auth_client_a.get(CONV_LIST).data["results"]
+    conv = next(x for x in convs if x["id"] == conversation.id)
+    assert conv["last_message_sender_username"] == "alice"
+
+
+@pytest.mark.django_db
+def test_soft_delete_rolls_back_preview_and_unread(auth_client_a, conversation, user_a):
+    Message.objects.create(conversation=conversation, sender=user_a, body="first")
+    last = Message.objects.create(conversation=conversation, sender=user_a, body="oops")
+
+    res = auth_client_a.delete(MSG_DETAIL.format(id=last.id))
+    assert res.status_code == 204
+
+    conversation.refresh_from_db()
+    assert Message.objects.filter(pk=last.pk, is_deleted=True).exists()
+    assert conversation.last_message_body == "first"
+    assert conversation.seller_unread_count == 1
+
+
+@pytest.mark.django_db
+def test_reconcile_command_repairs_drift(seed_messages, conversation):
+    Conversation.objects.filter(pk=conversation.pk).update(
+        last_message_body="", buyer_unread_count=7, seller_unread_count=0
+    )
+
+    call_command("reconcile_conversations")
+
+    conversation.refresh_from_db()
+    assert conversation.last_message_body == "Interested!"
+    assert conversation.buyer_unread_count == 1   # "Hello" from bob
+    assert conversation.seller_unread_count == 2  # "Hi", "Interested!" from alice
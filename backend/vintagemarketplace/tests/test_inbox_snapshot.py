@@ -0,0 +1,55 @@
+import pytest
+from django.utils import timezone
+
+from messaging.consumers import InboxConsumer
+from messaging.models import Conversation
+from vintageapi.models import Item
+
+
+@pytest.fixture
+def many_conversations(user_a, user_b):
+    convos = []
+    for i in range(5):
+        item = Item.objects.create(title=f"Item {i}", description="", price="10.00", seller=user_b)
+        convos.append(Conversation.objects.create(item=item, buyer=user_a, seller=user_b))
+    return convos
+
+
+def _open_inbox(ws_client, user, query=""):
+    ws = ws_client(InboxConsumer, f"/ws/inbox/?{query}", user)
+    assert ws.connect()["type"] == "websocket.accept"
+    return ws, ws.receive_json()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_is_paged_on_request(ws_client, user_a, many_conversations):
+    ws, first = _open_inbox(ws_client, user_a, "page_size=2")
+    assert first["type"] == "conversations_snapshot"
+    assert len(first["conversations"]) == 2
+    assert first["has_more"] is True
+
+    seen = [c["id"] for c in first["conversations"]]
+    frame = first
+    while frame["has_more"]:
+        ws.send_json({"type": "snapshot_more", "cursor": frame["cursor"]})
+        frame = ws.receive_json()
+        seen += [c["id"] for c in frame["conversations"]]
+
+    assert sorted(seen) == sorted(c.id for c in many_conversations)
+    ws.disconnect()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_since_token_only_returns_changed_conversations(ws_client, user_a, many_conversations):
+    ws, first = _open_inbox(ws_client, user_a)
+    token = first["sync_token"]
+    ws.disconnect()
+
+    changed = many_conversations[3]
+    Conversation.objects.filter(pk=changed.pk).update(
+        updated_at=timezone.now() + timezone.timedelta(seconds=1))
+
+    ws, resumed = _open_inbox(ws_client, user_a, f"since={token}")
+    assert resumed["incremental"] is True
+    assert [c["id"] for c in resumed["conversations"]] == [changed.id]
+    ws.disconnect()
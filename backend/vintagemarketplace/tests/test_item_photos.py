@@ -0,0 +1,52 @@
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from vintageapi import photos
+from vintageapi.models import Item, ItemImage
+
+
+def _photo(size=(3000, 2000)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (90, 60, 30)).save(buf, format="JPEG")
+    return SimpleUploadedFile("photo.jpg", buf.getvalue(), content_type="image/jpeg")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_gets_sized_renditions_and_srcset(auth_client_a, item, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    res = auth_client_a.post("/api/item-images/", {"item": item.id, "image": _photo()},
+                             format="multipart")
+    assert res.status_code == 201
+
+    image = ItemImage.objects.get(pk=res.data["id"])
+    assert (image.width, image.height) == (3000, 2000)
+    assert {name: (r["width"], r["height"]) for name, r in image.renditions.items()} == {
+        "grid": (400, 267), "detail": (1024, 683), "zoom": (2048, 1365)}
+
+    listed = auth_client_a.get(f"/api/items/{item.id}/").data["images"][0]
+    assert listed["renditions"]["grid"]["webp"].endswith("_grid.webp")
+    assert listed["srcset"]["jpg"].split(", ")[0].endswith("_grid.jpg 400w")
+    assert listed["srcset"]["webp"].endswith("_zoom.webp 2048w")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_identical_upload_reuses_renditions(auth_client_a, user_b, item, settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = tmp_path
+    data = _photo(size=(800, 600))
+    auth_client_a.post("/api/item-images/", {"item": item.id, "image": data}, format="multipart")
+
+    def render_again(data):
+        raise AssertionError("already rendered")
+    monkeypatch.setattr(photos, "render_renditions", render_again)
+    other = Item.objects.create(title="Same jacket", description="", price="40", seller=user_b)
+    data.seek(0)
+    auth_client_a.post("/api/item-images/", {"item": other.id, "image": data}, format="multipart")
+
+    first, second = ItemImage.objects.order_by("id")
+    assert second.content_hash == first.content_hash
+    assert second.renditions == first.renditions
+    # a small original isn't upscaled
+    assert first.renditions["zoom"]["width"] == 800
@@ -0,0 +1,99 @@
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+
+from catalog.models import Brand, Category
+from messaging.models import UserBlock
+from vintageapi.models import Item
+from vintageapi.search import SearchQuery, get_backend
+
+SEARCH = "/api/items/search/"
+
+
+@pytest.fixture(autouse=True)
+def empty_index():
+    get_backend().clear()
+    yield
+    get_backend().clear()
+
+
+@pytest.fixture
+def catalog_items(user_b, user_c):
+    clothing = Category.objects.create(name="Clothing")
+    jeans = Category.objects.create(name="Jeans", parent=clothing)
+    jackets = Category.objects.create(name="Jackets", parent=clothing)
+    levis = Brand.objects.create(name="Levi's")
+    return {
+        "clothing": clothing,
+        "jeans": Item.objects.create(
+            title="501 denim jeans", description="Classic straight fit", price="40.00",
+            seller=user_b, category=jeans, brand=levis, condition="G", size="32",
+            colors=["Blue"], materials=["Denim"]),
+        "jacket": Item.objects.create(
+            title="Denim trucker jacket", description="Faded", price="120.00",
+            seller=user_c, category=jackets, brand=levis, condition="LN", size="M",
+            colors=["Blue"], materials=["Denim"]),
+        "tee": Item.objects.create(
+            title="Band tee", description="Soft cotton with a denim patch", price="15.00",
+            seller=user_b, category=jackets, condition="F", size="L",
+            colors=["Black"], materials=["Cotton"]),
+    }
+
+
+@pytest.mark.django_db
+def test_search_ranks_title_matches_and_returns_facets(api_client, catalog_items):
+    res = api_client.get(SEARCH + "?q=denim")
+    assert res.status_code == 200
+    assert res.data["count"] == 3
+    titles = [r["title"] for r in res.data["results"]]
+    assert titles[-1] == "Band tee"  # only a description match
+
+    facets = res.data["facets"]
+    assert facets["category"][str(catalog_items["clothing"].id)] == 3  # subtree count
+    assert facets["material"] == {"denim": 2, "cotton": 1}
+    assert facets["price"] == {"25-50": 1, "100-250": 1, "0-25": 1}
+
+
+@pytest.mark.django_db
+def test_facet_filters_and_sold_items(api_client, catalog_items):
+    res = api_client.get(SEARCH + "?color=blue&size=M&size=32")
+    assert {r["title"] for r in res.data["results"]} == {"501 denim jeans", "Denim trucker jacket"}
+
+    jeans = catalog_items["jeans"]
+    jeans.is_sold = True
+    jeans.save()
+    res = api_client.get(SEARCH + "?color=blue")
+    assert [r["title"] for r in res.data["results"]] == ["Denim trucker jacket"]
+
+
+@pytest.mark.django_db
+def test_blocked_sellers_are_excluded(auth_client_a, user_a, user_c, catalog_items):
+    UserBlock.objects.create(blocker=user_a, blocked=user_c)
+    res = auth_client_a.get(SEARCH + "?q=denim")
+    assert "Denim trucker jacket" not in [r["title"] for r in res.data["results"]]
+    assert res.data["count"] == 2
+
+
+@pytest.mark.django_db
+@override_settings(ITEM_SEARCH_BACKEND="vintageapi.search.DatabaseSearchBackend")
+def test_database_backend_matches_local_semantics(catalog_items):
+    call_command("rebuild_item_index", "--clear")
+    result = get_backend().search(SearchQuery(text="denim jac", filters={"material": ["denim"]}))
+    assert result.ids == [catalog_items["jacket"].id]
+    assert result.facets["brand"] == {str(catalog_items["jacket"].brand_id): 1}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("backend", ["vintageapi.search.LocalSearchBackend",
+                                     "vintageapi.search.DatabaseSearchBackend"])
+def test_backends_rank_prefix_matches_the_same_way(backend, user_b, catalog_items):
+    # three weak terms sharing the prefix must not outrank one strong term
+    spread = Item.objects.create(
+        title="Work shirt", price="30.00", seller=user_b,
+        colors=["Denimblue"], materials=["Denims"], styles=["Denimwear"])
+    with override_settings(ITEM_SEARCH_BACKEND=backend):
+        call_command("rebuild_item_index", "--clear")
+        result = get_backend().search(SearchQuery(text="deni"))
+        get_backend().clear()
+    assert result.ids[:2] == [catalog_items["jacket"].id, catalog_items["jeans"].id]
+    assert result.ids.index(spread.id) < result.ids.index(catalog_items["tee"].id)
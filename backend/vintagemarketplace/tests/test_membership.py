@@ -0,0 +1,37 @@
+import pytest
+from django.core.cache import cache
+
+from messaging import membership
+from messaging.consumers import ChatConsumer
+
+
+@pytest.mark.django_db
+def test_membership_is_served_from_cache_tiers(conversation, user_a, user_c, django_assert_num_queries):
+    membership._local.clear()
+    cache.delete(membership.MEMBERSHIP_KEY.format(id=conversation.id))
+
+    assert membership.is_participant(conversation.id, user_a.id)       # DB, fills both tiers
+    with django_assert_num_queries(0):
+        assert membership.is_participant(conversation.id, user_a.id)   # local tier
+        membership._local.clear()
+        assert not membership.is_participant(conversation.id, user_c.id)   # shared tier
+    assert not membership.is_participant(999999, user_a.id)
+
+
+@pytest.mark.django_db
+def test_new_conversations_are_seeded_and_deleted_ones_dropped(conversation, user_b, django_assert_num_queries):
+    with django_assert_num_queries(0):
+        assert membership.participants(conversation.id) == (conversation.buyer_id, conversation.seller_id)
+    conversation_id = conversation.id
+    conversation.delete()
+    assert membership.participants(conversation_id) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_chat_consumer_admits_only_participants(ws_client, conversation, user_a, user_c):
+    ws = ws_client(ChatConsumer, f"/ws/chat/{conversation.id}/", user_a, convo_id=conversation.id)
+    assert ws.connect()["type"] == "websocket.accept"
+    assert ws.receive_json()["type"] == "hello"
+
+    outsider = ws_client(ChatConsumer, f"/ws/chat/{conversation.id}/", user_c, convo_id=conversation.id)
+    assert outsider.connect() == {"type": "websocket.close", "code": 4403}
@@ -0,0 +1,125 @@
+from io import StringIO
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from messaging import archive, receipts
+from messaging.models import ArchiveSegment, Message, UserReport
+
+CONV_MSGS = "/api/messages/conversations/{id}/messages/"
+
+
+@pytest.fixture
+def archive_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def _send(conversation, *pairs):
+    return [Message.objects.create(conversation=conversation, sender=sender, body=body)
+            for sender, body in pairs]
+
+
+def _read_all(conversation):
+    conversation.refresh_from_db()
+    receipts.mark_read(conversation.buyer, conversation)
+    receipts.mark_read(conversation.seller, conversation)
+
+
+def _archive():
+    call_command("archive_conversations", days=0, stdout=StringIO())
+
+
+def _walk(client, conversation):
+    """Every page of cursor mode, newest to oldest."""
+    url = CONV_MSGS.format(id=conversation.id)
+    data = client.get(url, {"pagination": "cursor", "page_size": 2}).data
+    pages = [data["results"]]
+    while data["before"]:
+        data = client.get(url, {"before": data["before"], "page_size": 2}).data
+        pages.append(data["results"])
+    return [m["body"] for page in reversed(pages) for m in page]
+
+
+@pytest.mark.django_db
+def test_history_moves_to_segments_and_cursor_pages_rehydrate_it(
+        archive_root, auth_client_a, conversation, user_a, user_b):
+    _send(conversation, (user_a, "Hi"), (user_b, "Hello"), (user_a, "30?"), (user_b, "35"))
+    _read_all(conversation)
+    _archive()
+
+    assert not Message.objects.filter(conversation=conversation).exists()
+    segment = ArchiveSegment.objects.get(conversation=conversation)
+    assert segment.count == 4 and default_storage.exists(segment.path)
+    conversation.refresh_from_db()
+    assert conversation.last_message_body == "35"
+
+    # a new message lands in the hot table; pages cross into the archive
+    _send(conversation, (user_a, "Deal"))
+    assert _walk(auth_client_a, conversation) == ["Hi", "Hello", "30?", "35", "Deal"]
+    # the preview survives a reconcile once only archived messages are left
+    Message.objects.filter(conversation=conversation).delete()
+    conversation.refresh_from_db()
+    conversation.reconcile()
+    assert conversation.last_message_body == "35"
+
+
+@pytest.mark.django_db
+def test_unread_and_reported_messages_stay_hot(archive_root, conversation, user_a, user_b):
+    read, deleted = _send(conversation, (user_a, "Hi"), (user_a, "typo"))
+    deleted.soft_delete()
+    reported, = _send(conversation, (user_b, "rude"))
+    UserReport.objects.create(reporter=user_a, reported=user_b, message=reported)
+    _read_all(conversation)
+    unread, = _send(conversation, (user_b, "still there?"))
+    _archive()
+
+    hot = set(Message.objects.filter(conversation=conversation).values_list("pk", flat=True))
+    assert hot == {reported.pk, unread.pk}
+    assert ArchiveSegment.objects.get(conversation=conversation).count == 1
+    conversation.refresh_from_db()
+    assert conversation.buyer_unread_count == 1
+
+
+@pytest.mark.django_db
+def test_full_hot_pages_skip_the_archive(archive_root, auth_client_a, conversation, user_a, user_b,
+                                         monkeypatch):
+    _send(conversation, (user_a, "old"), (user_b, "older reply"))
+    _read_all(conversation)
+    _archive()
+    _send(conversation, *[(user_a, f"new {n}") for n in range(3)])
+
+    reads = []
+    real_read = archive._read
+    monkeypatch.setattr(archive, "_read", lambda segment: reads.append(segment) or real_read(segment))
+    url = CONV_MSGS.format(id=conversation.id)
+    data = auth_client_a.get(url, {"pagination": "cursor", "page_size": 2}).data
+    assert [m["body"] for m in data["results"]] == ["new 1", "new 2"] and reads == []
+
+    # the short page reaches into the archive
+    data = auth_client_a.get(url, {"before": data["before"], "page_size": 2}).data
+    assert [m["body"] for m in data["results"]] == ["older reply", "new 0"] and len(reads) == 1
+
+
+@pytest.mark.django_db
+def test_page_number_listing_includes_archived_history(archive_root, auth_client_a, conversation,
+                                                       user_a, user_b):
+    _send(conversation, (user_a, "Hi"), (user_b, "Hello"), (user_a, "30?"))
+    _read_all(conversation)
+    _archive()
+    _send(conversation, (user_b, "35"), (user_a, "Deal"))
+
+    url = CONV_MSGS.format(id=conversation.id)
+    bodies, params = [], {"page_size": 2, "page": 1}
+    while True:
+        data = auth_client_a.get(url, params).data
+        bodies += [m["body"] for m in data["results"]]
+        if not data["next"]:
+            break
+        params["page"] += 1
+    assert data["count"] == 5
+    assert bodies == ["Hi", "Hello", "30?", "35", "Deal"]
+
+    data = auth_client_a.get(url, {"page_size": 2, "page": 2, "newest_first": 1}).data
+    assert [m["body"] for m in data["results"]] == ["30?", "Hello"]
@@ -0,0 +1,53 @@
+import pytest
+
+from messaging.models import Message
+
+CONV_MSGS = "/api/messages/conversations/{id}/messages/"
+
+
+@pytest.fixture
+def many_messages(conversation, user_a):
+    return [
+        Message.objects.create(conversation=conversation, sender=user_a, body=f"m{i}")
+        for i in range(25)
+    ]
+
+
+@pytest.mark.django_db
+def test_cursor_mode_walks_back_through_history(auth_client_a, conversation, many_messages):
+    url = CONV_MSGS.format(id=conversation.id)
+
+    first = auth_client_a.get(url + "?pagination=cursor&page_size=10")
+    assert first.status_code == 200
+    assert "count" not in first.data
+    assert [m["body"] for m in first.data["results"]] == [f"m{i}" for i in range(15, 25)]
+    assert first.data["has_more"] is True
+
+    second = auth_client_a.get(url + f"?before={first.data['before']}&page_size=10")
+    assert [m["body"] for m in second.data["results"]] == [f"m{i}" for i in range(5, 15)]
+
+    last = auth_client_a.get(url + f"?before={second.data['before']}&page_size=10")
+    assert [m["body"] for m in last.data["results"]] == [f"m{i}" for i in range(0, 5)]
+    assert last.data["has_more"] is False
+    assert last.data["before"] is None
+
+
+@pytest.mark.django_db
+def test_cursor_pages_are_stable_when_new_messages_arrive(auth_client_a, conversation, many_messages, user_b):
+    url = CONV_MSGS.format(id=conversation.id)
+    first = auth_client_a.get(url + "?pagination=cursor&page_size=10&newest_last=false")
+    assert [m["body"] for m in first.data["results"]][0] == "m24"
+
+    Message.objects.create(conversation=conversation, sender=user_b, body="new")
+
+    older = auth_client_a.get(url + f"?before={first.data['before']}&page_size=10&newest_last=false")
+    assert [m["body"] for m in older.data["results"]] == [f"m{i}" for i in range(14, 4, -1)]
+
+    newer = auth_client_a.get(url + f"?after={first.data['after']}")
+    assert [m["body"] for m in newer.data["results"]] == ["new"]
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_is_rejected(auth_client_a, conversation):
+    res = auth_client_a.get(CONV_MSGS.format(id=conversation.id) + "?before=not-a-cursor")
+    assert res.status_code == 400
@@ -0,0 +1,78 @@
+import pytest
+
+from messaging.consumers import ChatConsumer
+from messaging.models import Message, MessageReaction
+
+MSG_CREATE = "/api/messages/messages/"
+
+
+def _detail(message, suffix=""):
+    return f"{MSG_CREATE}{message.id}/{suffix}"
+
+
+def _chat(ws_client, conversation, user):
+    ws = ws_client(ChatConsumer, f"/ws/chat/{conversation.id}/", user, convo_id=conversation.id)
+    assert ws.connect()["type"] == "websocket.accept"
+    assert ws.receive_json()["type"] == "hello"
+    return ws
+
+
+@pytest.mark.django_db(transaction=True)
+def test_edit_sends_a_delta_and_only_the_sender_may_edit(ws_client, auth_client_a, conversation, user_b):
+    mine = Message.objects.get(pk=auth_client_a.post(
+        MSG_CREATE, {"conversation": conversation.id, "body": "50?"}).data["id"])
+    theirs = Message.objects.create(conversation=conversation, sender=user_b, body="No")
+    ws = _chat(ws_client, conversation, user_b)
+
+    res = auth_client_a.patch(_detail(mine), {"body": "45?"}, format="json")
+    assert res.status_code == 200 and res.data["edited_at"]
+    frame = ws.receive_json()
+    assert frame["type"] == "message_edited"
+    assert (frame["message_id"], frame["body"], frame["seq"]) == (mine.id, "45?", 3)
+    assert "message" not in frame
+
+    assert auth_client_a.patch(_detail(theirs), {"body": "Yes"}, format="json").status_code == 403
+    theirs.refresh_from_db()
+    assert theirs.body == "No"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_delete_sends_a_delta_and_decrements_unread(ws_client, auth_client_a, conversation, user_b):
+    ids = [auth_client_a.post(MSG_CREATE, {"conversation": conversation.id, "body": b}).data["id"]
+           for b in ("Hi", "Oops")]
+    ws = _chat(ws_client, conversation, user_b)
+
+    assert auth_client_a.delete(_detail(Message.objects.get(pk=ids[1]))).status_code == 204
+    frame = ws.receive_json()
+    assert (frame["type"], frame["message_id"], frame["seq"]) == ("message_deleted", ids[1], 3)
+    conversation.refresh_from_db()
+    assert (conversation.seller_unread_count, conversation.last_message_body) == (1, "Hi")
+
+
+@pytest.mark.django_db
+def test_reaction_counts_are_kept_incrementally(auth_client_a, conversation, user_b):
+    message = Message.objects.create(conversation=conversation, sender=user_b, body="Deal")
+    message.react(user_b, "👍")
+
+    assert auth_client_a.post(_detail(message, "react/"), {"emoji": "👍"},
+                              format="json").data["reaction_counts"] == {"👍": 2}
+    # adding the same reaction twice changes nothing
+    assert auth_client_a.post(_detail(message, "react/"), {"emoji": "👍"},
+                              format="json").data["reaction_counts"] == {"👍": 2}
+    assert auth_client_a.delete(_detail(message, "react/"), {"emoji": "👍"},
+                                format="json").data["reaction_counts"] == {"👍": 1}
+    message.refresh_from_db()
+    assert message.reaction_counts == {"👍": 1}
+    assert MessageReaction.objects.filter(message=message).count() == 1
+
+
+@pytest.mark.django_db
+def test_reactions_must_be_a_single_emoji(auth_client_a, conversation, user_b):
+    message = Message.objects.create(conversation=conversation, sender=user_b, body="Deal")
+    for emoji in ["👍🏽", "❤️‍🔥", "🇫🇷"]:
+        res = auth_client_a.post(_detail(message, "react/"), {"emoji": emoji}, format="json")
+        assert res.status_code == 200, emoji
+    for emoji in ["lol", "👍👍", "<b>", "👍 ", 5]:
+        res = auth_client_a.post(_detail(message, "react/"), {"emoji": emoji}, format="json")
+        assert res.status_code == 400, emoji
+    assert MessageReaction.objects.filter(message=message).count() == 3
@@ -0,0 +1,60 @@
+import pytest
+
+from messaging.models import Conversation, Message, UserBlock
+from vintageapi.models import Item
+
+CONV_MSGS = "/api/messages/conversations/{id}/messages/"
+SEARCH = "/api/messages/messages/search/"
+
+
+@pytest.mark.django_db
+def test_conversation_q_filter_uses_word_and_prefix_matching(auth_client_a, seed_messages, conversation, user_b):
+    Message.objects.create(conversation=conversation, sender=user_b, body="The jacket is still available")
+
+    res = auth_client_a.get(CONV_MSGS.format(id=conversation.id) + "?q=avail")
+    assert [m["body"] for m in res.data["results"]] == ["The jacket is still available"]
+
+    res = auth_client_a.get(CONV_MSGS.format(id=conversation.id) + "?q=jacket still")
+    assert len(res.data["results"]) == 1
+
+
+@pytest.mark.django_db
+def test_index_follows_edits_and_soft_deletes(auth_client_a, conversation, user_a):
+    msg = Message.objects.create(conversation=conversation, sender=user_a, body="red scarf")
+    assert auth_client_a.get(SEARCH + "?q=scarf").data["count"] == 1
+
+    Message.objects.filter(pk=msg.pk).update(body="blue hat")
+    assert auth_client_a.get(SEARCH + "?q=scarf").data["count"] == 0
+    assert auth_client_a.get(SEARCH + "?q=hat").data["count"] == 1
+
+    msg.refresh_from_db()
+    msg.soft_delete()
+    assert auth_client_a.get(SEARCH + "?q=hat").data["count"] == 0
+
+
+@pytest.mark.django_db
+def test_global_search_respects_participants_and_blocks(auth_client_a, conversation, user_a, user_b, user_c):
+    Message.objects.create(conversation=conversation, sender=user_b, body="vintage denim")
+    other_item = Item.objects.create(title="Boots", description="", price="20.00", seller=user_c)
+    carl_convo = Conversation.objects.create(item=other_item, buyer=user_a, seller=user_c)
+    Message.objects.create(conversation=carl_convo, sender=user_c, body="denim boots")
+    bob_only = Conversation.objects.create(
+        item=Item.objects.create(title="Hat", description="", price="5.00", seller=user_c),
+        buyer=user_b, seller=user_c)
+    Message.objects.create(conversation=bob_only, sender=user_b, body="denim hat")
+
+    res = auth_client_a.get(SEARCH + "?q=denim")
+    assert sorted(m["body"] for m in res.data["results"]) == ["denim boots", "vintage denim"]
+
+    UserBlock.objects.create(blocker=user_c, blocked=user_a)
+    res = auth_client_a.get(SEARCH + "?q=denim")
+    assert [m["body"] for m in res.data["results"]] == ["vintage denim"]
+
+
+@pytest.mark.django_db
+def test_conversation_filter_must_be_an_id(auth_client_a, conversation, user_b):
+    Message.objects.create(conversation=conversation, sender=user_b, body="vintage denim")
+    res = auth_client_a.get(SEARCH, {"q": "denim", "conversation": conversation.id})
+    assert res.data["count"] == 1
+    res = auth_client_a.get(SEARCH, {"q": "denim", "conversation": "abc"})
+    assert res.status_code == 400 and "conversation" in res.data
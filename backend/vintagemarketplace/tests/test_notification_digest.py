@@ -0,0 +1,99 @@
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+
+from messaging import presence, receipts
+from messaging.models import Message, Notification, UserBlock
+
+
+@pytest.fixture
+def bob_email(user_b):
+    user_b.email = "bob@example.com"
+    user_b.save()
+    return user_b
+
+
+def _run_worker(delay=0):
+    call_command("send_notification_digests", delay=delay, stdout=StringIO())
+
+
+def _send(conversation, sender, *bodies):
+    for body in bodies:
+        Message.objects.create(conversation=conversation, sender=sender, body=body)
+
+
+@pytest.mark.django_db
+def test_burst_in_a_thread_becomes_one_digest(conversation, user_a, bob_email):
+    _send(conversation, user_a, "Hi!", "Is this still available?", "Would you take 30?")
+    assert Notification.objects.filter(recipient=bob_email, state=Notification.PENDING).count() == 3
+
+    _run_worker()
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == ["bob@example.com"]
+    assert mail.outbox[0].subject == "You have 3 new messages"
+    assert "Would you take 30?" in mail.outbox[0].body
+    assert not Notification.objects.filter(state=Notification.PENDING).exists()
+
+    _run_worker()
+    assert len(mail.outbox) == 1
+
+
+@pytest.mark.django_db
+def test_muted_read_and_online_recipients_are_skipped(conversation, user_a, bob_email):
+    conversation.set_muted(bob_email, True)
+    _send(conversation, user_a, "muted")
+    _run_worker()
+
+    conversation.set_muted(bob_email, False)
+    _send(conversation, user_a, "read right away")
+    conversation.refresh_from_db()
+    receipts.mark_read(bob_email, conversation)
+    _run_worker()
+
+    presence.get_backend().touch(bob_email.id, "inbox.1", expires_in=60)
+    _send(conversation, user_a, "seen live")
+    _run_worker()
+
+    assert mail.outbox == []
+    assert set(Notification.objects.values_list("state", flat=True)) == {Notification.SKIPPED}
+
+
+@pytest.mark.django_db
+def test_outbox_row_shares_the_message_transaction(conversation, user_a, bob_email):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            _send(conversation, user_a, "never mind")
+            raise RuntimeError
+    assert not Notification.objects.exists()
+    # young rows wait for the delay
+    _send(conversation, user_a, "hello")
+    _run_worker(delay=3600)
+    assert mail.outbox == []
+
+
+@pytest.mark.django_db
+def test_deleted_and_blocked_messages_are_never_mailed(conversation, user_a, bob_email):
+    _send(conversation, user_a, "oops, wrong chat")
+    Message.objects.get(body="oops, wrong chat").soft_delete()
+    _run_worker()
+    UserBlock.objects.create(blocker=bob_email, blocked=user_a)
+    _send(conversation, user_a, "why did you block me")
+    _run_worker()
+
+    assert mail.outbox == []
+    assert set(Notification.objects.values_list("state", flat=True)) == {Notification.SKIPPED}
+
+
+@pytest.mark.django_db
+def test_presence_outage_leaves_rows_pending(conversation, user_a, bob_email, monkeypatch):
+    def down(user_ids):
+        raise ConnectionError("presence down")
+    monkeypatch.setattr(presence.get_backend(), "lookup", down)
+    _send(conversation, user_a, "hello?")
+    _run_worker()
+
+    assert mail.outbox == []
+    assert Notification.objects.get().state == Notification.PENDING
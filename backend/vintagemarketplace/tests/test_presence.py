@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from messaging import broadcast, presence
+from messaging.consumers import InboxConsumer
+
+PRESENCE = "/api/messages/presence/"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_online_while_connected_then_last_seen(ws_client, auth_client_a, user_b, user_c, conversation):
+    ws = ws_client(InboxConsumer, "/ws/inbox/", user_b)
+    assert ws.connect()["type"] == "websocket.accept"
+    ws.receive_json()
+
+    ids = f"{user_b.id},{user_c.id}"
+    online = auth_client_a.get(PRESENCE, {"ids": ids}).data
+    assert list(online) == [str(user_b.id)]   # user_c shares no conversation
+    assert online[str(user_b.id)]["online"] is True
+
+    ws.disconnect()
+    state = auth_client_a.get(PRESENCE, {"ids": ids}).data[str(user_b.id)]
+    assert state["online"] is False
+    assert state["last_seen"]
+
+
+def test_connections_expire_without_heartbeats():
+    backend = presence.LocalPresenceBackend()
+    backend.touch(1, "node-a.conn", expires_in=0.05)
+    backend.touch(1, "node-b.conn", expires_in=60)
+    backend.remove(1, "node-b.conn")
+    assert backend.lookup([1])[1][0] == 1
+    time.sleep(0.06)
+    assert backend.lookup([1])[1][0] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_inbox_events_skip_offline_users(auth_client_a, conversation, monkeypatch):
+    sent = []
+
+    class Layer:
+        async def group_send(self, group, event):
+            sent.append(group)
+    monkeypatch.setattr(broadcast, "get_channel_layer", lambda: Layer())
+
+    res = auth_client_a.post("/api/messages/messages/", {"conversation": conversation.id, "body": "Hi"})
+    assert res.status_code == 201
+    assert sent == [f"chat_{conversation.id}"]
@@ -0,0 +1,60 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from messaging import receipts
+from messaging.consumers import InboxConsumer
+from messaging.models import Conversation, Message
+from vintageapi.models import Item
+
+READ = "/api/messages/conversations/{id}/read/"
+READ_MANY = "/api/messages/conversations/read-many/"
+
+
+@pytest.mark.django_db
+def test_reads_are_debounced_and_keep_later_messages_unread(auth_client_a, settings, seed_messages, user_b):
+    settings.MESSAGING_READ_RECEIPT_WINDOW = 60
+    conversation = seed_messages
+    for _ in range(5):
+        assert auth_client_a.post(READ.format(id=conversation.id)).status_code == 200
+    conversation.refresh_from_db()
+    assert conversation.buyer_unread_count == 1     # nothing written yet
+
+    Message.objects.create(conversation=conversation, sender=user_b, body="Still there?")
+    assert receipts.aggregator.flush() == 1
+    conversation.refresh_from_db()
+    assert conversation.buyer_unread_count == 1     # the message after the read position
+    assert conversation.buyer_last_read < conversation.last_message_at
+
+
+@pytest.mark.django_db
+def test_read_many_writes_in_one_batch(auth_client_a, user_a, user_b):
+    convos = []
+    for i in range(4):
+        item = Item.objects.create(title=f"Lamp {i}", description="", price="15.00", seller=user_b)
+        convo = Conversation.objects.create(item=item, buyer=user_a, seller=user_b)
+        Message.objects.create(conversation=convo, sender=user_b, body="Hi")
+        convos.append(convo)
+
+    with CaptureQueriesContext(connection) as queries:
+        res = auth_client_a.post(READ_MANY, {"all": True}, format="json")
+    assert res.data == {"ok": True, "count": 4}
+    updates = [q for q in queries.captured_queries if q["sql"].startswith("UPDATE")]
+    assert len(updates) == 1
+    assert not Conversation.objects.filter(buyer_unread_count__gt=0).exists()
+
+    assert auth_client_a.post(READ_MANY, {"ids": "nope"}, format="json").status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_peers_get_a_compact_receipt(ws_client, auth_client_a, user_b, seed_messages):
+    ws = ws_client(InboxConsumer, "/ws/inbox/", user_b)
+    assert ws.connect()["type"] == "websocket.accept"
+    assert ws.receive_json()["type"] == "conversations_snapshot"
+
+    auth_client_a.post(READ.format(id=seed_messages.id))
+    frame = ws.receive_json()
+    assert frame["type"] == "inbox.read"
+    assert frame["conversation_id"] == seed_messages.id
+    assert frame["unread_count"] is None
+    assert ws.receive_nothing(0.1)
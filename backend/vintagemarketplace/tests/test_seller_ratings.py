@@ -0,0 +1,47 @@
+import pytest
+from django.contrib.auth.models import User
+
+from orders.models import Order, Review
+from vintageapi.models import Item
+
+ITEMS = "/api/items/"
+PROFILE = "/api/accounts/profile/{username}/"
+
+
+@pytest.fixture
+def rated_sellers(user_a):
+    sellers = [User.objects.create_user(username=f"seller{i}", password="x") for i in range(4)]
+    order = Order.objects.create(buyer=user_a)
+    for n, seller in enumerate(sellers):
+        for k in range(3):
+            item = Item.objects.create(title=f"{seller.username}-{k}", description="", price="10.00", seller=seller)
+            Review.objects.create(order=order, item=item, seller=seller, buyer=user_a, rating=1 + (n + k) % 5)
+    return sellers
+
+
+@pytest.mark.django_db
+def test_item_list_resolves_ratings_in_one_query(api_client, rated_sellers, django_assert_max_num_queries):
+    # count + items + images prefetch + ratings
+    with django_assert_max_num_queries(4):
+        res = api_client.get(ITEMS)
+    assert res.status_code == 200
+    first = next(r for r in res.data["results"] if r["seller_username"] == "seller0")
+    assert first["seller_rating"] == 2.0
+    assert first["seller_rating_count"] == 3
+
+
+@pytest.mark.django_db
+def test_summary_matches_per_seller_aggregates(rated_sellers):
+    summary = Review.objects.rating_summary(s.id for s in rated_sellers)
+    for seller in rated_sellers:
+        reviews = Review.objects.filter(seller=seller)
+        avg = sum(r.rating for r in reviews) / reviews.count()
+        assert summary[seller.id] == (pytest.approx(avg), 3)
+
+
+@pytest.mark.django_db
+def test_profile_shares_rating_lookup_with_its_items(api_client, rated_sellers):
+    res = api_client.get(PROFILE.format(username="seller1"))
+    assert res.status_code == 200
+    assert res.data["review_count"] == 3
+    assert {i["seller_rating"] for i in res.data["items"]} == {res.data["average_rating"]}
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from messaging.consumers import ChatConsumer
+
+
+def _open_chat(ws_client, conversation, user):
+    ws = ws_client(ChatConsumer, f"/ws/chat/{conversation.id}/", user, convo_id=conversation.id)
+    assert ws.connect()["type"] == "websocket.accept"
+    assert ws.receive_json()["type"] == "hello"
+    return ws
+
+
+@pytest.mark.django_db(transaction=True)
+def test_keystrokes_coalesce_into_one_start_and_one_stop(ws_client, settings, conversation, user_a, user_b):
+    settings.CHAT_TYPING_WINDOW_SECONDS = 0.3
+    typer = _open_chat(ws_client, conversation, user_a)
+    peer = _open_chat(ws_client, conversation, user_b)
+
+    for _ in range(25):
+        typer.send_json({"type": "typing"})
+    assert peer.receive_json() == {"type": "typing", "username": "alice", "is_typing": True}
+    assert peer.receive_nothing(0.1)
+
+    time.sleep(0.3)
+    assert peer.receive_json() == {"type": "typing", "username": "alice", "is_typing": False}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sending_a_message_ends_typing(ws_client, settings, conversation, user_a, user_b):
+    settings.CHAT_TYPING_WINDOW_SECONDS = 30
+    typer = _open_chat(ws_client, conversation, user_a)
+    peer = _open_chat(ws_client, conversation, user_b)
+
+    typer.send_json({"type": "typing"})
+    assert peer.receive_json()["is_typing"] is True
+    typer.send_json({"message": "On my way"})
+    assert peer.receive_json() == {"type": "typing", "username": "alice", "is_typing": False}
+    assert peer.receive_json()["type"] == "chat_message"
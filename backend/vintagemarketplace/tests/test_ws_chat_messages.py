@@ -0,0 +1,92 @@
+import pytest
+
+from messaging import membership
+from messaging.consumers import ChatConsumer
+from messaging.models import ClientIdConflict, Conversation, Message, UserBlock
+from vintageapi.models import Item
+
+MSG_CREATE = "/api/messages/messages/"
+
+
+def _open_chat(ws_client, conversation, user):
+    ws = ws_client(ChatConsumer, f"/ws/chat/{conversation.id}/", user, convo_id=conversation.id)
+    assert ws.connect()["type"] == "websocket.accept"
+    assert ws.receive_json()["type"] == "hello"
+    return ws
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ws_message_is_stored_acked_and_broadcast_once(ws_client, conversation, user_a, user_b):
+    sender = _open_chat(ws_client, conversation, user_a)
+    peer = _open_chat(ws_client, conversation, user_b)
+
+    sender.send_json({"type": "message", "body": "Can you do 30?", "client_id": "c-1"})
+    frames = [sender.receive_json(), sender.receive_json()]
+    ack = next(f for f in frames if f["type"] == "ack")
+    stored = Message.objects.get(conversation=conversation)
+    assert ack == {"type": "ack", "client_id": "c-1", "id": stored.id,
+                   "created_at": stored.created_at.isoformat(), "duplicate": False}
+
+    received = peer.receive_json()
+    assert received["type"] == "chat_message"
+    assert received["message"]["id"] == stored.id
+    assert received["message"]["client_id"] == "c-1"
+    conversation.refresh_from_db()
+    assert conversation.seller_unread_count == 1
+
+    # a retry after a dropped ack is acked again but neither stored nor re-sent
+    sender.send_json({"type": "message", "body": "Can you do 30?", "client_id": "c-1"})
+    assert sender.receive_json() == {**ack, "duplicate": True}
+    assert peer.receive_nothing(0.1)
+    assert Message.objects.filter(conversation=conversation).count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ws_message_rejected_when_blocked(ws_client, conversation, user_a, user_b):
+    sender = _open_chat(ws_client, conversation, user_a)
+    UserBlock.objects.create(blocker=user_b, blocked=user_a)
+
+    sender.send_json({"type": "message", "body": "Hello?", "client_id": "c-2"})
+    assert sender.receive_json() == {"type": "error", "code": "blocked", "client_id": "c-2"}
+    assert not Message.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rest_create_is_idempotent_on_client_id(auth_client_a, conversation):
+    payload = {"conversation": conversation.id, "body": "Deal", "client_id": "c-3"}
+    first = auth_client_a.post(MSG_CREATE, payload)
+    second = auth_client_a.post(MSG_CREATE, payload)
+    assert first.status_code == second.status_code == 201
+    assert first.data["id"] == second.data["id"]
+    assert Message.objects.filter(client_id="c-3").count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ws_message_to_a_deleted_conversation_is_rejected(ws_client, conversation, user_a, user_b):
+    sender = _open_chat(ws_client, conversation, user_a)
+    convo_id = conversation.id
+    conversation.delete()
+    # another worker's membership cache still knows the conversation
+    membership.remember(convo_id, user_a.id, user_b.id)
+
+    sender.send_json({"type": "message", "body": "Still there?", "client_id": "c-4"})
+    assert sender.receive_json() == {"type": "error", "code": "not_found", "client_id": "c-4"}
+    assert not Message.objects.exists()
+
+
+@pytest.mark.django_db
+def test_client_id_reused_in_another_conversation_is_rejected(auth_client_a, conversation,
+                                                              user_a, user_c):
+    other = Conversation.objects.create(
+        item=Item.objects.create(title="Boots", description="", price="20.00", seller=user_c),
+        buyer=user_a, seller=user_c)
+    first = auth_client_a.post(MSG_CREATE, {"conversation": conversation.id, "body": "Deal",
+                                            "client_id": "c-5"})
+    assert first.status_code == 201
+
+    res = auth_client_a.post(MSG_CREATE, {"conversation": other.id, "body": "Deal?",
+                                          "client_id": "c-5"})
+    assert res.status_code == 400 and "client_id" in res.data
+    with pytest.raises(ClientIdConflict):
+        Message.create_once(other, user_a, client_id="c-5", body="Deal?")
+    assert not Message.objects.filter(conversation=other).exists()
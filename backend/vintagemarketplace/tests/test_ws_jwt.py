@@ -0,0 +1,55 @@
+import pytest
+from asgiref.sync import async_to_sync
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from messaging import ws_jwt
+
+
+@pytest.fixture
+def handshake(monkeypatch):
+    ws_jwt._tokens.clear()
+    ws_jwt._users.clear()
+    lookups = []
+    get_user = JWTAuthentication.get_user
+
+    def counting_get_user(self, validated):
+        lookups.append(validated["user_id"])
+        return get_user(self, validated)
+    monkeypatch.setattr(JWTAuthentication, "get_user", counting_get_user)
+
+    async def inner(scope, receive, send):
+        return scope.get("user")
+
+    middleware = ws_jwt.JWTAuthMiddleware(inner)
+
+    def _connect(token):
+        scope = {"type": "websocket", "path": "/ws/inbox/", "query_string": f"token={token}".encode()}
+        return async_to_sync(middleware)(scope, None, None)
+    _connect.lookups = lookups
+    return _connect
+
+
+@pytest.mark.django_db(transaction=True)
+def test_repeat_handshake_skips_the_db(handshake, user_a):
+    token = str(AccessToken.for_user(user_a))
+    assert handshake(token).id == user_a.id
+    assert handshake(token).id == user_a.id
+    assert handshake.lookups == [str(user_a.id)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deactivated_user_is_rejected_despite_cached_token(handshake, user_a):
+    token = str(AccessToken.for_user(user_a))
+    assert handshake(token) is not None
+
+    user_a.is_active = False
+    user_a.save()
+    assert handshake(token) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_invalid_tokens_are_never_cached(handshake, user_a):
+    token = str(AccessToken.for_user(user_a))
+    assert handshake(token[:-2] + "xx") is None
+    assert len(ws_jwt._tokens) == 0
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VintageapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vintageapi'
+
+    def ready(self):
+        import vintageapi.signals # noqa
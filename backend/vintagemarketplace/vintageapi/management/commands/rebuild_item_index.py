@@ -0,0 +1,44 @@
+"""
+Rebuild the item search index (see vintageapi.search) from the Item table.
+
+Idempotent: safe to re-run. Sold items are left out of the index.
+"""
+
+from django.core.management.base import BaseCommand
+
+from vintageapi.models import Item
+from vintageapi.search import build_document, get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item search / facet index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Drop the whole index first (otherwise items are re-indexed in place).",
+        )
+
+    def handle(self, *args, **opts):
+        backend = get_backend()
+        if opts["clear"]:
+            backend.clear()
+
+        items = (Item.objects.filter(is_sold=False)
+                 .select_related("brand", "category")
+                 .prefetch_related("tags")
+                 .order_by("pk"))
+        indexed = 0
+        for item in items.iterator(chunk_size=500):
+            backend.index(build_document(item))
+            indexed += 1
+
+        removed = 0
+        for pk in Item.objects.filter(is_sold=True).values_list("pk", flat=True).iterator():
+            backend.remove(pk)
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Items indexed: {indexed} (sold items dropped: {removed})"
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vintageapi', '0005_item_brand_item_category_item_colors_item_condition_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemFacetValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=16)),
+                ('value', models.CharField(max_length=64)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_values', to='vintageapi.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['facet', 'value', 'item'], name='vintageapi__facet_eb764f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'facet', 'value'), name='uniq_item_facet_value')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='vintageapi.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'item'], name='vintageapi__term_7150ce_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'term'), name='uniq_item_search_term')],
+            },
+        ),
+    ]
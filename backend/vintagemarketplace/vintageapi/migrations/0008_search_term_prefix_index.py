@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vintageapi', '0007_itemimage_renditions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='itemsearchterm',
+            name='vintageapi__term_7150ce_idx',
+        ),
+        migrations.AddIndex(
+            model_name='itemsearchterm',
+            index=models.Index(fields=['term', 'item'], name='itemsearchterm_term_prefix', opclasses=['varchar_pattern_ops', 'int8_ops']),
+        ),
+    ]
@@ -37,6 +37,12 @@ class ItemImage(models.Model):
         'Item', on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='item_images/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # filled in after upload by vintageapi.photos
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # {"grid": {"width", "height", "webp": path, "jpg": path}, "detail": ..., "zoom": ...}
+    renditions = models.JSONField(default=dict, blank=True)
 
 
 class Wishlist(models.Model):
@@ -64,4 +70,40 @@ class WishlistItem(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.wishlist.id}:{self.item.id}"
\ No newline at end of file
+        return f"{self.wishlist.id}:{self.item.id}"
+
+class ItemSearchTerm(models.Model):
+    """Inverted-index posting for DatabaseSearchBackend (see vintageapi.search)."""
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name="search_terms")
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["item", "term"],
+                                    name="uniq_item_search_term")
+        ]
+        indexes = [
+            # pattern ops so the term__startswith prefix lookup can use it on
+            # PostgreSQL under a non-C collation (ignored elsewhere)
+            models.Index(fields=["term", "item"], name="itemsearchterm_term_prefix",
+                         opclasses=["varchar_pattern_ops", "int8_ops"]),
+        ]
+
+
+class ItemFacetValue(models.Model):
+    """One (facet, value) pair of an item, for filtering and facet counts."""
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name="facet_values")
+    facet = models.CharField(max_length=16)
+    value = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["item", "facet", "value"],
+                                    name="uniq_item_facet_value")
+        ]
+        indexes = [
+            models.Index(fields=["facet", "value", "item"]),
+        ]
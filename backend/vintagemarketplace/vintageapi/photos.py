@@ -0,0 +1,181 @@
+"""
+Item photo renditions.
+
+Uploads keep the original in `item_images/`; browse and detail pages load
+fixed-size renditions instead:
+
+    grid    400px   listing grids / search results
+    detail  1024px  item page
+    zoom    2048px  full-screen viewer
+
+each as WebP plus a JPEG fallback, bounded on the longest side and never
+upscaled. Each upload is handled by a background thread that reads and
+hashes the original and writes the results; only decoding and encoding,
+which are CPU-bound, go to a process pool (`render_renditions` is pure:
+bytes in, encoded bytes out).
+
+Renditions are content-addressed: files are named after the SHA-256 of the
+original, and an upload whose hash was already rendered (sellers re-use
+photos across listings) copies the existing rendition map instead of
+rendering again. ItemImageSerializer exposes them as `renditions` and as
+`srcset` strings per format.
+
+settings.ITEM_PHOTO_SYNC = True renders inline on commit (tests).
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+log = logging.getLogger(__name__)
+
+RENDITIONS = (("grid", 400), ("detail", 1024), ("zoom", 2048))
+FORMATS = (("webp", "WEBP", {"quality": 80, "method": 4}),
+           ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}))
+RENDITION_DIR = "item_images/renditions"
+
+DEFAULT_WORKERS = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render_renditions(data):
+    """
+    Encode every rendition of one photo. Runs in a worker process, so it
+    only touches Pillow: returns (width, height, {name: {"width", "height",
+    "webp": bytes, "jpg": bytes}}).
+    """
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (RENDITIONS[-1][1],) * 2)
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    width, height = img.size
+
+    out = {}
+    # largest first, each size downscaled from the previous one
+    for name, size in reversed(RENDITIONS):
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        entry = {"width": img.width, "height": img.height}
+        for ext, fmt, options in FORMATS:
+            buf = io.BytesIO()
+            img.save(buf, format=fmt, **options)
+            entry[ext] = buf.getvalue()
+        out[name] = entry
+    return width, height, {name: out[name] for name, _ in RENDITIONS}
+
+
+def schedule(image_id):
+    """Render an ItemImage's renditions once the current transaction commits."""
+    transaction.on_commit(lambda: _submit(image_id))
+
+
+def _submit(image_id):
+    if getattr(settings, "ITEM_PHOTO_SYNC", False):
+        process(image_id)
+        return
+    _get_executor().submit(_process_in_background, image_id)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ITEM_PHOTO_WORKERS", DEFAULT_WORKERS),
+                thread_name_prefix="item-photos",
+            )
+        return _executor
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # a forked copy of a threaded server process can inherit held
+            # locks (DB drivers, logging); start workers from a clean process
+            method = ("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                      else "spawn")
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "ITEM_PHOTO_WORKERS", DEFAULT_WORKERS),
+                mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _process_in_background(image_id):
+    try:
+        process(image_id)
+    except Exception:
+        log.exception("item photo renditions failed for image %s", image_id)
+    finally:
+        close_old_connections()
+
+
+def process(image_id):
+    """
+    Hash the original, reuse an existing rendition map for the same content
+    or render and store a new one. Returns the rendition map, or None.
+    """
+    from .models import ItemImage
+
+    image = ItemImage.objects.filter(pk=image_id).only("id", "image").first()
+    if image is None or not image.image:
+        return None
+    with image.image.open("rb") as fh:
+        data = fh.read()
+    # cheap and releases the GIL; only the encoding needs another process
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    done = (ItemImage.objects.filter(content_hash=content_hash)
+            .exclude(renditions={})
+            .values("width", "height", "renditions").first())
+    if done is not None:
+        ItemImage.objects.filter(pk=image_id).update(content_hash=content_hash, **done)
+        return done["renditions"]
+    ItemImage.objects.filter(pk=image_id).update(content_hash=content_hash)
+
+    if getattr(settings, "ITEM_PHOTO_SYNC", False):
+        rendered = render_renditions(data)
+    else:
+        rendered = _get_pool().submit(render_renditions, data).result()
+    return _store(image_id, content_hash, rendered)
+
+
+def _store(image_id, content_hash, rendered):
+    from .models import ItemImage
+
+    width, height, out = rendered
+    renditions = {}
+    for name, entry in out.items():
+        files = {}
+        for ext, _, _ in FORMATS:
+            path = f"{RENDITION_DIR}/{content_hash[:2]}/{content_hash}_{name}.{ext}"
+            # content-addressed: an existing file already holds these bytes
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(entry[ext]))
+            files[ext] = path
+        renditions[name] = {"width": entry["width"], "height": entry["height"], **files}
+    ItemImage.objects.filter(pk=image_id).update(
+        width=width, height=height, renditions=renditions)
+    return renditions
+
+
+def srcset(renditions, url=None):
+    """{"webp": "<url> 400w, ...", "jpg": ...} for a stored rendition map."""
+    url = url or default_storage.url
+    # small originals give several renditions of the same width; list each once
+    ordered = sorted({entry["width"]: entry for entry in renditions.values()}.values(),
+                     key=lambda entry: entry["width"])
+    return {
+        ext: ", ".join(f"{url(entry[ext])} {entry['width']}w" for entry in ordered)
+        for ext, _, _ in FORMATS
+    } if ordered else {}
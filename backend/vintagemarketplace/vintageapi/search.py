@@ -0,0 +1,354 @@
+"""
+Item search and faceted browse.
+
+Items are turned into documents (weighted terms + facet values) by
+build_document() and pushed into a backend whenever an item is saved, sold
+or deleted (see vintageapi.signals). A search returns one page of ranked
+item ids plus facet counts for the whole hit set:
+
+    result = get_backend().search(SearchQuery(text="levis denim",
+                                              filters={"size": ["M"]}))
+
+Backends:
+- DatabaseSearchBackend (default): postings in ItemSearchTerm /
+  ItemFacetValue, so every lookup is an indexed query.
+- LocalSearchBackend: in-process inverted index, used by the test settings.
+
+Pick one with settings.ITEM_SEARCH_BACKEND (dotted path).
+
+Filters OR within a facet and AND across facets. The category facet holds
+the item's category and all its ancestors, so filtering on a category
+matches its whole subtree, and its counts are subtree counts.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (Count, F, FloatField, Max, OuterRef, Q, Subquery,
+                              Value)
+from django.db.models.functions import Cast, Ln
+from django.utils.module_loading import import_string
+
+# facets returned to clients, in display order
+FACETS = ["category", "brand", "condition", "size", "color", "material", "style", "price"]
+
+# (low, high, label); high is exclusive, None means open-ended
+PRICE_BUCKETS = [
+    (Decimal("0"), Decimal("25"), "0-25"),
+    (Decimal("25"), Decimal("50"), "25-50"),
+    (Decimal("50"), Decimal("100"), "50-100"),
+    (Decimal("100"), Decimal("250"), "100-250"),
+    (Decimal("250"), None, "250+"),
+]
+
+# relevance weight per document field
+WEIGHTS = {"title": 5, "brand": 3, "tags": 2, "attributes": 2, "description": 1}
+
+MAX_TERM_LENGTH = 64
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return [t[:MAX_TERM_LENGTH] for t in _TOKEN_RE.findall((text or "").lower())]
+
+
+def price_bucket(price):
+    price = Decimal(price)
+    for low, high, label in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return label
+    return PRICE_BUCKETS[0][2]
+
+
+# free-text facets are matched case-insensitively
+FOLDED_FACETS = {"size", "color", "material", "style"}
+
+
+def normalize_facet_value(facet, value):
+    value = str(value).strip()[:MAX_TERM_LENGTH]
+    return value.lower() if facet in FOLDED_FACETS else value
+
+
+def _normalized(values, facet):
+    return sorted({normalize_facet_value(facet, v) for v in values or [] if str(v).strip()})
+
+
+def _category_ids(category):
+    if category is None:
+        return []
+    return [str(pk) for pk in category.ancestor_ids()]
+
+
+def build_document(item):
+    """Flatten an Item into {"id", "price", "terms": {term: weight}, "facets": {...}}."""
+    terms = Counter()
+
+    def add(text, weight):
+        for token in tokenize(text):
+            terms[token] = max(terms[token], weight)
+
+    add(item.title, WEIGHTS["title"])
+    add(item.description, WEIGHTS["description"])
+    if item.brand_id:
+        # synonyms too, so "levis" finds "Levi's"
+        for label in [item.brand.name, *(item.brand.synonyms or [])]:
+            add(label, WEIGHTS["brand"])
+            add(label.replace("'", ""), WEIGHTS["brand"])
+    for tag in item.tags.all():
+        add(tag.name, WEIGHTS["tags"])
+    for value in [*item.colors, *item.materials, *item.styles]:
+        add(str(value), WEIGHTS["attributes"])
+
+    facets = {
+        "category": _category_ids(item.category),
+        "brand": [str(item.brand_id)] if item.brand_id else [],
+        "condition": [item.condition] if item.condition else [],
+        "size": _normalized([item.size], "size"),
+        "color": _normalized(item.colors, "color"),
+        "material": _normalized(item.materials, "material"),
+        "style": _normalized(item.styles, "style"),
+        "price": [price_bucket(item.price)],
+        # not exposed as a facet; lets searches exclude blocked sellers
+        "seller": [str(item.seller_id)],
+    }
+    return {"id": item.pk, "price": Decimal(item.price), "terms": dict(terms), "facets": facets}
+
+
+@dataclass
+class SearchQuery:
+    text: str = ""
+    filters: dict = field(default_factory=dict)   # facet -> [values]
+    exclude: dict = field(default_factory=dict)   # facet -> [values]
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+    offset: int = 0
+    limit: int = 20
+
+
+@dataclass
+class SearchResult:
+    ids: list
+    total: int
+    facets: dict
+
+
+class ItemSearchBackend:
+    def index(self, doc):
+        raise NotImplementedError
+
+    def remove(self, item_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query):
+        raise NotImplementedError
+
+
+class LocalSearchBackend(ItemSearchBackend):
+    """In-process inverted index. Per-process state: meant for tests/dev."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._docs = {}
+            self._postings = defaultdict(dict)   # term -> {item_id: weight}
+            self._facets = defaultdict(set)      # (facet, value) -> {item_id}
+            self._sorted_terms = None
+
+    def index(self, doc):
+        with self._lock:
+            self.remove(doc["id"])
+            self._docs[doc["id"]] = doc
+            for term, weight in doc["terms"].items():
+                self._postings[term][doc["id"]] = weight
+            for facet, values in doc["facets"].items():
+                for value in values:
+                    self._facets[(facet, value)].add(doc["id"])
+            self._sorted_terms = None
+
+    def remove(self, item_id):
+        with self._lock:
+            doc = self._docs.pop(item_id, None)
+            if doc is None:
+                return
+            for term in doc["terms"]:
+                postings = self._postings[term]
+                postings.pop(item_id, None)
+                if not postings:
+                    del self._postings[term]
+            for facet, values in doc["facets"].items():
+                for value in values:
+                    self._facets[(facet, value)].discard(item_id)
+            self._sorted_terms = None
+
+    def _expand(self, token, prefix):
+        if not prefix:
+            return [token] if token in self._postings else []
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = []
+        i = bisect_left(self._sorted_terms, token)
+        while i < len(self._sorted_terms) and self._sorted_terms[i].startswith(token):
+            terms.append(self._sorted_terms[i])
+            i += 1
+        return terms
+
+    def search(self, query):
+        with self._lock:
+            tokens = tokenize(query.text)
+            scores = None
+            n_docs = max(len(self._docs), 1)
+            for pos, token in enumerate(tokens):
+                token_scores = Counter()
+                for term in self._expand(token, prefix=pos == len(tokens) - 1):
+                    postings = self._postings[term]
+                    idf = math.log(1 + n_docs / len(postings))
+                    for item_id, weight in postings.items():
+                        token_scores[item_id] = max(token_scores[item_id], weight * idf)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = Counter({i: s + token_scores[i] for i, s in scores.items()
+                                      if i in token_scores})
+
+            hits = set(self._docs) if scores is None else set(scores)
+            for facet, values in query.filters.items():
+                hits &= set().union(*(self._facets.get((facet, v), ()) for v in values))
+            for facet, values in query.exclude.items():
+                for value in values:
+                    hits -= self._facets.get((facet, value), set())
+            if query.min_price is not None:
+                hits = {i for i in hits if self._docs[i]["price"] >= query.min_price}
+            if query.max_price is not None:
+                hits = {i for i in hits if self._docs[i]["price"] <= query.max_price}
+
+            facets = {name: Counter() for name in FACETS}
+            for item_id in hits:
+                doc_facets = self._docs[item_id]["facets"]
+                for name in FACETS:
+                    facets[name].update(doc_facets.get(name, ()))
+
+            scores = scores or {}
+            ordered = sorted(hits, key=lambda i: (-scores.get(i, 0), -i))
+            page = ordered[query.offset:query.offset + query.limit]
+            return SearchResult(ids=page, total=len(hits),
+                                facets={k: dict(v) for k, v in facets.items()})
+
+
+class DatabaseSearchBackend(ItemSearchBackend):
+    """Postings stored in ItemSearchTerm / ItemFacetValue (indexed lookups)."""
+
+    def index(self, doc):
+        from .models import ItemFacetValue, ItemSearchTerm
+        with transaction.atomic():
+            self.remove(doc["id"])
+            ItemSearchTerm.objects.bulk_create([
+                ItemSearchTerm(item_id=doc["id"], term=term, weight=weight)
+                for term, weight in doc["terms"].items()
+            ])
+            ItemFacetValue.objects.bulk_create([
+                ItemFacetValue(item_id=doc["id"], facet=facet, value=value[:MAX_TERM_LENGTH])
+                for facet, values in doc["facets"].items() for value in values
+            ])
+
+    def remove(self, item_id):
+        from .models import ItemFacetValue, ItemSearchTerm
+        ItemSearchTerm.objects.filter(item_id=item_id).delete()
+        ItemFacetValue.objects.filter(item_id=item_id).delete()
+
+    def clear(self):
+        from .models import ItemFacetValue, ItemSearchTerm
+        ItemSearchTerm.objects.all().delete()
+        ItemFacetValue.objects.all().delete()
+
+    def search(self, query):
+        from .models import Item, ItemFacetValue, ItemSearchTerm
+
+        # only indexed (i.e. unsold) items have facet rows; "price" always exists
+        items = Item.objects.filter(
+            pk__in=ItemFacetValue.objects.filter(facet="price").values("item"))
+
+        tokens = tokenize(query.text)
+        term_q = Q()
+        token_qs = []
+        for pos, token in enumerate(tokens):
+            token_q = (Q(term__startswith=token) if pos == len(tokens) - 1
+                       else Q(term=token))
+            items = items.filter(pk__in=ItemSearchTerm.objects.filter(token_q).values("item"))
+            term_q |= token_q
+            token_qs.append(token_q)
+
+        for facet, values in query.filters.items():
+            items = items.filter(pk__in=ItemFacetValue.objects.filter(
+                facet=facet, value__in=values).values("item"))
+        for facet, values in query.exclude.items():
+            items = items.exclude(pk__in=ItemFacetValue.objects.filter(
+                facet=facet, value__in=values).values("item"))
+        if query.min_price is not None:
+            items = items.filter(price__gte=query.min_price)
+        if query.max_price is not None:
+            items = items.filter(price__lte=query.max_price)
+
+        total = items.count()
+        if tokens:
+            # same score as LocalSearchBackend: per token, the best weight * idf
+            # among the terms it matches (a prefix expanding to several terms
+            # of one item counts once), summed over tokens
+            n_docs = max(ItemFacetValue.objects.filter(facet="price").count(), 1)
+            doc_freq = (ItemSearchTerm.objects.filter(term=OuterRef("term")).order_by()
+                        .values("term").annotate(n=Count("*")).values("n"))
+            idf = Ln(1.0 + Value(float(n_docs)) / Cast(Subquery(doc_freq), FloatField()))
+            per_token = {f"token_{i}": Max(F("weight") * F("idf"), filter=token_q)
+                         for i, token_q in enumerate(token_qs)}
+            ranked = (ItemSearchTerm.objects
+                      .filter(term_q, item__in=items)
+                      .annotate(idf=idf)
+                      .values("item")
+                      .annotate(**per_token)
+                      .annotate(score=sum((F(name) for name in per_token), Value(0.0)))
+                      .order_by("-score", "-item"))
+            ids = [row["item"] for row in ranked[query.offset:query.offset + query.limit]]
+        else:
+            ids = list(items.order_by("-pk").values_list("pk", flat=True)
+                       [query.offset:query.offset + query.limit])
+
+        facets = {name: {} for name in FACETS}
+        counts = (ItemFacetValue.objects
+                  .filter(item__in=items, facet__in=FACETS)
+                  .values("facet", "value")
+                  .annotate(n=Count("item")))
+        for row in counts:
+            facets[row["facet"]][row["value"]] = row["n"]
+        return SearchResult(ids=ids, total=total, facets=facets)
+
+
+@lru_cache(maxsize=None)
+def _backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    return _backend(getattr(settings, "ITEM_SEARCH_BACKEND",
+                            "vintageapi.search.DatabaseSearchBackend"))
+
+
+def index_item(item):
+    """Bring the index in line with `item` (sold items are dropped)."""
+    backend = get_backend()
+    if item.is_sold:
+        backend.remove(item.pk)
+    else:
+        backend.index(build_document(item))
@@ -1,34 +1,108 @@
+from operator import attrgetter
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from django.db.models import Avg
+from catalog import brands
 from orders.models import Review
+from . import photos
 from .models import Item, ItemImage, Wishlist, WishlistItem
 
 
 class ItemImageSerializer(serializers.ModelSerializer):
+    """
+    `renditions` / `srcset` point at the fixed-size WebP/JPEG renditions;
+    both are empty until vintageapi.photos has rendered the upload.
+    """
+    renditions = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ItemImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'width', 'height', 'renditions', 'srcset']
+        read_only_fields = ['width', 'height']
+
+    def _url(self, path):
+        url = default_storage.url(path)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_renditions(self, obj):
+        return {
+            name: {key: self._url(value) if key in ("webp", "jpg") else value
+                   for key, value in entry.items()}
+            for name, entry in obj.renditions.items()
+        }
+
+    def get_srcset(self, obj):
+        return photos.srcset(obj.renditions, url=self._url)
+
+
+class SellerRatingMixin:
+    """
+    Seller rating lookups shared through the serializer context, so each
+    seller costs at most one query per response (zero when a list
+    serializer prefetched them). Set `seller_id_path` to reach the seller id.
+    """
+    seller_id_path = "seller_id"
 
+    def _seller_ratings(self):
+        return self.context.setdefault("seller_ratings", {})
 
-class ItemSerializer(serializers.ModelSerializer):
+    def prefetch_seller_ratings(self, instances):
+        ratings = self._seller_ratings()
+        getter = attrgetter(self.seller_id_path)
+        missing = {getter(obj) for obj in instances} - ratings.keys()
+        found = Review.objects.rating_summary(missing)
+        for seller_id in missing:
+            ratings[seller_id] = found.get(seller_id, (None, 0))
+
+    def seller_rating_summary(self, obj):
+        seller_id = attrgetter(self.seller_id_path)(obj)
+        if seller_id not in self._seller_ratings():
+            self.prefetch_seller_ratings([obj])
+        avg, count = self._seller_ratings()[seller_id]
+        return (round(avg, 2) if avg else None), count
+
+
+class SellerRatingListSerializer(serializers.ListSerializer):
+    """Resolves every seller rating on the page in one query."""
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, "all") else data)
+        self.child.prefetch_seller_ratings(instances)
+        return super().to_representation(instances)
+
+
+class ItemSerializer(SellerRatingMixin, serializers.ModelSerializer):
     seller_username = serializers.CharField(source='seller.username',
                                             read_only=True)
     seller_rating = serializers.SerializerMethodField()
     seller_rating_count = serializers.SerializerMethodField()
     images = ItemImageSerializer(many=True, read_only=True)
+    brand_name = serializers.CharField(write_only=True, required=False,
+                                       allow_blank=True)
+
+    def validate(self, attrs):
+        # free-text brand -> canonical Brand via the in-memory index;
+        # unknown brands leave the item unbranded rather than failing
+        brand_name = attrs.pop("brand_name", "")
+        if brand_name and "brand" not in attrs:
+            brand = brands.resolve(brand_name)
+            if brand is not None:
+                attrs["brand_id"] = brand["id"]
+        return attrs
 
     def get_seller_rating(self, obj):
-        avg = Review.objects.filter(seller=obj.seller).aggregate(avg=Avg('rating'))['avg']
-        return round(avg, 2) if avg else None
+        return self.seller_rating_summary(obj)[0]
 
     def get_seller_rating_count(self, obj):
-        return Review.objects.filter(seller=obj.seller).count()
+        return self.seller_rating_summary(obj)[1]
 
     class Meta:
         model = Item
         fields = ['id', 'title', 'description', 'seller_rating', 'seller_rating_count',
-                  'price', 'seller', 'seller_username', 'is_sold', 'images']
-        read_only_fields = ['seller']
+                  'price', 'seller', 'seller_username', 'is_sold', 'images',
+                  'brand', 'brand_name']
+        read_only_fields = ['seller', 'brand']
+        list_serializer_class = SellerRatingListSerializer
 
 
 class WishlistItemSerializer(serializers.ModelSerializer):
@@ -1,11 +1,60 @@
 # backend/app/shop/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
-from .models import Wishlist
+from catalog.models import Brand, Category
+from . import photos
+from .models import Item, ItemImage, Wishlist
+from .search import get_backend, index_item
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def ensure_wishlist(sender, instance, created, **kwargs):
     if created:
         Wishlist.objects.get_or_create(user=instance)
+
+
+# ---- search index ----
+@receiver(post_save, sender=Item)
+def index_item_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_item(instance)
+
+
+@receiver(m2m_changed, sender=Item.tags.through)
+def index_item_on_tags_change(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Item):
+        index_item(instance)
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item_on_delete(sender, instance, **kwargs):
+    get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_items(sender, instance, created, raw=False, **kwargs):
+    # brand names are indexed as search terms
+    if raw or created:
+        return
+    for item in Item.objects.filter(brand=instance, is_sold=False).select_related(
+            "brand", "category").prefetch_related("tags"):
+        index_item(item)
+
+
+@receiver(post_save, sender=Category)
+def reindex_moved_category_items(sender, instance, raw=False, **kwargs):
+    # the category facet stores ancestor ids, which a move changes
+    if raw or not getattr(instance, "_path_changed", False):
+        return
+    for item in Item.objects.filter(
+            category__path__startswith=instance.path, is_sold=False).select_related(
+            "brand", "category").prefetch_related("tags"):
+        index_item(item)
+
+
+# ---- photo renditions ----
+@receiver(post_save, sender=ItemImage)
+def render_item_photo(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        photos.schedule(instance.pk)
@@ -3,13 +3,18 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
-from messaging.utils import _is_blocked
-from messaging.models import UserBlock
+from messaging import blocks
+from messaging.blocks import BlockFilterMixin
+from catalog import brands
+from catalog.models import Category
 from .models import Item, ItemImage, WishlistItem, Wishlist
 from .serializers import (ItemSerializer, ItemImageSerializer,
                           WishlistItemSerializer, WishlistSerializer)
 from rest_framework.response import Response
 from .permissions import IsSellerOrReadOnly
+from .search import FACETS, SearchQuery, get_backend, normalize_facet_value
+from decimal import Decimal, InvalidOperation
+from rest_framework.exceptions import ValidationError
 
 from rest_framework import permissions
 
@@ -21,8 +26,10 @@ class IsSellerOrReadOnly(permissions.BasePermission):
         return obj.seller == request.user
 
 
-class ItemViewSet(viewsets.ModelViewSet):
-    queryset = Item.objects.filter(is_sold=False)
+class ItemViewSet(BlockFilterMixin, viewsets.ModelViewSet):
+    block_filter_fields = ("seller",)
+    queryset = Item.objects.filter(is_sold=False).select_related(
+        "seller").prefetch_related("images")
     serializer_class = ItemSerializer
     permission_classes = [IsSellerOrReadOnly]
     filtersets = [DjangoFilterBackend]
@@ -41,17 +48,79 @@ class ItemViewSet(viewsets.ModelViewSet):
                 "Unauthorized deletion of id: %s" % str(instance.id))
         instance.delete()
 
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Ranked, faceted item search in one request.
+
+        ?q=<text>&category=<id>&brand=<id|name>&condition=G&size=m&color=red
+        &material=&style=&price=0-25&min_price=&max_price=&page=&page_size=
+        Facet params may repeat (OR within a facet, AND across facets).
+        Returns {"count", "page", "page_size", "results", "facets"}.
+        """
+        params = request.query_params
+        filters = {}
+        for name in FACETS:
+            values = [normalize_facet_value(name, v) for v in params.getlist(name) if v.strip()]
+            if values:
+                filters[name] = values
+        if "brand" in filters:
+            # brand names/synonyms canonicalized in memory; unknown names match nothing
+            filters["brand"] = [
+                v if v.isdigit() else str((brands.resolve(v) or {"id": v})["id"])
+                for v in filters["brand"]
+            ]
+
+        def decimal_param(name):
+            raw = params.get(name)
+            if raw in (None, ""):
+                return None
+            try:
+                return Decimal(raw)
+            except InvalidOperation:
+                raise ValidationError({name: ["A valid number is required."]})
+
+        try:
+            page = max(1, int(params.get("page", 1)))
+            page_size = max(1, min(int(params.get("page_size", 20)), 100))
+        except ValueError:
+            raise ValidationError({"page": ["A valid integer is required."]})
+
+        exclude = {}
+        user = request.user
+        if user.is_authenticated:
+            blocked = blocks.blocked_ids(user.id)
+            if blocked:
+                exclude["seller"] = sorted(str(i) for i in blocked)
+
+        result = get_backend().search(SearchQuery(
+            text=params.get("q", ""),
+            filters=filters,
+            exclude=exclude,
+            min_price=decimal_param("min_price"),
+            max_price=decimal_param("max_price"),
+            offset=(page - 1) * page_size,
+            limit=page_size,
+        ))
+
+        items = self.get_queryset().filter(pk__in=result.ids).in_bulk()
+        hits = [items[i] for i in result.ids if i in items]
+        return Response({
+            "count": result.total,
+            "page": page,
+            "page_size": page_size,
+            "results": self.get_serializer(hits, many=True).data,
+            "facets": result.facets,
+        })
+
     def get_queryset(self):
         qs = super().get_queryset()
-        user = self.request.user
-        if user.is_authenticated:
-            qs = qs.exclude(
-                seller__in=UserBlock.objects.filter(blocker=user).values(
-                    "blocked"))
-            qs = qs.exclude(
-                seller__in=UserBlock.objects.filter(blocked=user).values(
-                    "blocker"))
-        return qs
+        category = self.request.query_params.get("category")
+        if category and category.isdigit():
+            # the category and its whole subtree, via the materialized path
+            path = Category.objects.filter(pk=category).values_list("path", flat=True).first()
+            qs = qs.filter(category__path__startswith=path) if path else qs.none()
+        return self.exclude_blocked(qs)
 
 
 class ItemImageViewSet(viewsets.ModelViewSet):
@@ -75,6 +75,16 @@ LOGGING = {
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://127.0.0.1")
 
+# Shared by every worker process: block sets (messaging.blocks) and catalog
+# version tokens (catalog.cache) must agree across processes.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "vintagemarketplace",
+    }
+}
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -89,6 +99,33 @@ CHANNEL_LAYERS = {
 
 CHAT_MAX_IMAGE_MB = 5
 
+# messaging.presence: connection registry in the channel layer's Redis (also
+# holds group memberships for messaging.events); a socket counts as online
+# for this many seconds after its last heartbeat
+MESSAGING_PRESENCE_BACKEND = "messaging.presence.RedisPresenceBackend"
+MESSAGING_PRESENCE_TTL = 90
+
+# messaging.eventlog: chat events kept per conversation for ?resume_from=
+MESSAGING_REPLAY_BUFFER = 500
+
+# messaging.notifications: offline digests via `manage.py send_notification_digests`
+MESSAGING_NOTIFICATION_TRANSPORT = "messaging.notifications.EmailTransport"
+MESSAGING_NOTIFICATION_DELAY = 120
+
+# messaging.archive: `manage.py archive_conversations` moves read history of
+# conversations idle this long to compressed segments under MEDIA_ROOT
+# ("gzip", or "zstd" with the zstandard package installed)
+MESSAGING_ARCHIVE_AFTER_DAYS = 180
+MESSAGING_ARCHIVE_CODEC = "gzip"
+# threads rendering chat image thumbnails (messaging.images)
+CHAT_IMAGE_WORKERS = 2
+
+# processes rendering item photo renditions (vintageapi.photos)
+ITEM_PHOTO_WORKERS = 2
+
+# vintageapi.search backend (DatabaseSearchBackend or LocalSearchBackend)
+ITEM_SEARCH_BACKEND = "vintageapi.search.DatabaseSearchBackend"
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -111,6 +148,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # buffers channel-layer events per request, flushed after commit
+    'messaging.broadcast.BroadcastBatchMiddleware',
 ]
 
 ROOT_URLCONF = 'vintagemarketplace.urls'
@@ -43,3 +43,22 @@ CHANNEL_LAYERS = {
         "BACKEND": "channels.layers.InMemoryChannelLayer",
     }
 }
+
+# One process, so the local presence store sees every socket's group membership
+MESSAGING_SUBSCRIBERS_SHARED = True
+
+# Flush channel-layer broadcasts inline so tests can read them back
+MESSAGING_BROADCAST_SYNC = True
+
+# Write read receipts immediately instead of debouncing them
+MESSAGING_READ_RECEIPT_WINDOW = 0
+
+# Presence registry in process memory instead of Redis
+MESSAGING_PRESENCE_BACKEND = "messaging.presence.LocalPresenceBackend"
+
+# Render chat image and item photo renditions inline on commit, not in worker pools
+CHAT_IMAGE_SYNC = True
+ITEM_PHOTO_SYNC = True
+
+# In-process item search index (no postings tables to maintain per test)
+ITEM_SEARCH_BACKEND = "vintageapi.search.LocalSearchBackend"